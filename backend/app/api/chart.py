@@ -0,0 +1,36 @@
+"""图表接口：按内容哈希获取 ECharts option（内容不可变，强 ETag + immutable 缓存）"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from app.api.http_utils import accepts_encoding, etag_matches
+from app.services.chart_store import CONTENT_ENCODINGS, decompress, is_chart_ref, load_chart_blob
+from app.services.metrics import timer
+
+router = APIRouter()
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/charts/{chart_hash}")
+async def api_get_chart(chart_hash: str, request: Request):
+    """
+    获取图表 option。哈希即内容，ETag 取哈希本身；客户端已缓存时直接 304，不查库。
+    客户端接受存储所用的压缩编码（deflate / zstd）时原样返回压缩数据，否则解压后返回。
+    """
+    if not is_chart_ref(chart_hash):
+        raise HTTPException(status_code=404, detail="Chart not found")
+    etag = f'"{chart_hash}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    with timer("db"):
+        blob = await load_chart_blob(chart_hash)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Chart not found")
+    coding = CONTENT_ENCODINGS.get(blob.codec)
+    if coding and accepts_encoding(request.headers.get("accept-encoding"), coding):
+        headers["Content-Encoding"] = coding
+        body = blob.data
+    else:
+        body = decompress(blob.codec, blob.data)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,13 +1,15 @@
 """聊天 SSE 流式接口"""
-import asyncio
 import json
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
 
-from app.services.llm_service import invoke_agent
-from app.services.session_service import add_message, get_session
+from app.services.agent_pool import QueueFullError
+from app.services.async_session_service import add_message, session_exists
+from app.services.context_service import schedule_summary_update
+from app.services.llm_service import astream_agent
+from app.services.metrics import timer
 from app.services.viz_service import parse_chart_from_response
 
 router = APIRouter()
@@ -19,34 +21,51 @@ class ChatStreamBody(BaseModel):
 
 
 async def _chat_stream_generator(session_id: str, user_message: str):
-    """SSE 生成器：先保存用户消息，调用 Agent，解析并流式返回"""
+    """SSE 生成器：先保存用户消息，流式调用 Agent，边生成边推送，结束后解析图表并落库"""
     # 1. 校验会话存在
-    s = get_session(session_id)
-    if not s:
+    with timer("session_load"):
+        exists = await session_exists(session_id)
+    if not exists:
         yield {"event": "error", "data": json.dumps({"error": "Session not found"})}
         return
 
     # 2. 保存用户消息
-    add_message(session_id, "user", user_message)
+    with timer("add_message"):
+        await add_message(session_id, "user", user_message)
 
-    # 3. 调用 Agent（同步阻塞，放到线程池避免阻塞事件循环）
+    # 3. 流式调用 Agent：工具调用推 step 事件，最终回答 token 推 message 增量事件
+    full_response = ""
+    query_sql = None
     try:
-        full_response = await asyncio.to_thread(invoke_agent, user_message, session_id)
+        async for ev in astream_agent(user_message, session_id):
+            if ev["type"] == "token":
+                yield {"event": "message", "data": json.dumps({"delta": ev["text"]})}
+            elif ev["type"] == "step":
+                yield {"event": "step", "data": json.dumps({"tool": ev["tool"], "input": ev["input"]})}
+            elif ev["type"] == "final":
+                full_response = ev["output"]
+                query_sql = ev.get("sql")
+    except QueueFullError as e:
+        yield {"event": "busy", "data": json.dumps({"error": str(e), "status": 429})}
+        return
     except Exception as e:
         yield {"event": "error", "data": json.dumps({"error": str(e)})}
         return
 
     # 4. 解析文字与图表
-    text, chart_option = parse_chart_from_response(full_response)
+    with timer("chart_parse"):
+        text, chart_option = parse_chart_from_response(full_response)
 
-    # 5. 保存助手消息
-    msg = add_message(session_id, "assistant", text, chart_data=chart_option)
+    # 5. 保存助手消息（完整文字 + 图表）
+    with timer("add_message"):
+        msg = await add_message(session_id, "assistant", text, chart_data=chart_option, query_sql=query_sql)
+    schedule_summary_update(session_id)
 
-    # 6. 流式推送
+    # 6. 推送完整文字（覆盖增量拼接结果，保证与落库内容一致）与图表
     yield {"event": "message", "data": json.dumps({"content": text})}
     if chart_option:
-        yield {"event": "chart", "data": json.dumps({"option": chart_option})}
-    yield {"event": "done", "data": json.dumps({"message_id": msg.id})}
+        yield {"event": "chart", "data": json.dumps({"option": chart_option, "ref": msg.chart_ref})}
+    yield {"event": "done", "data": json.dumps({"message_id": msg.id, "exportable": bool(query_sql)})}
 
 
 @router.post("/chat/stream")
@@ -0,0 +1,73 @@
+"""结果导出接口：把回答背后的只读查询按批流式导出为 CSV / NDJSON / Arrow，支持 gzip 与 Range 续传"""
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from app.api.http_utils import accepts_encoding, etag_matches
+from app.config import settings
+from app.services.async_session_service import get_message
+from app.services.export_service import (
+    ExportError,
+    ExportFormatUnavailable,
+    available_formats,
+    export_etag,
+    export_filename,
+    prepare_export,
+    spooled_file,
+    stream_export,
+)
+from app.services.metrics import timer
+
+router = APIRouter()
+
+
+def _headers(etag: str, filename: str, gzip: bool) -> dict:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return headers
+
+
+@router.get("/export")
+async def api_export(
+    request: Request,
+    message_id: str,
+    format: str = Query("csv", description="csv / ndjson / arrow"),
+):
+    """
+    导出查询结果。message_id 指定一条助手回答，导出其背后由 Agent 执行过的查询；不接受客户端传入的 SQL。
+    首次请求边查边传；完整生成后写入落盘文件，相同 ETag 的后续请求（含 Range 续传）直接从文件返回。
+    """
+    with timer("db"):
+        message = await get_message(message_id)
+    if message is None or not message.query_sql:
+        raise HTTPException(status_code=404, detail="该消息没有可导出的查询结果")
+    sql = message.query_sql
+
+    gzip = settings.EXPORT_GZIP and accepts_encoding(request.headers.get("accept-encoding"), "gzip")
+    # 条件请求先比较 ETag（只依赖 SQL 与数据版本），命中时不做查询校验与执行
+    if format in available_formats():
+        tag = await asyncio.to_thread(export_etag, sql, format, gzip)
+        if etag_matches(request.headers.get("if-none-match"), f'"{tag}"'):
+            return Response(status_code=304, headers=_headers(f'"{tag}"', export_filename(tag, format), gzip))
+    try:
+        job = await asyncio.to_thread(prepare_export, sql, format, gzip)
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    etag = f'"{job.etag}"'
+    headers = _headers(etag, job.filename, gzip)
+
+    path = spooled_file(job)
+    if path is not None:
+        # FileResponse 处理 Range / If-Range，返回 206；此处的 ETag 覆盖其默认值，保证与首次响应一致
+        return FileResponse(path, media_type=job.media_type, headers=headers)
+    return StreamingResponse(stream_export(job), media_type=job.media_type, headers=headers)
@@ -0,0 +1,24 @@
+"""HTTP 条件请求与内容协商的小工具（ETag、Accept-Encoding）"""
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较，支持 * 与逗号分隔的多个 ETag）"""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def accepts_encoding(accept_encoding: str | None, coding: str) -> bool:
+    """Accept-Encoding 是否接受某编码（q=0 视为拒绝）"""
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() == coding:
+            q = params.strip()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
@@ -0,0 +1,38 @@
+"""会话检索接口：在全部会话的标题与消息正文中全文检索，按相关度排序分页"""
+from fastapi import APIRouter, Query
+
+from app.services.metrics import timer
+from app.services.search_service import HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, search
+
+router = APIRouter()
+
+
+@router.get("/search")
+async def api_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10_000),
+):
+    """
+    检索会话标题与消息正文，空白分隔的多个词同时命中才返回。
+    每条结果对应一条消息（message_id 为空表示命中会话标题），snippet 中命中词以 highlight 给出的标记包围；
+    next_offset 为空表示没有更多。
+    """
+    with timer("db"):
+        hits, next_offset = await search(q, limit=limit, offset=offset)
+    return {
+        "results": [
+            {
+                "session_id": h.session_id,
+                "session_title": h.session_title,
+                "message_id": h.message_id,
+                "role": h.role,
+                "snippet": h.snippet,
+                "created_at": h.created_at.isoformat(),
+                "score": h.score,
+            }
+            for h in hits
+        ],
+        "highlight": [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE],
+        "next_offset": next_offset,
+    }
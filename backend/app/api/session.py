@@ -1,15 +1,19 @@
-"""会话管理 API：创建 / 列表 / 详情 / 重命名 / 删除"""
+"""会话管理 API：创建 / 列表 / 详情 / 消息分页 / 重命名 / 删除"""
 from pydantic import BaseModel
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
-from app.services.session_service import (
+from app.services.async_session_service import (
     create_session,
     delete_session,
+    get_messages_page,
     get_session,
     list_sessions,
     rename_session,
 )
+from app.services.frame_store import get_frame_store
+from app.services.metrics import timer
+from app.services.pagination import InvalidCursor
 
 router = APIRouter()
 
@@ -19,62 +23,106 @@ class RenameBody(BaseModel):
 
 
 @router.post("/sessions")
-def api_create_session(title: str = "新对话"):
+async def api_create_session(title: str = "新对话"):
     """创建新会话"""
-    s = create_session(title=title)
+    with timer("db"):
+        s = await create_session(title=title)
     return {"id": s.id, "title": s.title, "created_at": s.created_at.isoformat()}
 
 
+def _message_dict(m) -> dict:
+    """消息只带图表引用与摘要，option 由 GET /api/charts/{ref} 按需获取"""
+    chart = None
+    if m.chart_ref:
+        chart = {"ref": m.chart_ref, "url": f"/api/charts/{m.chart_ref}", **(m.chart_summary or {})}
+    return {
+        "id": m.id,
+        "role": m.role,
+        "content": m.content,
+        "chart": chart,
+        "exportable": bool(m.query_sql),
+        "created_at": m.created_at.isoformat(),
+    }
+
+
 @router.get("/sessions")
-def api_list_sessions():
-    """获取会话列表"""
-    items = list_sessions()
+async def api_list_sessions(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+):
+    """获取会话列表（按 updated_at 降序的游标分页，next_cursor 为空表示没有更多）"""
+    try:
+        with timer("db"):
+            items, next_cursor = await list_sessions(limit=limit, cursor=cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="cursor 无效")
     return {
         "sessions": [
             {"id": s.id, "title": s.title, "created_at": s.created_at.isoformat(), "updated_at": s.updated_at.isoformat()}
             for s in items
-        ]
+        ],
+        "next_cursor": next_cursor,
     }
 
 
 @router.get("/sessions/{session_id}")
-def api_get_session(session_id: str):
-    """获取会话详情（含消息）"""
-    s = get_session(session_id)
+async def api_get_session(session_id: str, limit: int = Query(50, ge=1, le=200)):
+    """获取会话详情，附最近 limit 条消息（按时间正序）；更早的消息用 next_before 调消息分页接口"""
+    with timer("db"):
+        s = await get_session(session_id, with_messages=False)
     if not s:
         raise HTTPException(status_code=404, detail="Session not found")
+    with timer("db"):
+        messages, next_before = await get_messages_page(session_id, limit=limit)
     return {
         "id": s.id,
         "title": s.title,
         "created_at": s.created_at.isoformat(),
         "updated_at": s.updated_at.isoformat(),
-        "messages": [
-            {
-                "id": m.id,
-                "role": m.role,
-                "content": m.content,
-                "chart_data": m.chart_data,
-                "created_at": m.created_at.isoformat(),
-            }
-            for m in sorted(s.messages, key=lambda x: x.created_at or "")
-        ],
+        "messages": [_message_dict(m) for m in reversed(messages)],
+        "next_before": next_before,
+    }
+
+
+@router.get("/sessions/{session_id}/messages")
+async def api_list_messages(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+):
+    """会话消息分页：从新到旧，before 传上一页的 next_before 继续向前翻"""
+    with timer("db"):
+        s = await get_session(session_id, with_messages=False)
+    if not s:
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        with timer("db"):
+            messages, next_before = await get_messages_page(session_id, limit=limit, before=before)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="before 游标无效")
+    return {
+        "messages": [_message_dict(m) for m in messages],
+        "next_before": next_before,
     }
 
 
 @router.put("/sessions/{session_id}")
-def api_rename_session(session_id: str, body: RenameBody):
+async def api_rename_session(session_id: str, body: RenameBody):
     """重命名会话"""
     title = body.title
-    ok = rename_session(session_id, title)
+    with timer("db"):
+        ok = await rename_session(session_id, title)
     if not ok:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"ok": True}
 
 
 @router.delete("/sessions/{session_id}")
-def api_delete_session(session_id: str):
-    """删除会话"""
-    ok = delete_session(session_id)
+async def api_delete_session(session_id: str):
+    """删除会话（连同进程内的结果帧）"""
+    with timer("db"):
+        ok = await delete_session(session_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Session not found")
+    get_frame_store().drop_session(session_id)
     return {"ok": True}
@@ -15,9 +15,98 @@ class Settings(BaseSettings):
     # 数据库
     DATABASE_URL: str = "sqlite:///./data/smart_data.db"
     SESSION_DB_URL: str = "sqlite:///./data/sessions.db"
+    ARCHIVE_DB_URL: str = "sqlite:///./data/sessions_archive.db"
 
-    # 上下文窗口
+    # 连接池与 SQLite pragma
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # 上下文：摘要之外保留的最近原始消息数、上下文 token 预算、滚动摘要
     CONTEXT_WINDOW_SIZE: int = 10
+    CONTEXT_TOKEN_BUDGET: int = 2000
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_MAX_CHARS: int = 600
+
+    # 启动后在后台预热（导入 LangChain、反射表结构、构建各槽位 Agent），完成后 /ready 返回 200
+    WARMUP_ENABLED: bool = True
+
+    # Agent 调度：worker 槽位数、等待队列上限、排队超时（秒，0 表示不超时）
+    AGENT_WORKERS: int = 4
+    AGENT_QUEUE_MAX: int = 32
+    AGENT_QUEUE_TIMEOUT_SECONDS: float = 120
+
+    # 意图路由快速通道（常见问题直接走 SQL 模板，不调用 LLM）
+    INTENT_ROUTER_ENABLED: bool = True
+
+    # 请求合并：相同问题 + 上下文 + 数据版本的并发请求共享一次 Agent 执行
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # SQL 计划缓存：复用计划失败次数达到阈值（且多于成功次数）时删除
+    PLAN_CACHE_ENABLED: bool = True
+    PLAN_CACHE_MAX_FAILURES: int = 2
+
+    # 回答缓存
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 512
+    ANSWER_CACHE_TTL_SECONDS: float = 600
+
+    # SQL 结果缓存
+    SQL_CACHE_ENABLED: bool = True
+    SQL_CACHE_MAX_ENTRIES: int = 1024
+    SQL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SQL_CACHE_MAX_ROWS: int = 10000
+    SQL_CACHE_TTL_SECONDS: float = 3600
+
+    # Agent SQL 执行护栏：单条查询的时间 / VM 步数预算（0 表示不限）、返回行数上限、
+    # 嵌套全表扫描（笛卡尔积）估算行数上限
+    SQL_GUARD_ENABLED: bool = True
+    SQL_GUARD_TIMEOUT_SECONDS: float = 15.0
+    SQL_GUARD_MAX_VM_STEPS: int = 2_000_000_000
+    SQL_GUARD_MAX_ROWS: int = 1000
+    SQL_GUARD_MAX_SCAN_PRODUCT: int = 50_000_000
+
+    # 销售预聚合汇总表：后台增量刷新间隔（秒）与每批折叠的 sales_records 行数
+    ROLLUP_ENABLED: bool = True
+    ROLLUP_REFRESH_INTERVAL_SECONDS: float = 60
+    ROLLUP_BATCH_ROWS: int = 500_000
+
+    # 图表降采样：折线 / 时间序列最多保留的点数，柱状图 / 饼图最多类目数（其余合并为「其他」）
+    CHART_MAX_POINTS: int = 500
+    CHART_MAX_CATEGORIES: int = 20
+    # 图表存储压缩编码：zlib（默认）或 zstd（需安装 zstandard）
+    CHART_CODEC: str = "zlib"
+
+    # 结果导出：每批取数行数、单次导出的 SQLite 执行时间上限（秒，不含编码与等待客户端）、是否 gzip；落盘文件（支持 Range 续传）目录与总大小上限
+    EXPORT_BATCH_ROWS: int = 10_000
+    EXPORT_TIMEOUT_SECONDS: float = 600
+    EXPORT_GZIP: bool = True
+    EXPORT_SPOOL_ENABLED: bool = True
+    EXPORT_SPOOL_DIR: str = "./data/exports"
+    EXPORT_SPOOL_MAX_BYTES: int = 1 << 30
+
+    # 会话结果帧（analyze_frames 工具）：每会话保留的结果数、常驻内存上限；超出时落盘，落盘总量上限
+    FRAME_STORE_ENABLED: bool = True
+    FRAME_STORE_PER_SESSION: int = 5
+    FRAME_STORE_MAX_BYTES: int = 256 << 20
+    FRAME_STORE_SPILL_DIR: str = "./data/frames"
+    FRAME_STORE_SPILL_MAX_BYTES: int = 1 << 30
+
+    # 冷会话归档：超过 ARCHIVE_IDLE_DAYS 天未更新的会话移入归档库（访问时自动取回）；
+    # 后台每 ARCHIVE_INTERVAL_SECONDS 秒执行一轮，每轮最多 ARCHIVE_BATCH_SESSIONS 个，之后增量 vacuum 最多 ARCHIVE_VACUUM_PAGES 页
+    ARCHIVE_ENABLED: bool = True
+    ARCHIVE_IDLE_DAYS: float = 30
+    ARCHIVE_INTERVAL_SECONDS: float = 3600
+    ARCHIVE_BATCH_SESSIONS: int = 500
+    ARCHIVE_VACUUM_PAGES: int = 10_000
+    # 归档压缩编码：zlib（默认）或 zstd（需安装 zstandard）
+    ARCHIVE_CODEC: str = "zlib"
+
+    # 会话检索（GET /api/search）：bm25 只对最近 SEARCH_RANK_WINDOW 个命中打分；摘要片段长度（trigram 分词下约等于字符数）
+    SEARCH_RANK_WINDOW: int = 5000
+    SEARCH_SNIPPET_CHARS: int = 24
 
     class Config:
         env_file = Path(__file__).resolve().parent.parent / ".env"
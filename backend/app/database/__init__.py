@@ -1,4 +1,25 @@
-from .connection import get_engine, get_session_factory, init_db
-from .models import Base, BusinessBase, SessionBase
+from .connection import (
+    dispose_async_engines,
+    dispose_engines,
+    get_engine,
+    get_or_create_engine,
+    get_session_factory,
+    init_db,
+)
+from .models import ArchiveBase, Base, BusinessBase, SessionBase
+from .rollups import rebuild_rollups, refresh_rollups
 
-__all__ = ["get_engine", "get_session_factory", "init_db", "Base", "BusinessBase", "SessionBase"]
+__all__ = [
+    "dispose_async_engines",
+    "dispose_engines",
+    "get_engine",
+    "get_or_create_engine",
+    "get_session_factory",
+    "init_db",
+    "rebuild_rollups",
+    "refresh_rollups",
+    "ArchiveBase",
+    "Base",
+    "BusinessBase",
+    "SessionBase",
+]
@@ -1,11 +1,30 @@
-"""SQLite 连接管理"""
+"""SQLite 连接管理：进程级 engine 注册表 + 连接 pragma 调优"""
+import os
+import sqlite3
+import threading
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
-from app.database.models import BusinessBase, SessionBase
+from app.database.migrations import BUSINESS_MIGRATIONS, SESSION_MIGRATIONS, run_migrations
+from app.database.models import ArchiveBase, BusinessBase, SessionBase
+from app.database.rollups import ROLLUP_TABLES  # noqa: F401  导入即注册汇总表，随 BusinessBase 建表
+
+# engine / Session 工厂注册表：每个 URL 只创建一次，进程内复用
+_engines: dict[str, Engine] = {}
+_factories: dict[Engine, sessionmaker] = {}
+_async_engines: dict[str, AsyncEngine] = {}
+_async_factories: dict[AsyncEngine, async_sessionmaker] = {}
+_registry_lock = threading.Lock()
+
+# 业务库数据版本探测用的常驻只读连接（PRAGMA data_version 需在同一连接上比较）
+_version_conn: sqlite3.Connection | None = None
+_version_lock = threading.Lock()
 
 
 def _ensure_data_dir(url: str) -> str:
@@ -20,38 +39,246 @@ def _ensure_data_dir(url: str) -> str:
     return url
 
 
+def _apply_sqlite_pragmas(dbapi_conn, connection_record):
+    """每个新 DBAPI 连接建立时执行的 pragma：WAL、同步级别、mmap、锁等待"""
+    cursor = dbapi_conn.cursor()
+    try:
+        # 全新的空库先启用增量 vacuum：必须在切换 WAL / 建表之前设置，否则不生效（旧库需显式 VACUUM 转换）
+        cursor.execute("PRAGMA page_count")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+
+
+def _apply_readonly_pragmas(dbapi_conn, connection_record):
+    """只读连接：query_only 兜底拒绝写入，其余与普通连接一致（不修改 journal_mode）"""
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+
+
+def _create_engine(url: str) -> Engine:
+    """按 URL 创建 engine；SQLite 文件库使用可配置的连接池并挂载 pragma"""
+    if not url.startswith("sqlite"):
+        return create_engine(url, echo=False, pool_pre_ping=True)
+    kwargs = {"connect_args": {"check_same_thread": False}, "echo": False}
+    if ":memory:" not in url and url.rstrip("/") != "sqlite:":
+        kwargs["pool_size"] = settings.DB_POOL_SIZE
+        kwargs["max_overflow"] = settings.DB_MAX_OVERFLOW
+        kwargs["pool_timeout"] = settings.DB_POOL_TIMEOUT
+    engine = create_engine(url, **kwargs)
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+def get_or_create_engine(url: str) -> Engine:
+    """从注册表获取 engine，不存在则创建（线程安全）"""
+    url = _ensure_data_dir(url)
+    engine = _engines.get(url)
+    if engine is not None:
+        return engine
+    with _registry_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = _create_engine(url)
+            _engines[url] = engine
+    return engine
+
+
+def _to_async_url(url: str) -> str:
+    """sqlite:/// -> sqlite+aiosqlite:///"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+def get_or_create_async_engine(url: str) -> AsyncEngine:
+    """异步 engine 注册表（aiosqlite），同一 URL 只创建一次"""
+    url = _to_async_url(_ensure_data_dir(url))
+    engine = _async_engines.get(url)
+    if engine is not None:
+        return engine
+    with _registry_lock:
+        engine = _async_engines.get(url)
+        if engine is None:
+            engine = create_async_engine(
+                url,
+                echo=False,
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+            )
+            event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+            _async_engines[url] = engine
+    return engine
+
+
+def dispose_engines() -> None:
+    """释放注册表中全部 engine 的连接池（关闭时 / 测试切库时调用）"""
+    global _version_conn
+    with _version_lock:
+        if _version_conn is not None:
+            _version_conn.close()
+            _version_conn = None
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _factories.clear()
+
+
+async def dispose_async_engines() -> None:
+    """释放全部异步 engine（需在事件循环内调用）"""
+    with _registry_lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+        _async_factories.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
 def get_database_url() -> str:
     """获取业务库的解析后 URL（供 LangChain SQLDatabase 使用）"""
     return _ensure_data_dir(settings.DATABASE_URL)
 
 
+def get_database_path() -> str | None:
+    """业务库文件路径（非 SQLite 文件库时返回 None）"""
+    url = get_database_url()
+    if not url.startswith("sqlite:///"):
+        return None
+    path = url.replace("sqlite:///", "", 1).split("?")[0]
+    return path or None
+
+
+def get_business_data_version() -> str:
+    """
+    业务库数据版本：任一连接（含其他进程）提交写入后都会变化。
+    由常驻连接上的 PRAGMA data_version 与库文件 mtime/size 组合而成，
+    文件被整体替换（如重新 seed）时同样能感知。
+    """
+    global _version_conn
+    path = get_database_path()
+    if not path or not os.path.exists(path):
+        return "missing"
+    st = os.stat(path)
+    with _version_lock:
+        try:
+            if _version_conn is None:
+                _version_conn = sqlite3.connect(
+                    f"file:{path}?mode=ro", uri=True, check_same_thread=False
+                )
+            dv = _version_conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            _version_conn = None
+            dv = 0
+    return f"{dv}:{st.st_mtime_ns}:{st.st_size}"
+
+
 def get_engine(db_url: str | None = None):
     """获取业务数据库 engine"""
-    url = db_url or settings.DATABASE_URL
-    url = _ensure_data_dir(url)
-    return create_engine(url, connect_args={"check_same_thread": False}, echo=False)
+    return get_or_create_engine(db_url or settings.DATABASE_URL)
+
+
+def get_readonly_engine() -> Engine:
+    """
+    业务库只读 engine（mode=ro + query_only），供 Agent 执行生成的 SQL。
+    非 SQLite 文件库时退回普通 engine。
+    """
+    path = get_database_path()
+    if not path:
+        return get_engine()
+    url = f"sqlite:///file:{Path(path).as_posix()}?mode=ro&uri=true"
+    engine = _engines.get(url)
+    if engine is not None:
+        return engine
+    with _registry_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = create_engine(
+                url,
+                echo=False,
+                connect_args={"check_same_thread": False},
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+            )
+            event.listen(engine, "connect", _apply_readonly_pragmas)
+            _engines[url] = engine
+    return engine
 
 
 def get_session_db_engine():
     """获取会话数据库 engine"""
-    url = _ensure_data_dir(settings.SESSION_DB_URL)
-    return create_engine(url, connect_args={"check_same_thread": False}, echo=False)
+    return get_or_create_engine(settings.SESSION_DB_URL)
+
+
+def get_archive_db_engine():
+    """获取冷会话归档库 engine"""
+    return get_or_create_engine(settings.ARCHIVE_DB_URL)
+
+
+def _get_factory(engine: Engine) -> sessionmaker:
+    factory = _factories.get(engine)
+    if factory is None:
+        with _registry_lock:
+            factory = _factories.get(engine)
+            if factory is None:
+                factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                _factories[engine] = factory
+    return factory
 
 
 def get_session_factory(engine=None):
     """获取业务库 Session 工厂"""
-    engine = engine or get_engine()
-    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return _get_factory(engine or get_engine())
 
 
 def get_session_db_factory():
     """获取会话库 Session 工厂"""
-    return sessionmaker(autocommit=False, autoflush=False, bind=get_session_db_engine())
+    return _get_factory(get_session_db_engine())
+
+
+def get_archive_db_factory():
+    """获取归档库 Session 工厂"""
+    return _get_factory(get_archive_db_engine())
+
+
+def get_async_session_db_engine() -> AsyncEngine:
+    """获取会话数据库异步 engine"""
+    return get_or_create_async_engine(settings.SESSION_DB_URL)
+
+
+def get_async_session_db_factory() -> async_sessionmaker:
+    """获取会话库异步 Session 工厂（expire_on_commit=False，提交后对象仍可读）"""
+    engine = get_async_session_db_engine()
+    factory = _async_factories.get(engine)
+    if factory is None:
+        with _registry_lock:
+            factory = _async_factories.get(engine)
+            if factory is None:
+                factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+                _async_factories[engine] = factory
+    return factory
 
 
 def init_db():
-    """创建所有表（业务库 + 会话库）"""
+    """创建所有表（业务库 + 会话库 + 归档库），并将已有库文件迁移到最新 schema 版本"""
     engine = get_engine()
     session_engine = get_session_db_engine()
+    archive_engine = get_archive_db_engine()
     BusinessBase.metadata.create_all(bind=engine)
     SessionBase.metadata.create_all(bind=session_engine)
+    ArchiveBase.metadata.create_all(bind=archive_engine)
+    run_migrations(engine, BUSINESS_MIGRATIONS)
+    run_migrations(session_engine, SESSION_MIGRATIONS)
@@ -0,0 +1,264 @@
+"""
+轻量版本化迁移：用 SQLite 的 PRAGMA user_version 记录库的 schema 版本。
+
+init_db() 先 create_all（新库直接得到最新表结构），再按版本号顺序执行尚未应用的迁移，
+已有的旧库文件因此可以原地升级。每个迁移连同 user_version 的更新在一个显式事务里执行，失败时整体回滚；
+迁移仍须可重复执行（IF NOT EXISTS 等），新库上重跑不会出错。新增迁移时在列表末尾追加，版本号递增，不要修改已发布的迁移。
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# 与 SQLAlchemy 在 SQLite 中存储 DateTime 的格式一致
+TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def get_schema_version(conn: Connection) -> int:
+    return int(conn.exec_driver_sql("PRAGMA user_version").scalar() or 0)
+
+
+def column_exists(conn: Connection, table: str, column: str) -> bool:
+    """判断表中是否已有某列（用于可重复执行的 ADD COLUMN）"""
+    rows = conn.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()
+    return any(r[1] == column for r in rows)
+
+
+def run_migrations(engine: Engine, migrations: list[Migration]) -> int:
+    """
+    执行未应用的迁移，返回迁移后的版本号。每个迁移在一个显式事务中执行：
+    pysqlite 不会为 DDL 隐式开启事务，因此关闭驱动的事务管理（AUTOCOMMIT）后自行 BEGIN / COMMIT，
+    迁移中途失败时 DDL 与 user_version 一并回滚，不会留下半迁移的表结构。
+    """
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+    for m in sorted(migrations, key=lambda x: x.version):
+        if m.version <= current:
+            continue
+        logger.info("applying migration %s: %s", m.version, m.description)
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                m.upgrade(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version={int(m.version)}")
+            except BaseException:
+                # 部分错误（如磁盘已满）SQLite 已自动回滚，此时不再 ROLLBACK 以免掩盖原始异常
+                if conn.connection.dbapi_connection.in_transaction:
+                    conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+        current = m.version
+    return current
+
+
+# ---------- 会话库 (sessions.db) ----------
+
+
+def _session_v1_indexes(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_created ON messages (session_id, created_at)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_sessions_updated_at ON sessions (updated_at)")
+    conn.exec_driver_sql("ANALYZE")
+
+
+def _session_v2_keyset_indexes(conn: Connection) -> None:
+    """keyset 分页按 (时间, id) 排序，索引带上 id 以免回表排序"""
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_created_id ON messages (session_id, created_at, id)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_sessions_updated_id ON sessions (updated_at, id)")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_messages_session_created")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_sessions_updated_at")
+
+
+def _session_v3_chart_blobs(conn: Connection) -> None:
+    """messages 增加 chart_ref / chart_summary，旧的内联 chart_data 迁入 chart_blobs 后置空"""
+    from app.services.chart_store import chart_record, summarize_chart
+
+    if not column_exists(conn, "messages", "chart_ref"):
+        conn.exec_driver_sql("ALTER TABLE messages ADD COLUMN chart_ref VARCHAR(64)")
+    if not column_exists(conn, "messages", "chart_summary"):
+        conn.exec_driver_sql("ALTER TABLE messages ADD COLUMN chart_summary JSON")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_messages_chart_ref ON messages (chart_ref) WHERE chart_ref IS NOT NULL"
+    )
+    if not column_exists(conn, "messages", "chart_data"):
+        return
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT id, chart_data FROM messages WHERE chart_data IS NOT NULL LIMIT 500"
+        ).fetchall()
+        if not rows:
+            break
+        for mid, raw in rows:
+            try:
+                option = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+            except ValueError:
+                option = None
+            if not isinstance(option, dict) or not option:
+                conn.exec_driver_sql("UPDATE messages SET chart_data = NULL WHERE id = ?", (mid,))
+                continue
+            record = chart_record(option)
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO chart_blobs (hash, codec, data, raw_size, created_at) VALUES (?, ?, ?, ?, ?)",
+                (record["hash"], record["codec"], record["data"], record["raw_size"], record["created_at"].isoformat(" ")),
+            )
+            conn.exec_driver_sql(
+                "UPDATE messages SET chart_ref = ?, chart_summary = ?, chart_data = NULL WHERE id = ?",
+                (record["hash"], json.dumps(summarize_chart(option), ensure_ascii=False), mid),
+            )
+
+
+def _session_v4_query_sql(conn: Connection) -> None:
+    if not column_exists(conn, "messages", "query_sql"):
+        conn.exec_driver_sql("ALTER TABLE messages ADD COLUMN query_sql TEXT")
+
+
+def _session_v5_archived_at(conn: Connection) -> None:
+    if not column_exists(conn, "sessions", "archived_at"):
+        conn.exec_driver_sql("ALTER TABLE sessions ADD COLUMN archived_at DATETIME")
+
+
+# 全文检索：search_docs 给每条消息 / 每个会话标题分配稳定的整数 id（显式 INTEGER PRIMARY KEY，VACUUM 不会重排），
+# 并记下消息的 role / created_at；search_fts 是自带正文的 FTS5 索引（trigram 分词，中文按子串匹配）。
+# 索引不依赖热库的 messages 表：会话归档时先标记 archived_at 再删消息，删除触发器据此保留索引，
+# 取回时按原 id 写回的消息已在索引中则跳过。删除会话时一并删除其全部索引。
+SEARCH_SCHEMA: list[str] = [
+    """
+    CREATE TABLE IF NOT EXISTS search_docs (
+        id INTEGER PRIMARY KEY,
+        session_id VARCHAR(36) NOT NULL,
+        message_id VARCHAR(36) UNIQUE,
+        role VARCHAR(20),
+        created_at DATETIME
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_search_docs_session ON search_docs (session_id)
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(title, content, tokenize='trigram')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_search_ai AFTER INSERT ON messages
+    WHEN NOT EXISTS (SELECT 1 FROM search_docs WHERE message_id = NEW.id) BEGIN
+        INSERT INTO search_docs (session_id, message_id, role, created_at)
+            VALUES (NEW.session_id, NEW.id, NEW.role, NEW.created_at);
+        INSERT INTO search_fts (rowid, title, content) VALUES (last_insert_rowid(), NULL, NEW.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_search_au AFTER UPDATE OF content ON messages BEGIN
+        UPDATE search_fts SET content = NEW.content WHERE rowid = (SELECT id FROM search_docs WHERE message_id = NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_search_ad AFTER DELETE ON messages
+    WHEN NOT EXISTS (SELECT 1 FROM sessions WHERE id = OLD.session_id AND archived_at IS NOT NULL) BEGIN
+        DELETE FROM search_fts WHERE rowid = (SELECT id FROM search_docs WHERE message_id = OLD.id);
+        DELETE FROM search_docs WHERE message_id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sessions_search_ai AFTER INSERT ON sessions BEGIN
+        INSERT INTO search_docs (session_id, message_id) VALUES (NEW.id, NULL);
+        INSERT INTO search_fts (rowid, title, content) VALUES (last_insert_rowid(), NEW.title, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sessions_search_au AFTER UPDATE OF title ON sessions BEGIN
+        UPDATE search_fts SET title = NEW.title
+            WHERE rowid = (SELECT id FROM search_docs WHERE session_id = NEW.id AND message_id IS NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sessions_search_ad AFTER DELETE ON sessions BEGIN
+        DELETE FROM search_fts WHERE rowid IN (SELECT id FROM search_docs WHERE session_id = OLD.id);
+        DELETE FROM search_docs WHERE session_id = OLD.id;
+    END
+    """,
+]
+
+
+def fts_trigram_supported(conn: Connection) -> bool:
+    """FTS5 trigram 分词器需要 SQLite >= 3.34"""
+    version = conn.exec_driver_sql("SELECT sqlite_version()").scalar() or "0"
+    return tuple(int(x) for x in version.split(".")[:2]) >= (3, 34)
+
+
+def _index_archived_messages(conn: Connection) -> None:
+    """已归档会话的消息不在热库中：从归档库解压其消息补进索引（已在索引中的跳过）"""
+    from app.database.connection import get_archive_db_engine
+    from app.services.chart_store import decompress
+
+    archived = {r[0] for r in conn.exec_driver_sql("SELECT id FROM sessions WHERE archived_at IS NOT NULL")}
+    if not archived:
+        return
+    with get_archive_db_engine().connect() as adb:
+        rows = adb.exec_driver_sql("SELECT session_id, codec, payload FROM archived_sessions").fetchall()
+    for session_id, codec, payload in rows:
+        if session_id not in archived:
+            continue
+        for m in json.loads(decompress(codec, payload))["messages"]:
+            created_at = datetime.fromisoformat(m["created_at"]).strftime(TS_FORMAT) if m["created_at"] else None
+            doc = conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO search_docs (session_id, message_id, role, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, m["id"], m["role"], created_at),
+            )
+            if doc.rowcount:
+                conn.exec_driver_sql(
+                    "INSERT INTO search_fts (rowid, title, content) VALUES (?, NULL, ?)", (doc.lastrowid, m["content"])
+                )
+
+
+def _session_v6_search(conn: Connection) -> None:
+    """会话标题与消息正文的 FTS5 全文索引；已有数据（含已归档会话的消息）一次性回填"""
+    if not fts_trigram_supported(conn):
+        logger.warning("SQLite 版本过低，不支持 FTS5 trigram，会话检索将退化为全表扫描")
+        return
+    for sql in SEARCH_SCHEMA:
+        conn.exec_driver_sql(sql)
+    # 标题权重高于正文
+    conn.exec_driver_sql("INSERT INTO search_fts (search_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0)')")
+    if conn.exec_driver_sql("SELECT 1 FROM search_docs LIMIT 1").first() is None:
+        conn.exec_driver_sql("INSERT INTO search_docs (session_id, message_id) SELECT id, NULL FROM sessions")
+        conn.exec_driver_sql(
+            "INSERT INTO search_docs (session_id, message_id, role, created_at) "
+            "SELECT session_id, id, role, created_at FROM messages ORDER BY created_at"
+        )
+        conn.exec_driver_sql(
+            """
+            INSERT INTO search_fts (rowid, title, content)
+            SELECT d.id, s.title, m.content FROM search_docs d
+            LEFT JOIN sessions s ON d.message_id IS NULL AND s.id = d.session_id
+            LEFT JOIN messages m ON m.id = d.message_id
+            """
+        )
+    _index_archived_messages(conn)
+
+
+SESSION_MIGRATIONS: list[Migration] = [
+    Migration(1, "messages(session_id, created_at) 与 sessions(updated_at) 索引", _session_v1_indexes),
+    Migration(2, "keyset 分页索引 messages(session_id, created_at, id) 与 sessions(updated_at, id)", _session_v2_keyset_indexes),
+    Migration(3, "图表迁入内容寻址的 chart_blobs，messages 只保留 chart_ref 与摘要", _session_v3_chart_blobs),
+    Migration(4, "messages.query_sql：回答背后的查询，供结果导出", _session_v4_query_sql),
+    Migration(5, "sessions.archived_at：冷会话归档标记", _session_v5_archived_at),
+    Migration(6, "会话标题与消息正文的 FTS5（trigram）全文索引", _session_v6_search),
+]
+
+
+# ---------- 业务库 (smart_data.db) ----------
+
+BUSINESS_MIGRATIONS: list[Migration] = []
@@ -2,7 +2,7 @@
 from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import JSON, Date, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import JSON, Date, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -16,7 +16,12 @@ class BusinessBase(DeclarativeBase):
 
 
 class SessionBase(DeclarativeBase):
-    """会话库 Base，仅含 sessions, messages"""
+    """会话库 Base，含 sessions, messages 及应用自身状态表（sql_plans 等）"""
+    pass
+
+
+class ArchiveBase(DeclarativeBase):
+    """冷会话归档库 Base（sessions_archive.db），含 archived_sessions 与归档会话引用的图表"""
     pass
 
 
@@ -79,23 +84,102 @@ class SalesRecord(BusinessBase):
 
 class Session(SessionBase):
     __tablename__ = "sessions"
+    __table_args__ = (Index("ix_sessions_updated_id", "updated_at", "id"),)
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     title: Mapped[str] = mapped_column(String(256), default="新对话")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 非空表示消息已移入归档库（会话行保留在热库，列表不受影响；访问时自动取回）
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
 
 
 class Message(SessionBase):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_session_created_id", "session_id", "created_at", "id"),
+        Index("ix_messages_chart_ref", "chart_ref", sqlite_where=text("chart_ref IS NOT NULL")),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     session_id: Mapped[str] = mapped_column(ForeignKey("sessions.id"), nullable=False)
     role: Mapped[str] = mapped_column(String(16), nullable=False)  # user | assistant
     content: Mapped[str] = mapped_column(Text, default="")
-    chart_data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    # 图表本体在 chart_blobs（按内容哈希去重）；这里只存引用与摘要（标题、类型、点数）
+    chart_ref: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    chart_summary: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    # 助手回答背后的最后一条查询（参数已内联），供结果导出
+    query_sql: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     session = relationship("Session", back_populates="messages")
+
+
+class ChartBlob(SessionBase):
+    """图表内容寻址存储：hash 为规范化 option JSON 的 sha256，data 为压缩后的 JSON（相同图表只存一份）"""
+
+    __tablename__ = "chart_blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(8), nullable=False)  # zlib | zstd
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    raw_size: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SessionSummary(SessionBase):
+    """会话滚动摘要：summarized_until 之前（含）的消息已折叠进 summary"""
+
+    __tablename__ = "session_summaries"
+
+    session_id: Mapped[str] = mapped_column(ForeignKey("sessions.id"), primary_key=True)
+    summary: Mapped[str] = mapped_column(Text, default="")
+    summarized_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SqlPlan(SessionBase):
+    """Agent 生成并验证过的 SQL（归一化问题 -> SELECT），相同问题再次出现时直接复用"""
+
+    __tablename__ = "sql_plans"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    question: Mapped[str] = mapped_column(String(512), nullable=False, unique=True)
+    sql: Mapped[str] = mapped_column(Text, nullable=False)
+    success_count: Mapped[int] = mapped_column(Integer, default=0)
+    failure_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# ---------- 归档库表 (sessions_archive.db) ----------
+
+
+class ArchivedSession(ArchiveBase):
+    """一个冷会话：消息与滚动摘要序列化为 JSON 后整体压缩；chart_refs 为其引用的图表哈希（JSON 数组）"""
+
+    __tablename__ = "archived_sessions"
+
+    session_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+    chart_refs: Mapped[list] = mapped_column(JSON, default=list)
+    codec: Mapped[str] = mapped_column(String(8), nullable=False)  # zlib | zstd
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    raw_size: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # 归档时会话的 updated_at
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedChartBlob(ArchiveBase):
+    """归档会话引用的图表（与 chart_blobs 同构），取回会话时一并搬回热库"""
+
+    __tablename__ = "chart_blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(8), nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    raw_size: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,191 @@
+"""
+销售域预聚合汇总表（rollup）：按 日 / 月 × 产品类别 × 部门、月 × 员工、月 × 产品 预先聚合 sales_records。
+
+- 增量维护：rollup_state 记录已折叠的 sales_records.id 水位线，每次只聚合水位线之后的新行，
+  以 INSERT ... ON CONFLICT DO UPDATE 累加到汇总表；按 id 区间分批，每批一个事务（含水位线更新）
+- 假设 sales_records 只追加；源表被重建（MAX(id) 小于水位线）时自动全量重建，
+  修改 / 删除历史行或调整员工部门、产品类别后需调用 rebuild_rollups
+- 汇总表随 BusinessBase 建表；ROLLUP_ENABLED 时 Agent 的 SQLDatabase 会看到这些表（rollup_state 除外），关闭时全部隐藏
+"""
+import asyncio
+import logging
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, Float, Integer, String, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.models import BusinessBase
+
+logger = logging.getLogger(__name__)
+
+
+class SalesDailyRollup(BusinessBase):
+    """日 × 产品类别 × 部门 销售汇总"""
+
+    __tablename__ = "rollup_sales_daily"
+
+    sale_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[str] = mapped_column(String(64), primary_key=True)
+    department_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_count: Mapped[int] = mapped_column(Integer, default=0)
+    quantity: Mapped[int] = mapped_column(Integer, default=0)
+    amount: Mapped[float] = mapped_column(Float, default=0)
+
+
+class SalesMonthlyRollup(BusinessBase):
+    """月 × 产品类别 × 部门 销售汇总（month 形如 2024-03）"""
+
+    __tablename__ = "rollup_sales_monthly"
+
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)
+    category: Mapped[str] = mapped_column(String(64), primary_key=True)
+    department_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_count: Mapped[int] = mapped_column(Integer, default=0)
+    quantity: Mapped[int] = mapped_column(Integer, default=0)
+    amount: Mapped[float] = mapped_column(Float, default=0)
+
+
+class EmployeeMonthlyRollup(BusinessBase):
+    """月 × 员工 销售汇总"""
+
+    __tablename__ = "rollup_employee_monthly"
+
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)
+    employee_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    department_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    order_count: Mapped[int] = mapped_column(Integer, default=0)
+    quantity: Mapped[int] = mapped_column(Integer, default=0)
+    amount: Mapped[float] = mapped_column(Float, default=0)
+
+
+class ProductMonthlyRollup(BusinessBase):
+    """月 × 产品 销售汇总"""
+
+    __tablename__ = "rollup_product_monthly"
+
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    category: Mapped[str] = mapped_column(String(64), nullable=False)
+    order_count: Mapped[int] = mapped_column(Integer, default=0)
+    quantity: Mapped[int] = mapped_column(Integer, default=0)
+    amount: Mapped[float] = mapped_column(Float, default=0)
+
+
+class RollupState(BusinessBase):
+    """汇总表维护状态：已折叠到的 sales_records.id"""
+
+    __tablename__ = "rollup_state"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    watermark: Mapped[int] = mapped_column(Integer, default=0)
+    refreshed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+ROLLUP_TABLES = [SalesDailyRollup, SalesMonthlyRollup, EmployeeMonthlyRollup, ProductMonthlyRollup]
+STATE_TABLE = RollupState.__tablename__
+STATE_KEY = "sales"
+
+# 给 Agent 的表说明（附在 schema 描述后）
+ROLLUP_DESCRIPTIONS = {
+    "rollup_sales_daily": "按 sale_date × category（产品类别）× department_id 预聚合的订单数 order_count、销量 quantity、销售额 amount",
+    "rollup_sales_monthly": "按 month（YYYY-MM）× category × department_id 预聚合，适合月度趋势、类别占比、部门对比",
+    "rollup_employee_monthly": "按 month × employee_id 预聚合（含 department_id），适合员工业绩排名",
+    "rollup_product_monthly": "按 month × product_id 预聚合（含 category），适合产品销售排名",
+}
+
+_SOURCE = (
+    "FROM sales_records s "
+    "JOIN products p ON p.id = s.product_id "
+    "JOIN employees e ON e.id = s.employee_id "
+    "WHERE s.id > :lo AND s.id <= :hi"
+)
+_MEASURES = "COUNT(*), SUM(s.quantity), SUM(s.amount)"
+_ACCUMULATE = (
+    "order_count = order_count + excluded.order_count, "
+    "quantity = quantity + excluded.quantity, "
+    "amount = amount + excluded.amount"
+)
+
+_UPSERTS = [
+    "INSERT INTO rollup_sales_daily (sale_date, category, department_id, order_count, quantity, amount) "
+    f"SELECT s.sale_date, p.category, e.department_id, {_MEASURES} {_SOURCE} GROUP BY 1, 2, 3 "
+    f"ON CONFLICT (sale_date, category, department_id) DO UPDATE SET {_ACCUMULATE}",
+    "INSERT INTO rollup_sales_monthly (month, category, department_id, order_count, quantity, amount) "
+    f"SELECT substr(s.sale_date, 1, 7), p.category, e.department_id, {_MEASURES} {_SOURCE} GROUP BY 1, 2, 3 "
+    f"ON CONFLICT (month, category, department_id) DO UPDATE SET {_ACCUMULATE}",
+    "INSERT INTO rollup_employee_monthly (month, employee_id, department_id, order_count, quantity, amount) "
+    f"SELECT substr(s.sale_date, 1, 7), s.employee_id, e.department_id, {_MEASURES} {_SOURCE} GROUP BY 1, 2 "
+    f"ON CONFLICT (month, employee_id) DO UPDATE SET {_ACCUMULATE}",
+    "INSERT INTO rollup_product_monthly (month, product_id, category, order_count, quantity, amount) "
+    f"SELECT substr(s.sale_date, 1, 7), s.product_id, p.category, {_MEASURES} {_SOURCE} GROUP BY 1, 2 "
+    f"ON CONFLICT (month, product_id) DO UPDATE SET {_ACCUMULATE}",
+]
+
+_refresh_lock = threading.Lock()
+
+
+def get_watermark(conn) -> int:
+    row = conn.execute(text(f"SELECT watermark FROM {STATE_TABLE} WHERE name = :n"), {"n": STATE_KEY}).first()
+    return row[0] if row else 0
+
+
+def _set_watermark(conn, watermark: int) -> None:
+    conn.execute(
+        text(
+            f"INSERT INTO {STATE_TABLE} (name, watermark, refreshed_at) VALUES (:n, :w, :t) "
+            "ON CONFLICT (name) DO UPDATE SET watermark = excluded.watermark, refreshed_at = excluded.refreshed_at"
+        ),
+        {"n": STATE_KEY, "w": watermark, "t": datetime.utcnow()},
+    )
+
+
+def _clear(conn) -> None:
+    for model in ROLLUP_TABLES:
+        conn.execute(text(f"DELETE FROM {model.__tablename__}"))
+    _set_watermark(conn, 0)
+
+
+def refresh_rollups(engine, batch_rows: int = 500_000) -> int:
+    """
+    把水位线之后新增的 sales_records 增量累加进汇总表，返回本次折叠的 id 跨度（约等于新增行数）。
+    没有新行时不产生任何写入。
+    """
+    with _refresh_lock:
+        with engine.connect() as conn:
+            watermark = get_watermark(conn)
+            high = conn.execute(text("SELECT MAX(id) FROM sales_records")).scalar() or 0
+        if high < watermark:
+            logger.info("sales_records rebuilt (max id %s < watermark %s), rebuilding rollups", high, watermark)
+            with engine.begin() as conn:
+                _clear(conn)
+            watermark = 0
+        lo = watermark
+        while lo < high:
+            hi = min(lo + batch_rows, high)
+            with engine.begin() as conn:
+                for sql in _UPSERTS:
+                    conn.execute(text(sql), {"lo": lo, "hi": hi})
+                _set_watermark(conn, hi)
+            lo = hi
+        return high - watermark
+
+
+def rebuild_rollups(engine, batch_rows: int = 500_000) -> int:
+    """清空汇总表后全量重建（历史数据被修改 / 删除后使用）"""
+    with _refresh_lock:
+        with engine.begin() as conn:
+            _clear(conn)
+    return refresh_rollups(engine, batch_rows)
+
+
+async def run_refresh_loop(engine, interval: float, batch_rows: int = 500_000) -> None:
+    """后台定时增量刷新（在线程中执行，不阻塞事件循环）；由 main.lifespan 启动、关闭时取消"""
+    while True:
+        try:
+            folded = await asyncio.to_thread(refresh_rollups, engine, batch_rows)
+            if folded:
+                logger.info("rollups refreshed, %s new sales rows folded", folded)
+        except Exception:
+            logger.exception("rollup refresh failed")
+        await asyncio.sleep(interval)
@@ -1,10 +1,19 @@
-"""填充业务数据库示例数据（200+ 条）"""
+"""
+填充业务数据库示例数据。
+- 默认：200+ 条演示数据（ORM 逐条插入）
+- 规模模式（scale）：按比例生成大数据量用于容量测试，NumPy 向量化批量生成 + executemany 批量写入，
+  scale=1 约 100 万条 sales_records，scale=10 约 1000 万条
+"""
+import argparse
 import random
+import time
 from datetime import date, timedelta
-from pathlib import Path
+
+import numpy as np
 
 from app.database.connection import get_engine
 from app.database.models import BusinessBase, Department, Employee, Product, SalesRecord
+from app.database.rollups import refresh_rollups
 
 
 def _random_date(start: date, end: date) -> date:
@@ -12,8 +21,10 @@ def _random_date(start: date, end: date) -> date:
     return start + timedelta(days=random.randint(0, d) if d > 0 else 0)
 
 
-def run_seed():
-    """创建表并填充数据"""
+def run_seed(scale: float | None = None, seed: int = 42, reset: bool = False):
+    """创建表并填充数据；传入 scale 时走规模模式（见 run_scaled_seed）"""
+    if scale is not None:
+        return run_scaled_seed(scale, seed=seed, reset=reset)
     engine = get_engine()
     BusinessBase.metadata.create_all(bind=engine)
 
@@ -89,8 +100,167 @@ def run_seed():
             session.add(r)
         session.commit()
 
+    refresh_rollups(engine)
     print("Seed 完成：departments, employees, products, sales_records 已填充 200+ 条")
 
 
+# ---------- 规模模式 ----------
+
+DEPT_NAMES = ["技术部", "销售部", "市场部", "人事部", "财务部", "运营部"]
+DEPT_MANAGERS = ["张伟", "李娜", "王强", "刘洋", "陈静", "杨帆"]
+# 各部门人数占比：销售部、技术部人多
+DEPT_WEIGHTS = [0.28, 0.34, 0.14, 0.06, 0.06, 0.12]
+POSITIONS = ["工程师", "经理", "专员", "主管", "总监", "助理"]
+POSITION_WEIGHTS = [0.35, 0.1, 0.3, 0.12, 0.03, 0.1]
+SURNAMES = list("张李王刘陈杨赵黄周吴徐孙胡朱高林何郭马罗")
+GIVEN = list("伟强芳敏静磊娜洋勇艳杰娟涛明超秀霞平刚桂")
+# 类别：(名称, 产品数占比, 价格对数均值, 价格对数标准差)
+CATEGORIES = [
+    ("电子产品", 0.25, 7.0, 0.6),
+    ("办公用品", 0.25, 4.0, 0.7),
+    ("生活用品", 0.2, 4.3, 0.6),
+    ("食品", 0.15, 3.5, 0.5),
+    ("服装", 0.15, 5.3, 0.5),
+]
+# 月份季节性（1-12 月）：春节前、618、双 11 / 年末高峰
+MONTH_SEASONALITY = np.array([1.1, 0.8, 0.9, 0.95, 1.0, 1.3, 0.95, 0.9, 1.0, 1.05, 1.6, 1.4])
+SALES_START = date(2022, 1, 1)
+SALES_END = date(2025, 2, 14)
+
+SALES_BATCH = 200_000
+
+
+def scaled_sizes(scale: float) -> dict[str, int]:
+    """scale 对应的各表行数"""
+    return {
+        "departments": len(DEPT_NAMES),
+        "employees": max(60, int(2_000 * scale)),
+        "products": max(40, int(800 * scale ** 0.5)),
+        "sales_records": max(220, int(1_000_000 * scale)),
+    }
+
+
+def _day_weights() -> tuple[np.ndarray, np.ndarray]:
+    """每天的销售概率：逐年增长趋势 × 月季节性 × 周末加成"""
+    days = np.arange(np.datetime64(SALES_START), np.datetime64(SALES_END) + 1)
+    t = (days - days[0]).astype(np.int64) / max(len(days) - 1, 1)
+    months = days.astype("datetime64[M]").astype(np.int64) % 12
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 为周四
+    w = (1 + 0.6 * t) * MONTH_SEASONALITY[months] * np.where(weekday >= 5, 1.25, 1.0)
+    return days, w / w.sum()
+
+
+def _load_pragmas(conn, loading: bool) -> None:
+    """装载期间关闭同步与 WAL，结束后恢复"""
+    if loading:
+        for p in ("journal_mode=MEMORY", "synchronous=OFF", "cache_size=-262144", "temp_store=MEMORY"):
+            conn.exec_driver_sql(f"PRAGMA {p}")
+    else:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+
+
+def run_scaled_seed(scale: float, seed: int = 42, reset: bool = False) -> dict[str, int]:
+    """
+    规模模式：按 scale 生成数据，分布有偏（产品热度 Zipf、员工业绩对数正态、日期带增长与季节性），
+    固定 seed 可复现。已有数据时默认跳过，reset=True 则清空业务表后重建。
+    """
+    engine = get_engine()
+    if reset:
+        BusinessBase.metadata.drop_all(bind=engine)
+    BusinessBase.metadata.create_all(bind=engine)
+    sizes = scaled_sizes(scale)
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("SELECT 1 FROM departments LIMIT 1").first():
+            print("已有数据，跳过 seed（使用 --reset 重建）")
+            return {}
+        conn.commit()
+        _load_pragmas(conn, loading=True)
+        try:
+            # 部门
+            n_dept = sizes["departments"]
+            budgets = np.round(rng.uniform(50, 500, n_dept) * 10000 * max(1.0, scale ** 0.5), 2)
+            conn.exec_driver_sql(
+                "INSERT INTO departments (id, name, manager, budget) VALUES (?, ?, ?, ?)",
+                list(zip(range(1, n_dept + 1), DEPT_NAMES, DEPT_MANAGERS, budgets.tolist())),
+            )
+
+            # 员工
+            n_emp = sizes["employees"]
+            names = np.char.add(rng.choice(SURNAMES, n_emp), rng.choice(GIVEN, n_emp))
+            dept_ids = rng.choice(np.arange(1, n_dept + 1), n_emp, p=DEPT_WEIGHTS)
+            positions = rng.choice(POSITIONS, n_emp, p=POSITION_WEIGHTS)
+            salaries = np.round(np.clip(rng.lognormal(9.8, 0.4, n_emp), 5000, 80000), 2)
+            hire_span = (date(2024, 6, 1) - date(2015, 1, 1)).days
+            hire_dates = (np.datetime64(date(2015, 1, 1)) + rng.integers(0, hire_span, n_emp)).astype(str)
+            conn.exec_driver_sql(
+                "INSERT INTO employees (id, name, department_id, position, salary, hire_date) VALUES (?, ?, ?, ?, ?, ?)",
+                list(zip(range(1, n_emp + 1), names.tolist(), dept_ids.tolist(), positions.tolist(), salaries.tolist(), hire_dates.tolist())),
+            )
+
+            # 产品
+            n_prod = sizes["products"]
+            cat_idx = rng.choice(len(CATEGORIES), n_prod, p=[c[1] for c in CATEGORIES])
+            mu = np.array([c[2] for c in CATEGORIES])[cat_idx]
+            sigma = np.array([c[3] for c in CATEGORIES])[cat_idx]
+            prices = np.round(np.clip(rng.lognormal(mu, sigma), 5, 20000), 2)
+            cat_names = np.array([c[0] for c in CATEGORIES])[cat_idx]
+            prod_names = np.char.add(np.char.add(cat_names, "-"), np.arange(1, n_prod + 1).astype(str))
+            stocks = rng.integers(0, 500, n_prod)
+            conn.exec_driver_sql(
+                "INSERT INTO products (id, name, category, price, stock) VALUES (?, ?, ?, ?, ?)",
+                list(zip(range(1, n_prod + 1), prod_names.tolist(), cat_names.tolist(), prices.tolist(), stocks.tolist())),
+            )
+            conn.commit()
+
+            # 销售记录：按批生成与写入，内存占用与总量无关
+            prod_p = 1.0 / np.arange(1, n_prod + 1) ** 1.1
+            prod_p = rng.permutation(prod_p / prod_p.sum())
+            emp_p = rng.lognormal(0, 0.8, n_emp) * np.where(dept_ids == 2, 4.0, 1.0)
+            emp_p /= emp_p.sum()
+            days, day_p = _day_weights()
+            n_sales = sizes["sales_records"]
+            next_id = 1
+            while next_id <= n_sales:
+                n = min(SALES_BATCH, n_sales - next_id + 1)
+                prod = rng.choice(n_prod, n, p=prod_p)
+                emp = rng.choice(n_emp, n, p=emp_p) + 1
+                qty = rng.poisson(2.0, n) + 1
+                discount = rng.uniform(0.8, 1.0, n)
+                amount = np.round(qty * prices[prod] * discount, 2)
+                sale_dates = rng.choice(days, n, p=day_p).astype(str)
+                conn.exec_driver_sql(
+                    "INSERT INTO sales_records (id, product_id, employee_id, quantity, amount, sale_date) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    list(zip(range(next_id, next_id + n), (prod + 1).tolist(), emp.tolist(), qty.tolist(), amount.tolist(), sale_dates.tolist())),
+                )
+                conn.commit()
+                next_id += n
+                print(f"  sales_records {next_id - 1}/{n_sales}", end="\r", flush=True)
+            conn.exec_driver_sql("ANALYZE")
+            conn.commit()
+        finally:
+            _load_pragmas(conn, loading=False)
+
+    t0 = time.perf_counter()
+    refresh_rollups(engine)
+    print(f"\n汇总表构建用时 {time.perf_counter() - t0:.1f}s", end="")
+    elapsed = time.perf_counter() - started
+    print(f"\nSeed 完成（scale={scale}, seed={seed}）：{sizes}，用时 {elapsed:.1f}s")
+    return sizes
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="填充业务数据库")
+    parser.add_argument("--scale", type=float, default=None, help="规模因子，1 约为 100 万条 sales_records；不传则生成演示数据")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子（规模模式）")
+    parser.add_argument("--reset", action="store_true", help="清空业务表后重建（规模模式）")
+    args = parser.parse_args(argv)
+    run_seed(scale=args.scale, seed=args.seed, reset=args.reset)
+
+
 if __name__ == "__main__":
-    run_seed()
+    main()
@@ -1,18 +1,44 @@
-"""FastAPI 入口：CORS、路由、启动时初始化数据库"""
+"""FastAPI 入口：CORS、路由、启动时初始化数据库并在后台预热 Agent"""
+import asyncio
+import contextlib
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from app.database import init_db
+from app.config import settings
+from app.database import dispose_async_engines, dispose_engines, get_engine, init_db
+from app.database.rollups import run_refresh_loop
+from app.services import warmup
+from app.services.archive_service import run_archive_loop
+from app.services.metrics import ServerTimingMiddleware, render_prometheus
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """启动时创建表并可选执行 seed"""
+    """启动时创建表；LangChain 导入、表结构反射与 Agent 构建放到后台预热，不阻塞启动"""
     init_db()
+    tasks = []
+    if settings.WARMUP_ENABLED:
+        tasks.append(asyncio.create_task(warmup.warm_up()))
+    if settings.ROLLUP_ENABLED:
+        # 首次启动时在后台补齐汇总表，之后定时增量刷新
+        tasks.append(
+            asyncio.create_task(
+                run_refresh_loop(get_engine(), settings.ROLLUP_REFRESH_INTERVAL_SECONDS, settings.ROLLUP_BATCH_ROWS)
+            )
+        )
+    if settings.ARCHIVE_ENABLED:
+        # 定时把空闲会话移入归档库并整理会话库空间
+        tasks.append(asyncio.create_task(run_archive_loop(settings.ARCHIVE_INTERVAL_SECONDS)))
     yield
-    # shutdown 可做清理
+    for task in tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await dispose_async_engines()
+    dispose_engines()
 
 
 app = FastAPI(
@@ -28,7 +54,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# 请求耗时统计；会话接口附带 Server-Timing 响应头
+app.add_middleware(ServerTimingMiddleware, paths=("/api/sessions", "/api/search"))
 
 
 @app.get("/health")
@@ -37,8 +66,29 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    """就绪检查：后台预热（LangChain 导入、表结构反射、Agent 构建）完成后返回 200，否则 503"""
+    state = warmup.status()
+    if not settings.WARMUP_ENABLED:
+        state["status"] = "ready"
+    return JSONResponse(state, status_code=200 if state["status"] == "ready" else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus 文本格式指标：分阶段耗时、LLM token、SQL 行数、缓存 / 调度器 / 意图路由统计"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+from app.api.chart import router as chart_router
 from app.api.chat import router as chat_router
+from app.api.export import router as export_router
+from app.api.search import router as search_router
 from app.api.session import router as session_router
 
 app.include_router(session_router, prefix="/api", tags=["session"])
 app.include_router(chat_router, prefix="/api", tags=["chat"])
+app.include_router(chart_router, prefix="/api", tags=["chart"])
+app.include_router(export_router, prefix="/api", tags=["export"])
+app.include_router(search_router, prefix="/api", tags=["search"])
@@ -0,0 +1,172 @@
+"""Agent 使用的 SQLDatabase：在 LangChain SQLDatabase 之上接入共享结果缓存与执行护栏"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from langchain_community.utilities.sql_database import SQLDatabase, truncate_word
+from sqlalchemy import text
+
+from app.config import settings
+from app.database.rollups import ROLLUP_DESCRIPTIONS
+from app.services import sql_cache
+from app.services.metrics import record_sql, timer
+from app.services.sql_cache import QueryResult
+from app.services.sql_guard import QueryGuardError, check_query, execution_budget
+
+
+# 当前 Agent 运行中执行过的查询 [(sql, QueryResult)]；None 表示未开启捕获
+_captured: ContextVar[list | None] = ContextVar("captured_queries", default=None)
+
+
+@contextmanager
+def capture_queries():
+    """
+    with capture_queries() as captured: ...
+    期间（含 to_thread / 工具线程，contextvar 会被复制）AgentSQLDatabase.run 的结果依次追加到 captured，
+    供回答结束后按图表说明从真实结果集生成图表。
+    """
+    captured: list = []
+    token = _captured.set(captured)
+    try:
+        yield captured
+    finally:
+        try:
+            _captured.reset(token)
+        except ValueError:
+            # 异步生成器在其他上下文中被关闭时无法 reset
+            _captured.set(None)
+
+
+def record_query(command: str, result: QueryResult) -> None:
+    """开启捕获时记录一次产生结果集的查询（SQL 或 analyze_frames 运算）"""
+    captured = _captured.get()
+    if captured is not None and result.columns:
+        captured.append((command, result))
+
+
+class AgentSQLDatabase(SQLDatabase):
+    """
+    覆盖 run()：sql_db_query 工具最终调用这里。
+    只读查询先查共享结果缓存，未命中才访问 SQLite；输出格式与 SQLDatabase.run 保持一致。
+    执行经过 sql_guard 护栏（应配合 get_readonly_engine 使用）：计划检查、时间 / 步数预算、行数上限。
+    """
+
+    def get_table_info(self, table_names: list[str] | None = None) -> str:
+        """在表结构描述后附上预聚合汇总表的说明，引导 Agent 优先使用汇总表（仅 ROLLUP_ENABLED 时）"""
+        info = super().get_table_info(table_names)
+        if not settings.ROLLUP_ENABLED:
+            return info
+        notes = [
+            f"-- {name}: {desc}"
+            for name, desc in ROLLUP_DESCRIPTIONS.items()
+            if name in self.get_usable_table_names() and (table_names is None or name in table_names)
+        ]
+        if not notes:
+            return info
+        return (
+            f"{info}\n\n/* 预聚合汇总表（由 sales_records 增量维护，可能滞后约一分钟）。"
+            "按月份 / 日期、类别、部门、员工、产品聚合销售数据时优先查询这些表，"
+            "比直接对 sales_records 做 JOIN + GROUP BY 快得多；明细或其他筛选仍用原表。\n"
+            + "\n".join(notes)
+            + "\n*/"
+        )
+
+    def run_no_throw(
+        self,
+        command: str,
+        fetch: str = "all",
+        include_columns: bool = False,
+        *,
+        parameters: dict[str, Any] | None = None,
+        execution_options: dict[str, Any] | None = None,
+    ) -> Any:
+        """护栏拒绝时与 SQL 错误一样以 "Error: ..." 文本返回，Agent 可据此改写查询"""
+        try:
+            return super().run_no_throw(
+                command,
+                fetch,
+                include_columns,
+                parameters=parameters,
+                execution_options=execution_options,
+            )
+        except QueryGuardError as e:
+            return f"Error: {e}"
+
+    def run(
+        self,
+        command: str,
+        fetch: str = "all",
+        include_columns: bool = False,
+        *,
+        parameters: dict[str, Any] | None = None,
+        execution_options: dict[str, Any] | None = None,
+    ) -> Any:
+        if fetch not in ("all", "one"):
+            return super().run(
+                command,
+                fetch,
+                include_columns,
+                parameters=parameters,
+                execution_options=execution_options,
+            )
+        key = None
+        result = None
+        if not parameters and sql_cache.is_cacheable_sql(command):
+            key = sql_cache.make_key(command, fetch)
+            result = sql_cache.lookup(key)
+        cached = result is not None
+        if not cached:
+            with timer("sql"):
+                result = self.execute_query(command, fetch, parameters, execution_options)
+            if key is not None:
+                sql_cache.store(key, result)
+        record_sql(len(result.rows), cached)
+        record_query(command, result)
+        return self._format_result(result, include_columns)
+
+    def execute_query(
+        self,
+        command: str,
+        fetch: str = "all",
+        parameters: dict[str, Any] | None = None,
+        execution_options: dict[str, Any] | None = None,
+    ) -> QueryResult:
+        """执行 SQL 并返回结果集（超过 SQL_GUARD_MAX_ROWS 行时截断）"""
+        guard = settings.SQL_GUARD_ENABLED
+        with self._engine.connect() as connection:
+            if guard:
+                check_query(connection, command, parameters)
+                budget = execution_budget(connection)
+            else:
+                budget = execution_budget(connection, seconds=0, steps=0)
+            with budget:
+                cursor = connection.execute(text(command), parameters or {}, execution_options=execution_options or {})
+                if not cursor.returns_rows:
+                    return QueryResult(columns=[])
+                columns = list(cursor.keys())
+                if fetch == "one":
+                    first = cursor.fetchone()
+                    return QueryResult(columns=columns, rows=[tuple(first)] if first is not None else [])
+                if not guard:
+                    return QueryResult(columns=columns, rows=[tuple(r) for r in cursor.fetchall()])
+                cap = settings.SQL_GUARD_MAX_ROWS
+                rows = [tuple(r) for r in cursor.fetchmany(cap + 1)]
+                cursor.close()
+        return QueryResult(columns=columns, rows=rows[:cap], truncated=len(rows) > cap)
+
+    def _format_result(self, result: QueryResult, include_columns: bool) -> str:
+        """与 SQLDatabase.run 相同的文本格式（单元格截断到 max_string_length）"""
+        res = [
+            {col: truncate_word(v, length=self._max_string_length) for col, v in zip(result.columns, row)}
+            for row in result.rows
+        ]
+        if not include_columns:
+            res = [tuple(r.values()) for r in res]
+        if not res:
+            return ""
+        if result.truncated:
+            return (
+                f"{res}\n（结果已截断：仅返回前 {len(res)} 行。"
+                "如需完整统计请改用聚合（COUNT / SUM / GROUP BY）或加 LIMIT 只取需要的行）"
+            )
+        return str(res)
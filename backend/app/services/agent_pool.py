@@ -0,0 +1,175 @@
+"""Agent 执行调度：固定数量的 worker 槽位（各自持有 Agent 实例）+ 有界等待队列 + 会话间轮转公平"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+
+from app.config import settings
+
+
+class QueueFullError(Exception):
+    """等待队列已满或排队超时，调用方应返回 429 / busy"""
+
+
+class AgentSlot:
+    """一个 worker 槽位，首次使用时在线程中构建自己的 Agent 实例"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.agent: Any = None
+
+
+class AgentScheduler:
+    """
+    - workers: 同时执行的 Agent 数量上限（每个槽位一个 Agent 实例）
+    - max_queue: 等待中的请求总数上限，超出立即拒绝
+    - 等待者按会话分组，释放槽位时在会话之间轮转，避免单个会话的突发请求占满队列
+    """
+
+    def __init__(self, workers: int, max_queue: int, agent_factory: Callable[[], Any], wait_timeout: float = 0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+        self._agent_factory = agent_factory
+        self._free: deque[AgentSlot] = deque(AgentSlot(i) for i in range(workers))
+        self._waiting: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._queue_depth = 0
+        self._wait_samples: deque[float] = deque(maxlen=1000)
+        self.acquired = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue_depth
+
+    @property
+    def active(self) -> int:
+        return self.workers - len(self._free)
+
+    async def acquire(self, session_id: str) -> AgentSlot:
+        """获取槽位；无空闲则排队，队列满或超时抛 QueueFullError"""
+        start = time.monotonic()
+        if self._free and not self._queue_depth:
+            slot = self._free.popleft()
+        else:
+            if self._queue_depth >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError("服务繁忙：等待队列已满")
+            fut = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(session_id, deque()).append(fut)
+            self._queue_depth += 1
+            try:
+                if self.wait_timeout and self.wait_timeout > 0:
+                    slot = await asyncio.wait_for(asyncio.shield(fut), timeout=self.wait_timeout)
+                else:
+                    slot = await fut
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if not self._cancel_waiter(session_id, fut):
+                    # 已被分配槽位，交还给下一个等待者
+                    self.release(fut.result())
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                    raise QueueFullError("服务繁忙：排队超时") from e
+                raise
+        waited = time.monotonic() - start
+        self._wait_samples.append(waited)
+        self.wait_seconds_total += waited
+        self.acquired += 1
+        if slot.agent is None:
+            try:
+                slot.agent = await asyncio.to_thread(self._agent_factory)
+            except BaseException:
+                self.release(slot)
+                raise
+        return slot
+
+    async def prewarm(self) -> int:
+        """为空闲槽位预先构建 Agent（启动预热用），返回新构建的数量"""
+        built = 0
+        for slot in list(self._free):
+            if slot.agent is None:
+                agent = await asyncio.to_thread(self._agent_factory)
+                if slot.agent is None:
+                    slot.agent = agent
+                    built += 1
+        return built
+
+    def _cancel_waiter(self, session_id: str, fut: asyncio.Future) -> bool:
+        """从队列移除尚未分配槽位的等待者；已分配则返回 False"""
+        if fut.done() and not fut.cancelled():
+            return False
+        fut.cancel()
+        q = self._waiting.get(session_id)
+        if q and fut in q:
+            q.remove(fut)
+            self._queue_depth -= 1
+            if not q:
+                del self._waiting[session_id]
+        return True
+
+    def release(self, slot: AgentSlot) -> None:
+        """归还槽位：按会话轮转唤醒下一个等待者"""
+        while self._waiting:
+            session_id, q = next(iter(self._waiting.items()))
+            fut = q.popleft()
+            self._queue_depth -= 1
+            if q:
+                self._waiting.move_to_end(session_id)
+            else:
+                del self._waiting[session_id]
+            if not fut.done():
+                fut.set_result(slot)
+                return
+        self._free.append(slot)
+
+    @asynccontextmanager
+    async def slot(self, session_id: str):
+        """async with scheduler.slot(session_id) as slot: 使用 slot.agent"""
+        s = await self.acquire(session_id)
+        try:
+            yield s
+        finally:
+            self.release(s)
+
+    def stats(self) -> dict:
+        samples = sorted(self._wait_samples)
+        p95 = samples[int(len(samples) * 0.95) - 1] if samples else 0.0
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "queue_depth": self._queue_depth,
+            "max_queue": self.max_queue,
+            "waiting_sessions": len(self._waiting),
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.acquired, 4) if self.acquired else 0.0,
+            "wait_seconds_p95": round(p95, 4),
+            "wait_seconds_max": round(samples[-1], 4) if samples else 0.0,
+        }
+
+
+_scheduler: AgentScheduler | None = None
+
+
+def get_scheduler() -> AgentScheduler:
+    """全局调度器（延迟创建；Agent 实例由 llm_service.build_sql_agent 构建）"""
+    global _scheduler
+    if _scheduler is None:
+        from app.services.llm_service import build_sql_agent
+
+        _scheduler = AgentScheduler(
+            workers=settings.AGENT_WORKERS,
+            max_queue=settings.AGENT_QUEUE_MAX,
+            agent_factory=build_sql_agent,
+            wait_timeout=settings.AGENT_QUEUE_TIMEOUT_SECONDS,
+        )
+    return _scheduler
+
+
+def scheduler_stats() -> dict:
+    """调度器统计；尚未创建时返回空字典（不触发创建）"""
+    return _scheduler.stats() if _scheduler is not None else {}
@@ -0,0 +1,72 @@
+"""回答缓存：以「归一化问题 + 上下文哈希 + 模型名 + 业务库数据版本 + 会话结果帧」为键缓存 Agent 完整回答"""
+import hashlib
+import re
+import unicodedata
+from typing import NamedTuple
+
+from app.config import settings
+from app.database.connection import get_business_data_version
+from app.services.cache import LRUCache
+
+_TRAILING_PUNCT = "?？。.!！~～、，,；;：: "
+
+_cache = LRUCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=settings.ANSWER_CACHE_TTL_SECONDS,
+)
+
+
+def normalize_question(question: str) -> str:
+    """归一化问题：全角转半角、小写、合并空白、去除末尾标点"""
+    q = unicodedata.normalize("NFKC", question).lower()
+    q = re.sub(r"\s+", " ", q).strip()
+    return q.rstrip(_TRAILING_PUNCT)
+
+
+def context_hash(history: list) -> str:
+    """对 abuild_chat_history 构建的上下文消息求哈希（角色 + 内容）"""
+    h = hashlib.sha256()
+    for m in history:
+        h.update(type(m).__name__.encode())
+        h.update(b"\x00")
+        h.update(str(m.content).encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+def frames_scope(session_id: str, frames: str) -> str:
+    """会话结果帧的作用域：会话 id + 帧清单摘要。帧只属于本会话，依赖帧的回答不能跨会话共享"""
+    return session_id + ":" + hashlib.sha256(frames.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(question: str, history: list, model: str | None = None, scope: str | None = None) -> tuple:
+    """构造缓存键；scope 为 frames_scope（会话没有结果帧时为 None）。调用时会顺带检查数据版本"""
+    version = get_business_data_version()
+    _cache.sync_version(version)
+    return (normalize_question(question), context_hash(history), model or settings.KIMI_MODEL, version, scope)
+
+
+class CachedAnswer(NamedTuple):
+    output: str
+    sql: str | None  # 回答背后的最后一条查询（用于导出），未知时为 None
+
+
+def get_answer(key: tuple) -> CachedAnswer | None:
+    """读取缓存回答；未启用或未命中返回 None"""
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    return _cache.get(key)
+
+
+def put_answer(key: tuple, answer: str, sql: str | None = None) -> None:
+    """写入回答（空回答不缓存）"""
+    if settings.ANSWER_CACHE_ENABLED and answer and answer.strip():
+        _cache.set(key, CachedAnswer(answer, sql))
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def stats() -> dict:
+    return _cache.stats()
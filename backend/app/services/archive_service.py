@@ -0,0 +1,359 @@
+"""
+冷会话归档：超过 ARCHIVE_IDLE_DAYS 未更新的会话，把消息、滚动摘要整体序列化压缩后移入归档库
+（sessions_archive.db，每会话一行），其引用的图表一并搬过去；热库只保留 sessions 行并标记 archived_at，
+会话列表不受影响，热库的 messages 表与索引只包含活跃会话（全文检索索引自带正文，保留已归档会话的消息）。
+
+- 归档：先写归档库并提交，再在热库的一个事务里标记并删除消息 / 摘要 / 孤立图表（先标记，检索触发器据此保留索引）；
+  标记时校验期间没有新消息（否则放弃，下次再归档），重复执行是安全的
+- 取回：get_session / session_exists 发现 archived_at 非空时调用 rehydrate_session，
+  消息按原 id 写回热库（已存在则跳过）、清除标记，再删除归档行
+- 整理：每轮归档后对热库 / 归档库执行 PRAGMA incremental_vacuum 归还空闲页；
+  新库建库时即启用增量模式，旧库需维护窗口内显式执行一次 convert_to_incremental（完整 VACUUM）
+storage_stats() 报告热库 / 冷库的文件大小、空闲页、会话数与压缩比。
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert
+
+from app.config import settings
+from app.database.connection import (
+    get_archive_db_engine,
+    get_archive_db_factory,
+    get_session_db_engine,
+    get_session_db_factory,
+)
+from app.database.models import (
+    ArchivedChartBlob,
+    ArchivedSession,
+    ChartBlob,
+    Message,
+    Session as SessionModel,
+    SessionSummary,
+)
+from app.services.chart_store import compress, decompress, delete_orphan_blobs
+from app.services.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+_stats = {"archived": 0, "rehydrated": 0, "skipped": 0, "vacuumed_pages": 0}
+
+
+def _dt(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _message_row(m: Message) -> dict:
+    return {
+        "id": m.id,
+        "role": m.role,
+        "content": m.content,
+        "chart_ref": m.chart_ref,
+        "chart_summary": m.chart_summary,
+        "query_sql": m.query_sql,
+        "created_at": _iso(m.created_at),
+    }
+
+
+def _delete_orphan_archive_blobs(refs: set[str]):
+    """删除 refs 中已没有任何归档会话引用的图表"""
+    return text(
+        "DELETE FROM chart_blobs WHERE hash IN (SELECT value FROM json_each(:refs)) "
+        "AND NOT EXISTS (SELECT 1 FROM archived_sessions a, json_each(a.chart_refs) r WHERE r.value = chart_blobs.hash)"
+    ).bindparams(refs=json.dumps(sorted(refs)))
+
+
+# ---------- 归档 ----------
+
+
+def archive_session(session_id: str, cutoff: datetime | None = None) -> bool:
+    """归档单个会话；会话不存在、已归档、cutoff 之后有更新或归档期间被修改时返回 False"""
+    hot = get_session_db_factory()
+    with hot() as db:
+        s = db.get(SessionModel, session_id)
+        if s is None or s.archived_at is not None or (cutoff is not None and s.updated_at >= cutoff):
+            return False
+        updated_at = s.updated_at
+        messages = db.execute(
+            select(Message).where(Message.session_id == session_id).order_by(Message.created_at, Message.id)
+        ).scalars().all()
+        summary = db.get(SessionSummary, session_id)
+        refs = sorted({m.chart_ref for m in messages if m.chart_ref})
+        blobs = db.execute(select(ChartBlob).where(ChartBlob.hash.in_(refs))).scalars().all() if refs else []
+        payload = {
+            "messages": [_message_row(m) for m in messages],
+            "summary": summary and {
+                "summary": summary.summary,
+                "summarized_until": _iso(summary.summarized_until),
+                "message_count": summary.message_count,
+                "updated_at": _iso(summary.updated_at),
+            },
+        }
+        blob_rows = [
+            {"hash": b.hash, "codec": b.codec, "data": b.data, "raw_size": b.raw_size, "created_at": b.created_at}
+            for b in blobs
+        ]
+
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    codec, data = compress(raw, settings.ARCHIVE_CODEC)
+    row = {
+        "session_id": session_id,
+        "message_count": len(payload["messages"]),
+        "chart_refs": refs,
+        "codec": codec,
+        "payload": data,
+        "raw_size": len(raw),
+        "updated_at": updated_at,
+        "archived_at": datetime.utcnow(),
+    }
+    cold = get_archive_db_factory()
+    with cold() as adb:
+        stmt = insert(ArchivedSession).values(**row)
+        adb.execute(stmt.on_conflict_do_update(index_elements=["session_id"], set_={k: stmt.excluded[k] for k in row}))
+        if blob_rows:
+            adb.execute(insert(ArchivedChartBlob).on_conflict_do_nothing(index_elements=["hash"]), blob_rows)
+        adb.commit()
+
+    # 新消息会把 updated_at 推到 cutoff 之后；未指定 cutoff 时要求 updated_at 与读取时一致
+    unchanged = SessionModel.updated_at < cutoff if cutoff is not None else SessionModel.updated_at == updated_at
+    with hot() as db:
+        marked = db.execute(
+            update(SessionModel)
+            .where(SessionModel.id == session_id, SessionModel.archived_at.is_(None), unchanged)
+            .values(archived_at=row["archived_at"], updated_at=SessionModel.updated_at)
+        ).rowcount
+        if not marked:
+            # 归档期间有新消息：热库保持不变，归档行留待下次覆盖
+            db.rollback()
+            _stats["skipped"] += 1
+            return False
+        db.execute(delete(Message).where(Message.session_id == session_id))
+        db.execute(delete(SessionSummary).where(SessionSummary.session_id == session_id))
+        if refs:
+            db.execute(delete_orphan_blobs(set(refs)))
+        db.commit()
+    _stats["archived"] += 1
+    return True
+
+
+def archive_idle_sessions(idle_days: float | None = None, limit: int | None = None) -> int:
+    """归档超过 idle_days 未更新的会话（最多 limit 个，最久未更新的优先），返回归档数"""
+    idle_days = settings.ARCHIVE_IDLE_DAYS if idle_days is None else idle_days
+    limit = settings.ARCHIVE_BATCH_SESSIONS if limit is None else limit
+    cutoff = datetime.utcnow() - timedelta(days=idle_days)
+    hot = get_session_db_factory()
+    with hot() as db:
+        ids = db.execute(
+            select(SessionModel.id)
+            .where(SessionModel.archived_at.is_(None), SessionModel.updated_at < cutoff)
+            .order_by(SessionModel.updated_at)
+            .limit(limit)
+        ).scalars().all()
+    return sum(1 for sid in ids if archive_session(sid, cutoff))
+
+
+# ---------- 取回 ----------
+
+
+def rehydrate_session(session_id: str) -> bool:
+    """把归档会话的消息 / 摘要 / 图表写回热库并清除标记；没有归档行时只清除标记"""
+    cold = get_archive_db_factory()
+    with cold() as adb:
+        archived = adb.get(ArchivedSession, session_id)
+        refs = list(archived.chart_refs or []) if archived else []
+        blobs = adb.execute(select(ArchivedChartBlob).where(ArchivedChartBlob.hash.in_(refs))).scalars().all() if refs else []
+        blob_rows = [
+            {"hash": b.hash, "codec": b.codec, "data": b.data, "raw_size": b.raw_size, "created_at": b.created_at}
+            for b in blobs
+        ]
+        payload = json.loads(decompress(archived.codec, archived.payload)) if archived else None
+
+    hot = get_session_db_factory()
+    with hot() as db:
+        if payload is None:
+            logger.warning("session %s is marked archived but has no archive row", session_id)
+        else:
+            if blob_rows:
+                db.execute(insert(ChartBlob).on_conflict_do_nothing(index_elements=["hash"]), blob_rows)
+            rows = [
+                {**m, "session_id": session_id, "created_at": _dt(m["created_at"])} for m in payload["messages"]
+            ]
+            if rows:
+                db.execute(insert(Message).on_conflict_do_nothing(index_elements=["id"]), rows)
+            summary = payload.get("summary")
+            if summary:
+                db.execute(
+                    insert(SessionSummary)
+                    .values(
+                        session_id=session_id,
+                        summary=summary["summary"],
+                        summarized_until=_dt(summary["summarized_until"]),
+                        message_count=summary["message_count"],
+                        updated_at=_dt(summary["updated_at"]),
+                    )
+                    .on_conflict_do_nothing(index_elements=["session_id"])
+                )
+        # 显式带上 updated_at，避免 onupdate 把取回当成一次更新
+        db.execute(
+            update(SessionModel)
+            .where(SessionModel.id == session_id)
+            .values(archived_at=None, updated_at=SessionModel.updated_at)
+        )
+        db.commit()
+
+    if archived is not None:
+        with cold() as adb:
+            adb.execute(delete(ArchivedSession).where(ArchivedSession.session_id == session_id))
+            if refs:
+                adb.execute(_delete_orphan_archive_blobs(set(refs)))
+            adb.commit()
+        _stats["rehydrated"] += 1
+    return payload is not None
+
+
+async def arehydrate_session(session_id: str) -> bool:
+    """rehydrate_session 的异步包装（在线程中执行）"""
+    return await asyncio.to_thread(rehydrate_session, session_id)
+
+
+def discard_archived(session_id: str) -> None:
+    """删除会话时一并删除其归档行与不再被引用的归档图表"""
+    cold = get_archive_db_factory()
+    with cold() as adb:
+        archived = adb.get(ArchivedSession, session_id)
+        if archived is None:
+            return
+        refs = set(archived.chart_refs or [])
+        adb.delete(archived)
+        if refs:
+            adb.flush()
+            adb.execute(_delete_orphan_archive_blobs(refs))
+        adb.commit()
+
+
+# ---------- 空间整理与统计 ----------
+
+
+def _vacuum(engine, pages: int) -> int:
+    """归还空闲页（incremental_vacuum）；未启用增量模式的旧库跳过，需显式执行 convert_to_incremental"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        before = conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+        if before:
+            # sqlite3 的 execute 只单步执行该 pragma（每次释放一页），executescript 会执行到底
+            conn.connection.dbapi_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        after = conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+    return before - after
+
+
+def convert_to_incremental() -> list[str]:
+    """
+    把未启用增量 vacuum 的热库 / 归档库转换为增量模式（一次完整 VACUUM，期间阻塞写入）。
+    只作为维护步骤显式执行（scripts/archive_sessions.py --vacuum），后台任务不会调用。返回被转换的库文件。
+    """
+    converted = []
+    for engine in (get_session_db_engine(), get_archive_db_engine()):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+                continue
+            logger.info("converting %s to incremental auto_vacuum (full VACUUM)", engine.url.database)
+            conn.connection.dbapi_connection.executescript("PRAGMA auto_vacuum=INCREMENTAL; VACUUM;")
+            converted.append(engine.url.database)
+    return converted
+
+
+def compact(pages: int | None = None) -> int:
+    """对热库与归档库归还空闲页，返回释放的页数"""
+    pages = settings.ARCHIVE_VACUUM_PAGES if pages is None else pages
+    freed = _vacuum(get_session_db_engine(), pages) + _vacuum(get_archive_db_engine(), pages)
+    _stats["vacuumed_pages"] += freed
+    return freed
+
+
+def run_archive_cycle() -> dict:
+    """一轮维护：归档空闲会话 + 整理空间"""
+    t0 = datetime.utcnow()
+    archived = archive_idle_sessions()
+    freed = compact()
+    observe_stage("archive", (datetime.utcnow() - t0).total_seconds())
+    return {"archived": archived, "freed_pages": freed}
+
+
+async def run_archive_loop(interval: float) -> None:
+    """后台定时归档（在线程中执行）；由 main.lifespan 启动、关闭时取消。首轮在启动 interval 秒后执行"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await asyncio.to_thread(run_archive_cycle)
+            if result["archived"] or result["freed_pages"]:
+                logger.info("archived %(archived)s idle sessions, freed %(freed_pages)s pages", result)
+        except Exception:
+            logger.exception("session archive failed")
+
+
+def _file_bytes(engine) -> int:
+    path = engine.url.database
+    if not path or path == ":memory:":
+        return 0
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def _db_stats(engine) -> dict:
+    with engine.connect() as conn:
+        page_size, page_count, free_pages, auto_vacuum = (
+            conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("page_size", "page_count", "freelist_count", "auto_vacuum")
+        )
+    return {
+        "incremental_vacuum": auto_vacuum == 2,
+        "file_bytes": _file_bytes(engine),
+        "used_bytes": (page_count - free_pages) * page_size,
+        "free_bytes": free_pages * page_size,
+    }
+
+
+def storage_stats() -> dict:
+    """热库 / 冷库的大小与会话数（用于监控与报告；不扫描 messages 表）"""
+    hot_engine, cold_engine = get_session_db_engine(), get_archive_db_engine()
+    with get_session_db_factory()() as db:
+        sessions = db.execute(select(func.count()).select_from(SessionModel)).scalar()
+        archived = db.execute(
+            select(func.count()).select_from(SessionModel).where(SessionModel.archived_at.is_not(None))
+        ).scalar()
+    with get_archive_db_factory()() as adb:
+        cold_sessions, cold_messages, payload_bytes, raw_bytes = adb.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(ArchivedSession.message_count), 0),
+                func.coalesce(func.sum(func.length(ArchivedSession.payload)), 0),
+                func.coalesce(func.sum(ArchivedSession.raw_size), 0),
+            )
+        ).one()
+    return {
+        "hot": {**_db_stats(hot_engine), "sessions": sessions - archived},
+        "cold": {
+            **_db_stats(cold_engine),
+            "sessions": cold_sessions,
+            "messages": cold_messages,
+            "payload_bytes": payload_bytes,
+            "raw_bytes": raw_bytes,
+            "compression_ratio": round(raw_bytes / payload_bytes, 2) if payload_bytes else 0,
+        },
+        **_stats,
+    }
+
+
+def stats() -> dict:
+    """/metrics 用的扁平统计"""
+    s = storage_stats()
+    flat = {f"{tier}_{k}": v for tier in ("hot", "cold") for k, v in s.pop(tier).items()}
+    return {**flat, **s}
@@ -0,0 +1,209 @@
+"""
+会话服务层（异步版）：基于 aiosqlite 的 sessions / messages CRUD，供 API 路由在事件循环内直接 await。
+已归档的会话（archived_at 非空）在 get_session / session_exists 时自动从归档库取回。
+"""
+import asyncio
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.orm import selectinload
+
+from app.database.connection import get_async_session_db_factory
+from app.database.models import Message, Session as SessionModel, SessionSummary
+from app.services.archive_service import arehydrate_session, discard_archived
+from app.services.chart_store import chart_record, delete_orphan_blobs, insert_chart_blob, summarize_chart
+from app.services.pagination import decode_cursor, encode_cursor
+
+
+async def create_session(title: str = "新对话") -> SessionModel:
+    """创建新会话"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        sid = str(uuid.uuid4())
+        now = datetime.utcnow()
+        s = SessionModel(id=sid, title=title, created_at=now, updated_at=now)
+        db.add(s)
+        await db.commit()
+        return s
+
+
+async def list_sessions(limit: int = 50, cursor: str | None = None) -> tuple[list[SessionModel], str | None]:
+    """
+    会话列表，按 (updated_at, id) 降序的 keyset 分页。
+    返回 (本页会话, 下一页游标)；游标为 None 表示没有更多。
+    """
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        stmt = select(SessionModel)
+        if cursor:
+            ts, sid = decode_cursor(cursor)
+            stmt = stmt.where(
+                or_(
+                    SessionModel.updated_at < ts,
+                    and_(SessionModel.updated_at == ts, SessionModel.id < sid),
+                )
+            )
+        stmt = stmt.order_by(SessionModel.updated_at.desc(), SessionModel.id.desc()).limit(limit + 1)
+        items = list((await db.execute(stmt)).scalars().all())
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].updated_at, items[-1].id)
+    return items, next_cursor
+
+
+async def get_session(session_id: str, with_messages: bool = True) -> SessionModel | None:
+    """获取会话；with_messages 时预加载全部消息，返回后可安全访问。已归档的会话先取回热库"""
+    factory = get_async_session_db_factory()
+    stmt = select(SessionModel).where(SessionModel.id == session_id)
+    if with_messages:
+        stmt = stmt.options(selectinload(SessionModel.messages))
+    async with factory() as db:
+        s = (await db.execute(stmt)).scalars().first()
+    if s is None or s.archived_at is None:
+        return s
+    await arehydrate_session(session_id)
+    async with factory() as db:
+        return (await db.execute(stmt)).scalars().first()
+
+
+async def get_messages_page(
+    session_id: str, limit: int = 50, before: str | None = None
+) -> tuple[list[Message], str | None]:
+    """
+    会话消息，按 (created_at, id) 从新到旧的 keyset 分页；before 为上一页返回的游标。
+    返回 (本页消息（新 -> 旧）, 更早一页的游标)。
+    """
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        stmt = select(Message).where(Message.session_id == session_id)
+        if before:
+            ts, mid = decode_cursor(before)
+            stmt = stmt.where(
+                or_(Message.created_at < ts, and_(Message.created_at == ts, Message.id < mid))
+            )
+        stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+        items = list((await db.execute(stmt)).scalars().all())
+    next_before = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_before = encode_cursor(items[-1].created_at, items[-1].id)
+    return items, next_before
+
+
+async def get_message(message_id: str) -> Message | None:
+    """按 id 获取单条消息"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        return await db.get(Message, message_id)
+
+
+async def session_exists(session_id: str) -> bool:
+    """仅校验会话是否存在（不加载消息）；已归档的会话先取回热库，之后的上下文读取与写入照常进行"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        result = await db.execute(select(SessionModel.archived_at).where(SessionModel.id == session_id))
+        row = result.first()
+    if row is None:
+        return False
+    if row.archived_at is not None:
+        await arehydrate_session(session_id)
+    return True
+
+
+async def rename_session(session_id: str, title: str) -> bool:
+    """重命名会话"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        s = await db.get(SessionModel, session_id)
+        if not s:
+            return False
+        s.title = title
+        s.updated_at = datetime.utcnow()
+        await db.commit()
+        return True
+
+
+async def delete_session(session_id: str) -> bool:
+    """删除会话（级联删除消息），并清理不再被引用的图表"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        result = await db.execute(
+            select(SessionModel)
+            .options(selectinload(SessionModel.messages))
+            .where(SessionModel.id == session_id)
+        )
+        s = result.scalars().first()
+        if not s:
+            return False
+        refs = {m.chart_ref for m in s.messages if m.chart_ref}
+        archived = s.archived_at is not None
+        await db.execute(delete(SessionSummary).where(SessionSummary.session_id == session_id))
+        await db.delete(s)
+        if refs:
+            await db.flush()
+            await db.execute(delete_orphan_blobs(refs))
+        await db.commit()
+    if archived:
+        await asyncio.to_thread(discard_archived, session_id)
+    return True
+
+
+async def get_recent_messages(session_id: str, limit: int = 10) -> list[Message]:
+    """获取会话最近 N 条消息（用于上下文），按时间正序返回"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        result = await db.execute(
+            select(Message)
+            .where(Message.session_id == session_id)
+            .order_by(Message.created_at.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())[::-1]
+
+
+async def get_context_messages(session_id: str, after: datetime | None = None, limit: int = 10) -> list[Message]:
+    """获取 after 之后（不含）的最近 N 条消息，按时间正序"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        stmt = select(Message).where(Message.session_id == session_id)
+        if after is not None:
+            stmt = stmt.where(Message.created_at > after)
+        result = await db.execute(stmt.order_by(Message.created_at.desc()).limit(limit))
+        return list(result.scalars().all())[::-1]
+
+
+async def get_session_summary(session_id: str) -> SessionSummary | None:
+    """获取会话滚动摘要"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        return await db.get(SessionSummary, session_id)
+
+
+async def add_message(
+    session_id: str, role: str, content: str, chart_data: dict | None = None, query_sql: str | None = None
+) -> Message:
+    """添加消息并更新会话 updated_at；图表写入 chart_blobs（同一事务），消息只存引用与摘要"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        mid = str(uuid.uuid4())
+        m = Message(
+            id=mid,
+            session_id=session_id,
+            role=role,
+            content=content,
+            query_sql=query_sql,
+            created_at=datetime.utcnow(),
+        )
+        if chart_data:
+            record = chart_record(chart_data)
+            await db.execute(insert_chart_blob(record))
+            m.chart_ref = record["hash"]
+            m.chart_summary = summarize_chart(chart_data)
+        db.add(m)
+        s = await db.get(SessionModel, session_id)
+        if s:
+            s.updated_at = datetime.utcnow()
+        await db.commit()
+        return m
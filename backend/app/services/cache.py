@@ -0,0 +1,108 @@
+"""进程内 LRU + TTL 缓存（线程安全），带命中统计，供回答缓存 / SQL 结果缓存等复用"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class LRUCache:
+    """
+    LRU + TTL 缓存。
+    - max_entries: 条目数上限，超出时淘汰最久未使用的条目
+    - ttl: 过期秒数（<=0 表示不过期）
+    - max_bytes / sizeof: 可选的总字节上限及单条大小估算函数，超出时按 LRU 淘汰
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 0,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda v: 0)
+        self._data: OrderedDict[Any, tuple[Any, float, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """读取并刷新 LRU 位置；过期条目视为未命中"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = item
+            if expires_at and expires_at < time.monotonic():
+                self._pop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value) -> bool:
+        """写入条目；单条超过 max_bytes 时不缓存并返回 False"""
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        expires_at = time.monotonic() + self.ttl if self.ttl and self.ttl > 0 else 0
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        """清空全部条目（计为一次失效）"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def sync_version(self, version) -> bool:
+        """传入外部数据版本；与上次不同则清空缓存并返回 True（数据变更自动失效）"""
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+        if changed:
+            self.clear()
+        return changed
+
+    def _pop(self, key) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """命中 / 未命中 / 淘汰等计数"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,118 @@
+"""
+图表内容寻址存储：ECharts option 规范化为 JSON（键排序、紧凑分隔符）后取 sha256 作为引用，
+压缩后写入 chart_blobs，相同图表只存一份。messages 只保存 chart_ref 与摘要，
+会话详情不再携带完整 option，前端通过 GET /api/charts/{hash} 按需获取（内容不变，可永久缓存）。
+
+压缩默认 zlib；安装 zstandard 且 CHART_CODEC=zstd 时使用 zstd（未安装时回退 zlib）。
+"""
+import hashlib
+import json
+import logging
+import re
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.sqlite import insert
+
+from app.config import settings
+from app.database.connection import get_async_session_db_factory
+from app.database.models import ChartBlob
+
+logger = logging.getLogger(__name__)
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+# 编码 -> HTTP Content-Encoding；zlib 格式即 HTTP 的 deflate
+CONTENT_ENCODINGS = {"zlib": "deflate", "zstd": "zstd"}
+
+
+def is_chart_ref(value: str) -> bool:
+    return bool(_HASH_RE.match(value or ""))
+
+
+def canonical_json(option: dict) -> bytes:
+    """规范化 JSON：同一图表无论键顺序如何都得到相同字节（从而相同哈希）"""
+    return json.dumps(option, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress(raw: bytes, codec: str | None = None) -> tuple[str, bytes]:
+    """按配置压缩，返回 (实际使用的编码, 压缩数据)"""
+    codec = codec or settings.CHART_CODEC
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is not None:
+            return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+        logger.warning("CHART_CODEC=zstd but zstandard is not installed, falling back to zlib")
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("图表以 zstd 压缩存储，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"未知的图表编码: {codec}")
+
+
+def summarize_chart(option: dict) -> dict:
+    """会话详情里随消息返回的图表摘要：标题、主图类型、序列数、最大点数"""
+    title = option.get("title")
+    if isinstance(title, list):
+        title = title[0] if title else None
+    series = option.get("series") or []
+    if isinstance(series, dict):
+        series = [series]
+    series = [s for s in series if isinstance(s, dict)]
+    return {
+        "title": (title.get("text") if isinstance(title, dict) else None) or "",
+        "type": next((s["type"] for s in series if s.get("type")), ""),
+        "series": len(series),
+        "points": max((len(s.get("data") or []) for s in series), default=0),
+    }
+
+
+def chart_record(option: dict) -> dict:
+    """把 option 编码为 chart_blobs 的一行（含 hash）"""
+    raw = canonical_json(option)
+    codec, data = compress(raw)
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "codec": codec,
+        "data": data,
+        "raw_size": len(raw),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def insert_chart_blob(record: dict):
+    """INSERT ... ON CONFLICT DO NOTHING：已存在相同哈希时不重复写入"""
+    return insert(ChartBlob).values(**record).on_conflict_do_nothing(index_elements=["hash"])
+
+
+def delete_orphan_blobs(refs: set[str]):
+    """删除 refs 中已没有任何消息引用的图表（删除会话后调用，依赖 ix_messages_chart_ref）"""
+    return text(
+        "DELETE FROM chart_blobs WHERE hash IN (SELECT value FROM json_each(:refs)) "
+        "AND NOT EXISTS (SELECT 1 FROM messages m WHERE m.chart_ref = chart_blobs.hash)"
+    ).bindparams(refs=json.dumps(sorted(refs)))
+
+
+async def load_chart_blob(ref: str) -> ChartBlob | None:
+    """按哈希读取压缩的图表"""
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        return (await db.execute(select(ChartBlob).where(ChartBlob.hash == ref))).scalars().first()
@@ -0,0 +1,158 @@
+"""
+对话上下文：滚动摘要 + 最近几条原始消息，控制在 token 预算内。
+
+- 每条助手消息落库后，在后台把「最近 CONTEXT_WINDOW_SIZE 条之前、尚未摘要」的消息增量折叠进摘要
+- 构建上下文时只取摘要水位线之后的最近几条原始消息，新消息优先，超出预算时截断 / 丢弃较早的消息
+这样长会话的 prompt 大小保持基本恒定，较早的上下文以摘要形式保留。
+"""
+import asyncio
+import logging
+import re
+
+from app.config import settings
+from app.services.session_service import (
+    get_session_summary,
+    get_unsummarized_messages,
+    save_session_summary,
+)
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """请把下面的新对话内容合并进已有的对话摘要，输出更新后的摘要。
+要求：保留用户关注的指标、筛选条件、时间范围、涉及的部门/产品以及关键数值结论；省略寒暄和图表配置；
+使用简洁的中文要点，不超过 {max_chars} 字，只输出摘要本身。
+
+【已有摘要】
+{summary}
+
+【新对话】
+{dialogue}"""
+
+# 单次折叠的消息数上限（历史很长的旧会话分多轮追平）
+_FOLD_BATCH = 40
+
+_CJK = re.compile(r"[　-鿿＀-￯]")
+
+# 正在更新摘要的会话，避免同一会话并发折叠
+_in_flight: set[str] = set()
+_tasks: set[asyncio.Task] = set()
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符约 1 token/字，其余约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    """从开头保留约 budget 个 token 的内容"""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + "…"
+
+
+def fit_context(summary: str, history: list, budget: int | None = None) -> list:
+    """
+    摘要（SystemMessage）+ 原始消息，整体不超过 token 预算。
+    从最新消息往前取，放不下的那条截断后停止；摘要最多占预算的一半。
+    """
+    from langchain_core.messages import SystemMessage
+
+    budget = budget or settings.CONTEXT_TOKEN_BUDGET
+    out = []
+    if summary:
+        if estimate_tokens(summary) > budget // 2:
+            summary = _truncate_to_tokens(summary, budget // 2)
+        budget -= estimate_tokens(summary)
+    kept = []
+    for m in reversed(history):
+        cost = estimate_tokens(m.content)
+        if cost <= budget:
+            kept.append(m)
+            budget -= cost
+            continue
+        if budget > 32:
+            kept.append(type(m)(content=_truncate_to_tokens(m.content, budget)))
+        break
+    if summary:
+        out.append(SystemMessage(content=summary))
+    out.extend(reversed(kept))
+    return out
+
+
+def _render_dialogue(msgs) -> str:
+    lines = []
+    for m in msgs:
+        content = m.content
+        if "[CHART]" in content:
+            content = content.split("[CHART]")[0].strip()
+        lines.append(("用户: " if m.role == "user" else "助手: ") + content)
+    return "\n".join(lines)
+
+
+def _fallback_summary(summary: str, msgs) -> str:
+    """LLM 不可用时的兜底：追加用户问题要点并截断"""
+    asked = "；".join(m.content[:60] for m in msgs if m.role == "user")
+    merged = (summary + "\n" if summary else "") + (f"用户曾询问：{asked}" if asked else "")
+    return merged[-settings.SUMMARY_MAX_CHARS:]
+
+
+def update_rolling_summary(session_id: str, llm=None) -> bool:
+    """
+    把水位线之后、最近 CONTEXT_WINDOW_SIZE 条之前的消息折叠进摘要。
+    返回是否有新内容被折叠。
+    """
+    row = get_session_summary(session_id)
+    until = row.summarized_until if row else None
+    pending = get_unsummarized_messages(
+        session_id, until, limit=_FOLD_BATCH + settings.CONTEXT_WINDOW_SIZE
+    )
+    to_fold = pending[: max(len(pending) - settings.CONTEXT_WINDOW_SIZE, 0)]
+    if not to_fold:
+        return False
+    summary = row.summary if row else ""
+    try:
+        from langchain_core.messages import HumanMessage
+
+        if llm is None:
+            from app.services.llm_service import _get_llm
+
+            llm = _get_llm()
+        prompt = SUMMARY_PROMPT.format(
+            max_chars=settings.SUMMARY_MAX_CHARS,
+            summary=summary or "（无）",
+            dialogue=_render_dialogue(to_fold),
+        )
+        new_summary = str(llm.invoke([HumanMessage(content=prompt)]).content).strip()
+    except Exception:
+        logger.exception("rolling summary LLM call failed, session=%s", session_id)
+        new_summary = _fallback_summary(summary, to_fold)
+    save_session_summary(session_id, new_summary[: settings.SUMMARY_MAX_CHARS * 2], to_fold[-1].created_at, len(to_fold))
+    return True
+
+
+async def _run_update(session_id: str) -> None:
+    try:
+        while await asyncio.to_thread(update_rolling_summary, session_id):
+            pass
+    except Exception:
+        logger.exception("rolling summary update failed, session=%s", session_id)
+    finally:
+        _in_flight.discard(session_id)
+
+
+def schedule_summary_update(session_id: str) -> None:
+    """在后台更新会话摘要（同一会话同时只有一个更新任务）"""
+    if not settings.SUMMARY_ENABLED or session_id in _in_flight:
+        return
+    _in_flight.add(session_id)
+    task = asyncio.create_task(_run_update(session_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
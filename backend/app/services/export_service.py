@@ -0,0 +1,332 @@
+"""
+查询结果批量导出：只读 SELECT 在业务库只读连接上按固定批次流式取数，编码为 CSV / NDJSON / Arrow IPC 流。
+
+- 取数在独立线程中进行：SQLite 游标边执行边返回（yield_per 分批），批次经有界队列交给响应，
+  内存占用与结果集大小无关
+- 可选 gzip（Content-Encoding）；编码后的字节同时写入落盘文件（spool），客户端中途断开时后台继续写完，
+  之后带 Range 的续传请求直接从落盘文件返回 206
+- ETag 由 规范化 SQL + 格式 + 是否压缩 + 业务库数据版本 决定，数据变化后旧的落盘文件自然失效
+Arrow 需要安装 pyarrow（可选依赖）。
+"""
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+from sqlalchemy.exc import DBAPIError
+
+from app.config import settings
+from app.database.connection import get_business_data_version, get_readonly_engine
+from app.services.metrics import observe_stage
+from app.services.sql_guard import QueryGuardError, check_query, execution_budget
+from app.services.sql_utils import canonicalize_sql, is_read_only_select
+
+logger = logging.getLogger(__name__)
+
+# 格式 -> (Content-Type, 文件扩展名)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson; charset=utf-8", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+QUEUE_CHUNKS = 4
+_END = object()
+_IDLE = object()
+
+
+class ExportError(Exception):
+    """导出请求无效（非只读查询、格式不支持等），对应 HTTP 400"""
+
+
+class ExportFormatUnavailable(ExportError):
+    """格式受支持但服务端缺少可选依赖（Arrow 需要 pyarrow），对应 HTTP 406"""
+
+
+@dataclass
+class ExportJob:
+    sql: str
+    fmt: str
+    gzip: bool
+    etag: str
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.fmt][0]
+
+    @property
+    def filename(self) -> str:
+        return export_filename(self.etag, self.fmt)
+
+
+def export_etag(sql: str, fmt: str, gzip: bool) -> str:
+    """ETag：规范化 SQL + 格式 + 是否压缩 + 业务库数据版本；不执行查询，可在条件请求时先行比较"""
+    key = "\0".join([canonicalize_sql(sql), fmt, "gzip" if gzip else "identity", get_business_data_version()])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:40]
+
+
+def export_filename(etag: str, fmt: str) -> str:
+    return f"export-{etag[:12]}.{FORMATS[fmt][1]}"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def available_formats() -> list[str]:
+    """当前环境可用的导出格式（未安装 pyarrow 时不含 arrow）"""
+    return [fmt for fmt in FORMATS if fmt != "arrow" or _pyarrow() is not None]
+
+
+def prepare_export(sql: str, fmt: str, gzip: bool = False) -> ExportJob:
+    """校验 SQL 与格式（只读、执行计划护栏），计算 ETag；不执行查询本身"""
+    if fmt not in FORMATS:
+        raise ExportError(f"不支持的导出格式: {fmt}（可选 {', '.join(FORMATS)}）")
+    if fmt not in available_formats():
+        raise ExportFormatUnavailable(
+            f"服务端未安装 pyarrow，无法导出 Arrow（pip install pyarrow）；当前可用格式: {', '.join(available_formats())}"
+        )
+    sql = sql.strip().rstrip(";").strip()
+    if not is_read_only_select(sql):
+        raise ExportError("只允许导出单条 SELECT 查询")
+    try:
+        with get_readonly_engine().connect() as conn:
+            check_query(conn, sql)
+    except QueryGuardError as e:
+        raise ExportError(str(e)) from e
+    except DBAPIError as e:
+        raise ExportError(f"SQL 无法执行: {e.orig}") from e
+    return ExportJob(sql=sql, fmt=fmt, gzip=gzip, etag=export_etag(sql, fmt, gzip))
+
+
+# ---------- 编码 ----------
+
+
+class _CsvEncoder:
+    def __init__(self, columns: list[str]):
+        self.columns = columns
+
+    @staticmethod
+    def _rows(rows) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+    def begin(self) -> bytes:
+        # UTF-8 BOM：Excel 打开含中文的 CSV 不乱码
+        return "\ufeff".encode("utf-8") + self._rows([self.columns])
+
+    def batch(self, rows) -> bytes:
+        return self._rows(rows)
+
+    def end(self) -> bytes:
+        return b""
+
+
+class _NdjsonEncoder:
+    def __init__(self, columns: list[str]):
+        self.columns = columns
+
+    def begin(self) -> bytes:
+        return b""
+
+    def batch(self, rows) -> bytes:
+        return "".join(
+            json.dumps(dict(zip(self.columns, row)), ensure_ascii=False, default=str) + "\n" for row in rows
+        ).encode("utf-8")
+
+    def end(self) -> bytes:
+        return b""
+
+
+class _ArrowEncoder:
+    """Arrow IPC 流：schema 由第一批推断（全空列按字符串处理），之后每批一个 RecordBatch"""
+
+    def __init__(self, columns: list[str]):
+        self.pa = _pyarrow()
+        self.columns = columns
+        self.sink = io.BytesIO()
+        self.schema = None
+        self.writer = None
+
+    def _open(self, types: list) -> None:
+        pa = self.pa
+        self.schema = pa.schema(
+            [pa.field(name, pa.string() if t == pa.null() else t) for name, t in zip(self.columns, types)]
+        )
+        self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def _drain(self) -> bytes:
+        data = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return data
+
+    def begin(self) -> bytes:
+        return b""
+
+    def batch(self, rows) -> bytes:
+        pa = self.pa
+        cols = [list(c) for c in zip(*rows)]
+        if self.writer is None:
+            self._open([pa.array(c).type for c in cols])
+        arrays = []
+        for field, values in zip(self.schema, cols):
+            if field.type == pa.string():
+                values = [None if v is None else str(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        return self._drain()
+
+    def end(self) -> bytes:
+        if self.writer is None:
+            self._open([self.pa.null()] * len(self.columns))
+        self.writer.close()
+        return self._drain()
+
+
+_ENCODERS = {"csv": _CsvEncoder, "ndjson": _NdjsonEncoder, "arrow": _ArrowEncoder}
+
+
+# ---------- 落盘文件（续传） ----------
+
+
+def _spool_dir() -> Path:
+    path = Path(settings.EXPORT_SPOOL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def spooled_file(job: ExportJob) -> Path | None:
+    """已完整生成的落盘文件；存在时刷新 mtime（按最近使用淘汰）"""
+    if not settings.EXPORT_SPOOL_ENABLED:
+        return None
+    path = _spool_dir() / job.etag
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def _prune_spool() -> None:
+    """落盘文件总大小超过 EXPORT_SPOOL_MAX_BYTES 时按最近使用时间淘汰"""
+    files = []
+    for p in _spool_dir().iterdir():
+        if p.is_file() and ".part-" not in p.name:
+            st = p.stat()
+            files.append((st.st_mtime, st.st_size, p))
+    total = sum(size for _, size, _ in files)
+    for _, size, p in sorted(files, key=lambda f: f[0]):
+        if total <= settings.EXPORT_SPOOL_MAX_BYTES:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+
+
+# ---------- 取数线程 ----------
+
+
+def _put(q: queue.Queue, item, detached: threading.Event) -> None:
+    while not detached.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _produce(job: ExportJob, q: queue.Queue, detached: threading.Event) -> None:
+    """执行查询并编码；detached 表示客户端已断开：有落盘时继续写完文件，否则尽快停止"""
+    t0 = time.perf_counter()
+    spool = settings.EXPORT_SPOOL_ENABLED
+    final = _spool_dir() / job.etag if spool else None
+    tmp = final.with_name(f"{job.etag}.part-{uuid.uuid4().hex[:8]}") if spool else None
+    f = open(tmp, "wb") if spool else None
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31) if job.gzip else None
+    ok = False
+    error = None
+
+    def emit(data: bytes) -> None:
+        if comp is not None:
+            data = comp.compress(data)
+        if not data:
+            return
+        if f is not None:
+            f.write(data)
+        _put(q, data, detached)
+
+    try:
+        with get_readonly_engine().connect() as conn:
+            # 只有 SQLite 取数计入 EXPORT_TIMEOUT_SECONDS；编码与等待慢客户端取走数据的时间不计
+            with execution_budget(conn, seconds=settings.EXPORT_TIMEOUT_SECONDS, steps=0) as budget:
+                result = conn.execution_options(yield_per=settings.EXPORT_BATCH_ROWS).exec_driver_sql(job.sql)
+                encoder = _ENCODERS[job.fmt](list(result.keys()))
+                with budget.paused():
+                    emit(encoder.begin())
+                for rows in result.partitions():
+                    if detached.is_set() and not spool:
+                        return
+                    with budget.paused():
+                        emit(encoder.batch(rows))
+                with budget.paused():
+                    emit(encoder.end())
+        if comp is not None:
+            tail = comp.flush()
+            if f is not None:
+                f.write(tail)
+            _put(q, tail, detached)
+        ok = True
+        observe_stage("export", time.perf_counter() - t0)
+    except Exception as e:
+        logger.exception("export failed: %s", job.sql[:200])
+        error = e
+    finally:
+        if f is not None:
+            f.close()
+            if ok:
+                os.replace(tmp, final)
+                _prune_spool()
+            else:
+                tmp.unlink(missing_ok=True)
+        _put(q, _END if error is None else error, detached)
+
+
+def _next(q: queue.Queue):
+    try:
+        return q.get(timeout=1)
+    except queue.Empty:
+        return _IDLE
+
+
+async def stream_export(job: ExportJob) -> AsyncIterator[bytes]:
+    """流式产出编码后的字节；导出失败时抛出异常（响应被中断，客户端可据此判断文件不完整）"""
+    q: queue.Queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+    detached = threading.Event()
+    threading.Thread(target=_produce, args=(job, q, detached), name="export", daemon=True).start()
+    try:
+        while True:
+            item = await asyncio.to_thread(_next, q)
+            if item is _IDLE:
+                continue
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        detached.set()
@@ -0,0 +1,447 @@
+"""
+会话结果帧：每个会话保留最近 FRAME_STORE_PER_SESSION 个查询结果（pandas DataFrame，列式存储），
+Agent 通过 analyze_frames 工具在其上做向量化运算（排序、Top N、环比、占比、透视、移动平均……），
+追问「上面的数据中哪个最高？」时既不用重新查库，也不用让 LLM 自己做算术。
+
+- 帧按会话内顺序命名 df1、df2……；相同来源（SQL）再次出现时原地更新，名字不变
+- 入库时压缩 dtype：整数按范围降位宽，重复度高的文本列转 category（浮点不降精度，金额不失真）
+- 所有会话的常驻帧总大小不超过 FRAME_STORE_MAX_BYTES，超出时按最近使用落盘（pickle），用到时再读回；
+  落盘文件总大小超过 FRAME_STORE_SPILL_MAX_BYTES 时最旧的帧直接丢弃
+进程内存储，多 worker 部署时各进程独立；帧缺失时 Agent 回退到重新查询。
+pandas 在首次存帧时才导入，不影响启动耗时。
+"""
+import atexit
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from app.config import settings
+from app.services.sql_utils import canonicalize_sql
+
+# 当前 Agent 执行所属的会话（analyze_frames 工具据此取帧）
+_session: ContextVar[str | None] = ContextVar("frame_session", default=None)
+
+CATEGORY_MAX_RATIO = 0.5
+AGG_FUNCS = {"sum": "合计", "mean": "平均", "max": "最大值", "min": "最小值", "count": "计数", "median": "中位数"}
+
+
+class FrameOpError(Exception):
+    """analyze_frames 的输入无效（帧不存在、列名错误、操作不支持等），以文本返回给 Agent"""
+
+
+@dataclass
+class Frame:
+    name: str
+    source: str
+    columns: list[str]
+    rows: int
+    truncated: bool
+    nbytes: int
+    df: Any = None  # pandas.DataFrame；None 表示已落盘
+    path: Path | None = None
+    used_at: float = field(default_factory=time.monotonic)
+
+    def summary(self) -> str:
+        more = "，已截断" if self.truncated else ""
+        return f"{self.name}（{self.rows} 行{more}）列: {', '.join(self.columns)}；来源: {self.source[:200]}"
+
+
+def _compact(df):
+    """压缩 dtype：整数降位宽、低基数文本转 category"""
+    import pandas as pd
+
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast="integer")
+        elif (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)) and len(s) >= 8:
+            if s.nunique(dropna=True) <= len(s) * CATEGORY_MAX_RATIO:
+                df[col] = s.astype("category")
+    return df
+
+
+def to_frame(result):
+    """QueryResult -> 压缩后的 DataFrame"""
+    import pandas as pd
+
+    return _compact(pd.DataFrame.from_records(result.rows, columns=list(result.columns)))
+
+
+class FrameStore:
+    def __init__(self, per_session: int, max_bytes: int, spill_dir: str, spill_max_bytes: int):
+        self.per_session = per_session
+        self.max_bytes = max_bytes
+        self.spill_max_bytes = spill_max_bytes
+        self._spill_root = spill_dir
+        self._spill_path: Path | None = None
+        self._sessions: dict[str, OrderedDict[str, Frame]] = {}
+        self._seq: dict[str, int] = {}
+        self._resident: OrderedDict[tuple[str, str], None] = OrderedDict()
+        self._spilled: OrderedDict[tuple[str, str], None] = OrderedDict()
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._lock = threading.RLock()
+        self.spills = 0
+        self.reloads = 0
+        self.discarded = 0
+
+    # ---------- 写入 ----------
+
+    def remember(self, session_id: str, results: list) -> list[str]:
+        """把一次回答中执行过的查询 [(来源, QueryResult)] 存为该会话的帧，返回帧名"""
+        names = []
+        for source, result in results or []:
+            if not result.columns or not result.rows:
+                continue
+            names.append(self.put(session_id, source, to_frame(result), result.truncated))
+        return names
+
+    def put(self, session_id: str, source: str, df, truncated: bool = False) -> str:
+        key_source = canonicalize_sql(source) or source
+        with self._lock:
+            frames = self._sessions.setdefault(session_id, OrderedDict())
+            name = next((f.name for f in frames.values() if (canonicalize_sql(f.source) or f.source) == key_source), None)
+            if name is not None:
+                self._remove(session_id, frames.pop(name))
+            else:
+                self._seq[session_id] = self._seq.get(session_id, 0) + 1
+                name = f"df{self._seq[session_id]}"
+            frame = Frame(
+                name=name,
+                source=source,
+                columns=[str(c) for c in df.columns],
+                rows=len(df),
+                truncated=truncated,
+                nbytes=int(df.memory_usage(deep=True).sum()),
+                df=df,
+            )
+            frames[name] = frame
+            self._resident[(session_id, name)] = None
+            self._bytes += frame.nbytes
+            while len(frames) > self.per_session:
+                _, oldest = frames.popitem(last=False)
+                self._remove(session_id, oldest)
+            self._evict()
+            return name
+
+    # ---------- 读取 ----------
+
+    def get(self, session_id: str, name: str) -> Frame | None:
+        """取帧（落盘的读回内存）并标记为最近使用"""
+        import pandas as pd
+
+        with self._lock:
+            frame = self._sessions.get(session_id, {}).get(name)
+            if frame is None:
+                return None
+            key = (session_id, name)
+            if frame.df is None:
+                frame.df = pd.read_pickle(frame.path)
+                frame.path.unlink(missing_ok=True)
+                frame.path = None
+                self._spilled.pop(key, None)
+                self._spill_bytes -= frame.nbytes
+                self._bytes += frame.nbytes
+                self.reloads += 1
+            self._resident[key] = None
+            self._resident.move_to_end(key)
+            frame.used_at = time.monotonic()
+            self._evict(keep=key)
+            return frame
+
+    def frames(self, session_id: str) -> list[Frame]:
+        with self._lock:
+            return list(self._sessions.get(session_id, {}).values())
+
+    def describe(self, session_id: str | None) -> str:
+        """给 Agent 的可用帧清单（每帧一行）；没有帧时返回空串"""
+        if not session_id:
+            return ""
+        return "\n".join(f"- {f.summary()}" for f in self.frames(session_id))
+
+    def drop_session(self, session_id: str) -> None:
+        with self._lock:
+            for frame in self._sessions.pop(session_id, {}).values():
+                self._remove(session_id, frame)
+            self._seq.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "resident": len(self._resident),
+                "resident_bytes": self._bytes,
+                "spilled": len(self._spilled),
+                "spilled_bytes": self._spill_bytes,
+                "spills": self.spills,
+                "reloads": self.reloads,
+                "discarded": self.discarded,
+            }
+
+    # ---------- 淘汰 / 落盘 ----------
+
+    def _remove(self, session_id: str, frame: Frame) -> None:
+        key = (session_id, frame.name)
+        if key in self._resident:
+            del self._resident[key]
+            self._bytes -= frame.nbytes
+        if key in self._spilled:
+            del self._spilled[key]
+            self._spill_bytes -= frame.nbytes
+            frame.path.unlink(missing_ok=True)
+        frame.df = None
+        frame.path = None
+
+    def _spill_dir(self) -> Path:
+        if self._spill_path is None:
+            Path(self._spill_root).mkdir(parents=True, exist_ok=True)
+            # 每个进程独立子目录，退出时删除
+            self._spill_path = Path(tempfile.mkdtemp(prefix="frames-", dir=self._spill_root))
+            atexit.register(shutil.rmtree, self._spill_path, True)
+        return self._spill_path
+
+    def _evict(self, keep: tuple[str, str] | None = None) -> None:
+        """常驻帧超出内存预算时按最近使用落盘；落盘超出上限时丢弃最旧的"""
+        while self._bytes > self.max_bytes and self._resident:
+            key = next(iter(self._resident))
+            if key == keep:
+                if len(self._resident) == 1:
+                    break
+                self._resident.move_to_end(key)
+                continue
+            session_id, name = key
+            frame = self._sessions[session_id][name]
+            digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:16]
+            frame.path = self._spill_dir() / f"{digest}-{name}.pkl"
+            frame.df.to_pickle(frame.path)
+            frame.df = None
+            del self._resident[key]
+            self._bytes -= frame.nbytes
+            self._spilled[key] = None
+            self._spill_bytes += frame.nbytes
+            self.spills += 1
+        while self._spill_bytes > self.spill_max_bytes and self._spilled:
+            session_id, name = next(iter(self._spilled))
+            frames = self._sessions[session_id]
+            self._remove(session_id, frames.pop(name))
+            if not frames:
+                del self._sessions[session_id]
+                self._seq.pop(session_id, None)
+            self.discarded += 1
+
+
+_store: FrameStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_frame_store() -> FrameStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FrameStore(
+                    per_session=settings.FRAME_STORE_PER_SESSION,
+                    max_bytes=settings.FRAME_STORE_MAX_BYTES,
+                    spill_dir=settings.FRAME_STORE_SPILL_DIR,
+                    spill_max_bytes=settings.FRAME_STORE_SPILL_MAX_BYTES,
+                )
+    return _store
+
+
+def remember_results(session_id: str | None, results: list | None) -> None:
+    """回答结束后把查询结果存为会话帧（未开启或无会话时忽略）"""
+    if settings.FRAME_STORE_ENABLED and session_id and results:
+        get_frame_store().remember(session_id, results)
+
+
+def frames_prompt(session_id: str | None) -> str:
+    return get_frame_store().describe(session_id) if settings.FRAME_STORE_ENABLED else ""
+
+
+@contextmanager
+def bind_session(session_id: str | None):
+    """with bind_session(session_id): ... 期间 analyze_frames 工具读取该会话的帧"""
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        try:
+            _session.reset(token)
+        except ValueError:
+            # 异步生成器在其他上下文中被关闭时无法 reset
+            _session.set(None)
+
+
+def current_session() -> str | None:
+    return _session.get()
+
+
+# ---------- 向量化操作 ----------
+
+
+def _cols(df, value, op: str) -> list[str]:
+    cols = [value] if isinstance(value, str) else list(value or [])
+    missing = [c for c in cols if c not in df.columns]
+    if not cols or missing:
+        raise FrameOpError(f"{op}: 列 {missing or value} 不存在，可用列: {', '.join(map(str, df.columns))}")
+    return cols
+
+
+def _func(value, op: str) -> str:
+    func = value or "sum"
+    if func not in AGG_FUNCS:
+        raise FrameOpError(f"{op}: 不支持的聚合函数 {func}（可选 {', '.join(sorted(AGG_FUNCS))}）")
+    return func
+
+
+def _sort(df, spec):
+    return df.sort_values(_cols(df, spec.get("by"), "sort"), ascending=not spec.get("desc", False))
+
+
+def _top(df, spec):
+    n = int(spec.get("n", 5))
+    cols = _cols(df, spec.get("by"), "top")
+    return df.nsmallest(n, cols) if spec.get("smallest") else df.nlargest(n, cols)
+
+
+def _head(df, spec):
+    return df.head(int(spec.get("n", 5)))
+
+
+def _filter(df, spec):
+    col = _cols(df, spec.get("column"), "filter")[0]
+    op, value, s = spec.get("cmp", "=="), spec.get("value"), df[col]
+    masks = {
+        "==": lambda: s == value,
+        "!=": lambda: s != value,
+        ">": lambda: s > value,
+        ">=": lambda: s >= value,
+        "<": lambda: s < value,
+        "<=": lambda: s <= value,
+        "in": lambda: s.isin(value if isinstance(value, list) else [value]),
+        "contains": lambda: s.astype(str).str.contains(str(value), regex=False),
+    }
+    if op not in masks:
+        raise FrameOpError(f"filter: 不支持的比较 {op}（可选 {', '.join(masks)}）")
+    return df[masks[op]()]
+
+
+def _select(df, spec):
+    return df[_cols(df, spec.get("columns"), "select")]
+
+
+def _groupby(df, spec):
+    by = _cols(df, spec.get("by"), "groupby")
+    values = _cols(df, spec.get("values"), "groupby")
+    return df.groupby(by, observed=True, sort=False)[values].agg(_func(spec.get("func"), "groupby")).reset_index()
+
+
+def _pct_change(df, spec):
+    periods = int(spec.get("periods", 1))
+    out = df.copy()
+    for col in _cols(df, spec.get("columns"), "pct_change"):
+        out[f"{col}变化率(%)"] = (out[col].astype(float).pct_change(periods=periods) * 100).round(2)
+    return out
+
+
+def _share(df, spec):
+    out = df.copy()
+    for col in _cols(df, spec.get("columns"), "share"):
+        total = out[col].astype(float).sum()
+        out[f"{col}占比(%)"] = (out[col].astype(float) / total * 100).round(2) if total else None
+    return out
+
+
+def _cumsum(df, spec):
+    out = df.copy()
+    for col in _cols(df, spec.get("columns"), "cumsum"):
+        out[f"{col}累计"] = out[col].cumsum()
+    return out
+
+
+def _rolling(df, spec):
+    window = int(spec.get("window", 3))
+    func = _func(spec.get("func", "mean"), "rolling")
+    out = df.copy()
+    for col in _cols(df, spec.get("columns"), "rolling"):
+        out[f"{col}{window}期移动{AGG_FUNCS[func]}"] = getattr(out[col].astype(float).rolling(window, min_periods=1), func)().round(4)
+    return out
+
+
+def _pivot(df, spec):
+    index = _cols(df, spec.get("index"), "pivot")
+    columns = _cols(df, spec.get("columns"), "pivot")
+    values = _cols(df, spec.get("values"), "pivot")[0]
+    out = df.pivot_table(
+        index=index, columns=columns, values=values, aggfunc=_func(spec.get("func"), "pivot"), observed=True
+    )
+    out.columns = [" / ".join(map(str, c)) if isinstance(c, tuple) else str(c) for c in out.columns]
+    return out.reset_index()
+
+
+def _describe(df, spec):
+    return df.describe().T.reset_index(names="列").round(4)
+
+
+OPS = {
+    "sort": _sort,
+    "top": _top,
+    "head": _head,
+    "filter": _filter,
+    "select": _select,
+    "groupby": _groupby,
+    "pct_change": _pct_change,
+    "share": _share,
+    "cumsum": _cumsum,
+    "rolling": _rolling,
+    "pivot": _pivot,
+    "describe": _describe,
+}
+
+
+def run_ops(df, ops: list[dict]):
+    """依次执行操作列表，返回新的 DataFrame（不修改原帧）"""
+    for spec in ops:
+        if not isinstance(spec, dict) or spec.get("op") not in OPS:
+            raise FrameOpError(f"不支持的操作: {spec}（可选 {', '.join(OPS)}）")
+        try:
+            df = OPS[spec["op"]](df, spec)
+        except FrameOpError:
+            raise
+        except (KeyError, ValueError, TypeError) as e:
+            raise FrameOpError(f"{spec['op']}: {e}") from e
+    return df
+
+
+def analyze(session_id: str | None, tool_input: str):
+    """
+    执行 analyze_frames 工具输入：{"frame": "df1", "ops": [{"op": ...}, ...]}。
+    返回 (来源描述, 结果 DataFrame)；输入无效抛 FrameOpError。
+    """
+    try:
+        spec = json.loads(tool_input.strip().strip("`").removeprefix("json").strip())
+    except json.JSONDecodeError as e:
+        raise FrameOpError(f"输入需为 JSON: {e}") from e
+    if not isinstance(spec, dict):
+        raise FrameOpError('输入需为 JSON 对象，如 {"frame": "df1", "ops": [{"op": "top", "by": "销售额", "n": 3}]}')
+    store = get_frame_store()
+    name = spec.get("frame")
+    frame = store.get(session_id, name) if session_id and name else None
+    if frame is None:
+        available = ", ".join(f.name for f in store.frames(session_id or "")) or "无"
+        raise FrameOpError(f"帧 {name} 不存在（可用: {available}），请改用 SQL 查询")
+    ops = spec.get("ops") or []
+    if not isinstance(ops, list):
+        raise FrameOpError("ops 需为操作列表")
+    result = run_ops(frame.df, ops)
+    source = f"-- {name} " + json.dumps(ops, ensure_ascii=False)
+    return source, result
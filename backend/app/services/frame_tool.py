@@ -0,0 +1,45 @@
+"""Agent 的 analyze_frames 工具：在会话已有的查询结果（帧）上做向量化运算，免去重新查库与 LLM 手算"""
+from langchain_core.tools import Tool
+
+from app.services.agent_db import record_query
+from app.services.frame_store import FrameOpError, analyze, current_session
+from app.services.metrics import timer
+from app.services.sql_cache import QueryResult
+
+TOOL_NAME = "analyze_frames"
+MAX_OUTPUT_ROWS = 100
+
+DESCRIPTION = (
+    "对本会话之前的查询结果（帧 df1、df2…，见问题中的「可用的历史查询结果」）做计算，无需重新执行 SQL。"
+    '输入为 JSON：{"frame": "df1", "ops": [操作, ...]}，操作依次执行。支持的操作：'
+    '{"op": "sort", "by": 列, "desc": true}；{"op": "top", "by": 列, "n": 3, "smallest": false}；'
+    '{"op": "head", "n": 5}；{"op": "filter", "column": 列, "cmp": "==|!=|>|>=|<|<=|in|contains", "value": 值}；'
+    '{"op": "select", "columns": [列]}；{"op": "groupby", "by": [列], "values": [列], "func": "sum|mean|max|min|count|median"}；'
+    '{"op": "pct_change", "columns": [列], "periods": 1}（环比，先按时间 sort）；{"op": "share", "columns": [列]}（占比）；'
+    '{"op": "cumsum", "columns": [列]}；{"op": "rolling", "columns": [列], "window": 3, "func": "mean"}（移动平均）；'
+    '{"op": "pivot", "index": [列], "columns": [列], "values": 列, "func": "sum"}；{"op": "describe"}。'
+    "列名须与帧的列完全一致。结果可直接用于回答与图表。"
+)
+
+
+def _rows(df) -> list[tuple]:
+    df = df.astype(object).where(df.notna(), None)
+    return [tuple(r) for r in df.to_dict(orient="split")["data"]]
+
+
+def _run(tool_input: str) -> str:
+    try:
+        with timer("frames"):
+            source, df = analyze(current_session(), tool_input)
+    except FrameOpError as e:
+        return f"Error: {e}"
+    result = QueryResult(columns=[str(c) for c in df.columns], rows=_rows(df))
+    record_query(source, result)
+    res = [dict(zip(result.columns, row)) for row in result.rows[:MAX_OUTPUT_ROWS]]
+    if len(result.rows) > MAX_OUTPUT_ROWS:
+        return f"{res}\n（共 {len(result.rows)} 行，仅显示前 {MAX_OUTPUT_ROWS} 行，可用 top / head 缩小结果）"
+    return str(res)
+
+
+def build_frame_tool() -> Tool:
+    return Tool(name=TOOL_NAME, description=DESCRIPTION, func=_run)
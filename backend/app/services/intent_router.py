@@ -0,0 +1,463 @@
+"""
+意图路由（快速通道）：常见分析问题匹配参数化查询模板，直接执行 SQL 并在本地生成文字与图表，
+未命中时再交给 LLM Agent。
+
+匹配流程：归一化问题 -> 抽取槽位（时间范围、Top N）并从文本中移除 -> 去除口语填充词 ->
+与模板正则整体匹配（fullmatch）。模板只覆盖不依赖上下文、含义无歧义的问题，
+带额外筛选条件或指代上文的问题都会落到 Agent。
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable
+
+from sqlalchemy import text
+
+from app.database.connection import get_engine
+from app.services.answer_cache import normalize_question
+from app.services.viz_service import build_echarts_option, chart_block
+
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_NUM = r"[0-9零一二两三四五六七八九十]+"
+
+# 指代上文的问题不走快速通道
+_FOLLOW_UP = re.compile(r"上面|上述|刚才|之前|前面|其中|这些|那些|它们|这个|那个|该")
+
+_FILLERS = [
+    "请问", "请", "帮我", "帮忙", "麻烦", "给我", "一下", "查询", "查查", "查一查", "查看", "看看", "统计", "列出",
+    "显示", "展示", "给出", "分析", "计算", "所有", "全部", "各个", "每个", "分别是多少", "分别是", "分别", "各有多少",
+    "是多少", "有多少", "多少", "情况", "是什么", "怎么样", "如何", "怎样", "数据", "的", "吗", "呢", "吧", "和",
+]
+
+
+def parse_cn_number(s: str) -> int | None:
+    """解析阿拉伯数字或不超过 99 的中文数字"""
+    if s.isdigit():
+        return int(s)
+    if "十" in s:
+        tens, _, ones = s.partition("十")
+        t = _CN_DIGITS.get(tens, 1) if tens else 1
+        o = _CN_DIGITS.get(ones, 0) if ones else 0
+        return t * 10 + o
+    if len(s) == 1 and s in _CN_DIGITS:
+        return _CN_DIGITS[s]
+    return None
+
+
+def _add_months(d: date, months: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 + months, 12)
+    return date(y, m + 1, 1)
+
+
+@dataclass
+class Slots:
+    """从问题中抽取的槽位"""
+
+    start: date | None = None  # 含
+    end: date | None = None  # 不含
+    top_n: int | None = None
+    range_label: str = ""
+
+    @property
+    def has_range(self) -> bool:
+        return self.start is not None or self.end is not None
+
+
+def _extract_range(q: str, anchor: Callable[[], date], slots: Slots) -> str:
+    """抽取时间范围槽位（只取第一个匹配的表达），返回移除后的文本"""
+    m = re.search(r"(\d{4}-\d{1,2}-\d{1,2})\s*(?:至|到|~|—)\s*(\d{4}-\d{1,2}-\d{1,2})", q)
+    if m:
+        slots.start = date.fromisoformat(_pad_date(m.group(1)))
+        slots.end = date.fromordinal(date.fromisoformat(_pad_date(m.group(2))).toordinal() + 1)
+        slots.range_label = f"{m.group(1)} 至 {m.group(2)}"
+        return q.replace(m.group(0), " ")
+
+    m = re.search(r"(\d{4})年(\d{1,2})月(?:份)?", q)
+    if m:
+        slots.start = date(int(m.group(1)), int(m.group(2)), 1)
+        slots.end = _add_months(slots.start, 1)
+        slots.range_label = f"{m.group(1)}年{int(m.group(2))}月"
+        return q.replace(m.group(0), " ")
+
+    m = re.search(r"(\d{4})年(?:度|全年)?", q)
+    if m:
+        slots.start = date(int(m.group(1)), 1, 1)
+        slots.end = date(int(m.group(1)) + 1, 1, 1)
+        slots.range_label = f"{m.group(1)}年"
+        return q.replace(m.group(0), " ")
+
+    m = re.search(rf"(?:最近|近|过去)({_NUM}|几)个?(月|年)", q)
+    if m:
+        n = 6 if m.group(1) == "几" else parse_cn_number(m.group(1))
+        if not n:
+            return q
+        months = n if m.group(2) == "月" else n * 12
+        slots.end = _add_months(anchor(), 1)
+        slots.start = _add_months(slots.end, -months)
+        slots.range_label = f"最近{n}个月" if m.group(2) == "月" else f"最近{n}年"
+        return q.replace(m.group(0), " ")
+
+    m = re.search(r"今年|去年|本月|上个?月", q)
+    if m:
+        base = anchor()
+        word = m.group(0)
+        if word == "今年":
+            slots.start, slots.end = date(base.year, 1, 1), date(base.year + 1, 1, 1)
+        elif word == "去年":
+            slots.start, slots.end = date(base.year - 1, 1, 1), date(base.year, 1, 1)
+        elif word == "本月":
+            slots.start = date(base.year, base.month, 1)
+            slots.end = _add_months(slots.start, 1)
+        else:
+            slots.end = date(base.year, base.month, 1)
+            slots.start = _add_months(slots.end, -1)
+        slots.range_label = word
+        return q.replace(word, " ")
+    return q
+
+
+def extract_slots(q: str, anchor: Callable[[], date]) -> tuple[str, Slots]:
+    """
+    抽取时间范围与 Top N 槽位，返回 (移除槽位后的文本, 槽位)。
+    相对时间（最近 N 个月、今年、上个月等）以业务库最新销售日期为基准，
+    保证在历史数据上同样能得到结果。
+    """
+    slots = Slots()
+    q = _extract_range(q, anchor, slots)
+    m = re.search(rf"(?:前|top\s*)({_NUM})(?:名|个|位|款|种)?", q)
+    if m:
+        n = parse_cn_number(m.group(1))
+        if n:
+            slots.top_n = n
+            q = q.replace(m.group(0), " ")
+    return q, slots
+
+
+def _pad_date(s: str) -> str:
+    y, mth, d = s.split("-")
+    return f"{int(y):04d}-{int(mth):02d}-{int(d):02d}"
+
+
+def strip_fillers(q: str) -> str:
+    """去除口语填充词、空白与标点，得到问题核心"""
+    for w in _FILLERS:
+        q = q.replace(w, "")
+    return re.sub(r"[\s,，。.?？!！:：;；、]+", "", q)
+
+
+@dataclass
+class QueryTemplate:
+    """参数化查询模板"""
+
+    name: str
+    pattern: re.Pattern
+    sql: str  # 可含 {date_filter}（WHERE 条件片段）与 :limit 参数
+    chart_type: str  # bar / line / pie
+    title: str
+    unit: str = ""
+    supports_range: bool = False
+    supports_top_n: bool = False
+    default_top_n: int | None = None
+    describe: Callable[["QueryTemplate", list[tuple], Slots], str] | None = None
+    hits: int = field(default=0, compare=False)
+
+
+def _fmt(v) -> str:
+    if isinstance(v, float):
+        return f"{v:,.2f}"
+    return str(v)
+
+
+def _describe_ranking(tpl: QueryTemplate, rows: list[tuple], slots: Slots) -> str:
+    lines = [f"- {r[0]}：{_fmt(r[1])}{tpl.unit}" for r in rows]
+    top, bottom = rows[0], rows[-1]
+    head = f"{slots.range_label}{tpl.title}如下（共 {len(rows)} 项）："
+    tail = f"其中最高的是「{top[0]}」（{_fmt(top[1])}{tpl.unit}）"
+    if len(rows) > 1:
+        tail += f"，最低的是「{bottom[0]}」（{_fmt(bottom[1])}{tpl.unit}）"
+    return head + "\n" + "\n".join(lines) + "\n\n" + tail + "。"
+
+
+def _describe_share(tpl: QueryTemplate, rows: list[tuple], slots: Slots) -> str:
+    total = sum(float(r[1] or 0) for r in rows) or 1.0
+    lines = [f"- {r[0]}：{_fmt(r[1])}{tpl.unit}，占比 {float(r[1] or 0) / total:.1%}" for r in rows]
+    top = rows[0]
+    return (
+        f"{slots.range_label}{tpl.title}如下（合计 {_fmt(total)}{tpl.unit}）：\n"
+        + "\n".join(lines)
+        + f"\n\n占比最高的是「{top[0]}」（{float(top[1] or 0) / total:.1%}）。"
+    )
+
+
+def _describe_trend(tpl: QueryTemplate, rows: list[tuple], slots: Slots) -> str:
+    lines = [f"- {r[0]}：{_fmt(r[1])}{tpl.unit}" for r in rows]
+    first, last = rows[0], rows[-1]
+    peak = max(rows, key=lambda r: float(r[1] or 0))
+    notes = []
+    if len(rows) > 1 and float(first[1] or 0):
+        change = (float(last[1] or 0) - float(first[1])) / float(first[1])
+        notes.append(f"期末较期初{'增长' if change >= 0 else '下降'} {abs(change):.1%}")
+    notes.append(f"峰值出现在 {peak[0]}（{_fmt(peak[1])}{tpl.unit}）")
+    head = f"{slots.range_label}{tpl.title}如下（{first[0]} 至 {last[0]}，共 {len(rows)} 个月）："
+    return head + "\n" + "\n".join(lines) + "\n\n" + "，".join(notes) + "。"
+
+
+_SALES_JOIN = (
+    "FROM sales_records s "
+    "JOIN products p ON p.id = s.product_id "
+    "JOIN employees e ON e.id = s.employee_id "
+    "JOIN departments d ON d.id = e.department_id "
+)
+
+TEMPLATES: list[QueryTemplate] = [
+    QueryTemplate(
+        name="department_headcount",
+        pattern=re.compile(r"各?部门(?:员工|职工|人员)?(?:人数|数量|总数)(?:对比|统计|分布)?|各?部门(?:有|各有)?(?:几个人|多少人)"),
+        sql=(
+            "SELECT d.name AS 部门, COUNT(e.id) AS 员工人数 "
+            "FROM departments d LEFT JOIN employees e ON e.department_id = d.id "
+            "GROUP BY d.id, d.name ORDER BY 员工人数 DESC"
+        ),
+        chart_type="bar",
+        title="各部门员工人数",
+        unit=" 人",
+        describe=_describe_ranking,
+    ),
+    QueryTemplate(
+        name="department_avg_salary",
+        pattern=re.compile(r"各?部门(?:员工)?平均(?:工资|薪资|薪水|月薪)(?:对比|排名)?"),
+        sql=(
+            "SELECT d.name AS 部门, ROUND(AVG(e.salary), 2) AS 平均薪资 "
+            "FROM departments d JOIN employees e ON e.department_id = d.id "
+            "GROUP BY d.id, d.name ORDER BY 平均薪资 DESC"
+        ),
+        chart_type="bar",
+        title="各部门平均薪资",
+        unit=" 元",
+        describe=_describe_ranking,
+    ),
+    QueryTemplate(
+        name="monthly_sales_trend",
+        pattern=re.compile(
+            r"(?:每月|月度|按月|各月|月)?销售(?:额|金额|业绩)?(?:趋势|走势|变化趋势|变化)(?:图)?"
+            r"|(?:每月|月度|按月|各月)销售(?:额|金额|业绩)?(?:统计|对比)?"
+        ),
+        sql=(
+            "SELECT strftime('%Y-%m', s.sale_date) AS 月份, ROUND(SUM(s.amount), 2) AS 销售额 "
+            "FROM sales_records s {date_filter} GROUP BY 月份 ORDER BY 月份"
+        ),
+        chart_type="line",
+        title="月度销售额趋势",
+        unit=" 元",
+        supports_range=True,
+        describe=_describe_trend,
+    ),
+    QueryTemplate(
+        name="category_sales_share",
+        pattern=re.compile(r"各?(?:产品)?(?:类别|品类|分类)(?:销售(?:额|金额)?)?(?:占比|比例|份额|分布|构成)"),
+        sql=(
+            "SELECT p.category AS 类别, ROUND(SUM(s.amount), 2) AS 销售额 "
+            "FROM sales_records s JOIN products p ON p.id = s.product_id {date_filter} "
+            "GROUP BY p.category ORDER BY 销售额 DESC"
+        ),
+        chart_type="pie",
+        title="各产品类别销售额占比",
+        unit=" 元",
+        supports_range=True,
+        describe=_describe_share,
+    ),
+    QueryTemplate(
+        name="department_sales",
+        pattern=re.compile(r"各?部门(?:销售额|销售金额|销售业绩|业绩)(?:对比|排名|统计)?|各?部门销售(?:对比|排名|统计)"),
+        sql=(
+            "SELECT d.name AS 部门, ROUND(SUM(s.amount), 2) AS 销售额 "
+            + _SALES_JOIN
+            + "{date_filter} GROUP BY d.id, d.name ORDER BY 销售额 DESC"
+        ),
+        chart_type="bar",
+        title="各部门销售额",
+        unit=" 元",
+        supports_range=True,
+        describe=_describe_ranking,
+    ),
+    QueryTemplate(
+        name="top_products",
+        pattern=re.compile(
+            r"(?:销售额|销量)?(?:最高|最好|最多)?产品(?:销售额|销售|销量)?(?:排名|排行)"
+            r"|(?:销售额|销量)?(?:最高|最好|最多)产品|畅销(?:产品|商品)(?:排名|排行)?"
+        ),
+        sql=(
+            "SELECT p.name AS 产品, ROUND(SUM(s.amount), 2) AS 销售额 "
+            "FROM sales_records s JOIN products p ON p.id = s.product_id {date_filter} "
+            "GROUP BY p.id, p.name ORDER BY 销售额 DESC LIMIT :limit"
+        ),
+        chart_type="bar",
+        title="产品销售额排名",
+        unit=" 元",
+        supports_range=True,
+        supports_top_n=True,
+        default_top_n=10,
+        describe=_describe_ranking,
+    ),
+    QueryTemplate(
+        name="top_employees",
+        pattern=re.compile(
+            r"(?:销售额|业绩)?(?:员工|销售人员|销售员)(?:销售额|销售|业绩)?(?:排名|排行)"
+            r"|(?:销售额|业绩)(?:最高|最好)(?:员工|销售人员|销售员)"
+        ),
+        sql=(
+            "SELECT e.name || '（' || d.name || '）' AS 员工, ROUND(SUM(s.amount), 2) AS 销售额 "
+            + _SALES_JOIN
+            + "{date_filter} GROUP BY e.id ORDER BY 销售额 DESC LIMIT :limit"
+        ),
+        chart_type="bar",
+        title="员工销售额排名",
+        unit=" 元",
+        supports_range=True,
+        supports_top_n=True,
+        default_top_n=10,
+        describe=_describe_ranking,
+    ),
+]
+
+
+@dataclass
+class RoutedAnswer:
+    """快速通道产出：文字、图表 option 以及执行的 SQL"""
+
+    template: str
+    text: str
+    option: dict | None
+    sql: str
+    rows: list[tuple]
+    columns: list[str]
+    params: dict = field(default_factory=dict)
+
+    def to_response(self) -> str:
+        """与 Agent 回答相同的格式（文字 + [CHART] 段落）"""
+        if self.option:
+            return self.text + "\n\n" + chart_block(self.option)
+        return self.text
+
+
+class IntentRouter:
+    """模板注册表 + 命中统计"""
+
+    def __init__(self, templates: list[QueryTemplate], engine_getter=get_engine):
+        self.templates = list(templates)
+        self._engine_getter = engine_getter
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.seconds_total = 0.0
+
+    def register(self, template: QueryTemplate) -> None:
+        self.templates.append(template)
+
+    def _latest_sale_date(self) -> date:
+        with self._engine_getter().connect() as conn:
+            v = conn.execute(text("SELECT MAX(sale_date) FROM sales_records")).scalar()
+        if not v:
+            return date.today()
+        return v if isinstance(v, date) else date.fromisoformat(str(v)[:10])
+
+    def match(self, question: str) -> tuple[QueryTemplate, Slots] | None:
+        """匹配模板；不执行 SQL"""
+        q = normalize_question(question)
+        if _FOLLOW_UP.search(q):
+            return None
+        anchor_cache: list[date] = []
+
+        def anchor() -> date:
+            if not anchor_cache:
+                anchor_cache.append(self._latest_sale_date())
+            return anchor_cache[0]
+
+        rest, slots = extract_slots(q, anchor)
+        core = strip_fillers(rest)
+        # 「销售额前 5 的产品」去掉槽位后只剩名词，按排名类问题处理
+        candidates = [core, core + "排名"] if slots.top_n else [core]
+        for tpl in self.templates:
+            if not any(tpl.pattern.fullmatch(c) for c in candidates):
+                continue
+            if slots.has_range and not tpl.supports_range:
+                continue
+            if slots.top_n and not tpl.supports_top_n:
+                continue
+            return tpl, slots
+        return None
+
+    def execute(self, tpl: QueryTemplate, slots: Slots) -> RoutedAnswer | None:
+        """执行模板 SQL 并生成文字与图表；无数据时返回 None（交给 Agent 解释）"""
+        conds, params = [], {}
+        if slots.start:
+            conds.append("s.sale_date >= :start")
+            params["start"] = slots.start.isoformat()
+        if slots.end:
+            conds.append("s.sale_date < :end")
+            params["end"] = slots.end.isoformat()
+        if tpl.supports_top_n:
+            params["limit"] = slots.top_n or tpl.default_top_n
+        sql = tpl.sql.format(date_filter=("WHERE " + " AND ".join(conds)) if conds else "")
+        with self._engine_getter().connect() as conn:
+            cursor = conn.execute(text(sql), params)
+            columns = list(cursor.keys())
+            rows = [tuple(r) for r in cursor.fetchall()]
+        if not rows:
+            return None
+        title = f"{slots.range_label}{tpl.title}"
+        if slots.top_n:
+            title += f"（前 {slots.top_n}）"
+        option = build_echarts_option(
+            tpl.chart_type,
+            title,
+            [r[0] for r in rows],
+            {columns[1]: [r[1] for r in rows]},
+        )
+        body = tpl.describe(tpl, rows, slots) if tpl.describe else ""
+        return RoutedAnswer(tpl.name, body, option, sql, rows, columns, params)
+
+    def route(self, question: str) -> RoutedAnswer | None:
+        """匹配并执行；未命中 / 无数据 / 执行失败返回 None，由调用方回退到 Agent"""
+        start = time.perf_counter()
+        answer = None
+        try:
+            matched = self.match(question)
+            if matched:
+                answer = self.execute(*matched)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            answer = None
+        with self._lock:
+            if answer:
+                self.hits += 1
+                matched[0].hits += 1
+                self.seconds_total += time.perf_counter() - start
+            else:
+                self.misses += 1
+        return answer
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "avg_hit_seconds": round(self.seconds_total / self.hits, 6) if self.hits else 0.0,
+            "templates": {t.name: t.hits for t in self.templates},
+        }
+
+
+_router: IntentRouter | None = None
+
+
+def get_router() -> IntentRouter:
+    global _router
+    if _router is None:
+        _router = IntentRouter(TEMPLATES)
+    return _router
@@ -0,0 +1,48 @@
+"""LLM 调用指标回调：记录每次调用的耗时与 token 数（依赖 langchain_core，随 LLM 一起按需导入）"""
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.services.context_service import estimate_tokens
+from app.services.metrics import observe_stage, record_llm_tokens
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """记录每次 LLM 调用的耗时与 token 数（接口未返回 usage 时按字符估算）"""
+
+    run_inline = True
+
+    def __init__(self):
+        self._starts: dict = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        text = "".join(str(m.content) for batch in messages for m in batch)
+        self._starts[run_id] = (time.perf_counter(), estimate_tokens(text))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = (time.perf_counter(), estimate_tokens("".join(prompts)))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        t0, prompt_estimate = start
+        observe_stage("llm", time.perf_counter() - t0)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        generations = [g for gens in response.generations for g in gens]
+        if completion is None:
+            meta = getattr(getattr(generations[0], "message", None), "usage_metadata", None) if generations else None
+            if meta:
+                prompt, completion = meta.get("input_tokens"), meta.get("output_tokens")
+        if completion is None:
+            completion = estimate_tokens("".join(g.text for g in generations))
+        record_llm_tokens(prompt or prompt_estimate, completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            observe_stage("llm_error", time.perf_counter() - start[0])
+
+
+LLM_METRICS = LLMMetricsHandler()
@@ -1,44 +1,76 @@
-"""Kimi LLM 接入、LangChain SQL Agent、上下文记忆"""
-from langchain_community.agent_toolkits.sql.base import create_sql_agent
-from langchain_community.utilities.sql_database import SQLDatabase
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain_openai import ChatOpenAI
+"""
+Kimi LLM 接入、LangChain SQL Agent、上下文记忆。
+
+LangChain / langchain_openai / langchain_community 导入较慢，本模块只在用到时才导入
+（函数内 import），应用启动时由 warmup 在后台预先加载，不拖慢进程启动与 /health。
+"""
+import asyncio
 
 from app.config import settings
-from app.database.connection import get_database_url
-from app.services.session_service import get_recent_messages
+from app.database.connection import get_readonly_engine
+from app.database.rollups import ROLLUP_DESCRIPTIONS, STATE_TABLE
+from app.services import answer_cache, plan_cache, singleflight
+from app.services.agent_pool import get_scheduler
+from app.services.async_session_service import (
+    get_context_messages as async_get_context_messages,
+    get_session_summary as async_get_session_summary,
+)
+from app.services.context_service import fit_context
+from app.services.frame_store import bind_session, frames_prompt, remember_results
+from app.services.intent_router import get_router
+from app.services.metrics import CHAT_PATH_TOTAL, timer
+from app.services.sql_cache import QueryResult
+from app.services.sql_utils import inline_params, is_read_only_select
+from app.services.viz_service import resolve_chart_spec
 
-# SQL Agent 单例（延迟初始化）
-_agent = None
+# SQLDatabase 单例（延迟初始化；Agent 实例由 agent_pool 调度器的 worker 槽位各自持有）
+_db = None
 
 
 def _get_llm():
+    from langchain_openai import ChatOpenAI
+
+    from app.services.llm_metrics import LLM_METRICS
+
     return ChatOpenAI(
         model=settings.KIMI_MODEL,
         openai_api_key=settings.KIMI_API_KEY,
         openai_api_base=settings.KIMI_BASE_URL,
         temperature=0.3,
+        callbacks=[LLM_METRICS],
     )
 
 
 def _get_db():
-    url = get_database_url()
-    return SQLDatabase.from_uri(url)
-
-
-def get_sql_agent():
-    """获取或创建 SQL Agent"""
-    global _agent
-    if _agent is None:
-        llm = _get_llm()
-        db = _get_db()
-        _agent = create_sql_agent(
-            llm=llm,
-            db=db,
-            agent_type="zero-shot-react-description",
-            verbose=True,
-        )
-    return _agent
+    """Agent 共用的 SQLDatabase（只读连接；构造时会反射表结构，只做一次）"""
+    global _db
+    if _db is None:
+        from app.services.agent_db import AgentSQLDatabase
+
+        # 未启用汇总表时不刷新，表中数据会过期，不让 Agent 看到
+        ignore = [STATE_TABLE] if settings.ROLLUP_ENABLED else [STATE_TABLE, *ROLLUP_DESCRIPTIONS]
+        _db = AgentSQLDatabase(get_readonly_engine(), ignore_tables=ignore)
+    return _db
+
+
+def build_sql_agent():
+    """新建一个 SQL Agent 实例（调度器的每个 worker 槽位各持有一个）"""
+    from langchain_community.agent_toolkits.sql.base import create_sql_agent
+
+    extra_tools = []
+    if settings.FRAME_STORE_ENABLED:
+        from app.services.frame_tool import build_frame_tool
+
+        extra_tools.append(build_frame_tool())
+    return create_sql_agent(
+        llm=_get_llm(),
+        db=_get_db(),
+        agent_type="zero-shot-react-description",
+        verbose=True,
+        # 返回中间步骤，用于提取最终执行的 SQL（计划缓存）
+        agent_executor_kwargs={"return_intermediate_steps": True},
+        extra_tools=extra_tools,
+    )
 
 
 SYSTEM_PREFIX = """你是一个智能数据分析助手，基于 SQLite 数据库回答用户问题。
@@ -52,24 +84,28 @@ SYSTEM_PREFIX = """你是一个智能数据分析助手，基于 SQLite 数据
 规则：
 1. 只执行 SELECT 查询，禁止 INSERT/UPDATE/DELETE。
 2. 根据用户问题写出正确的 SQL 并执行，用自然语言总结结果。
-3. 若查询结果适合可视化（如对比、趋势、占比），在回答末尾附带 ECharts 图表配置，格式如下：
-
-[CHART]
-{
-  "title": {"text": "图表标题"},
-  "xAxis": {"type": "category", "data": ["A", "B", "C"]},
-  "yAxis": {"type": "value"},
-  "series": [{"type": "bar", "data": [10, 20, 30]}]
-}
-[/CHART]
-
-4. 图表 JSON 必须使用上述结构的有效 ECharts option，xAxis.data 和 series[0].data 来自查询结果。
+3. 若查询结果适合可视化（如对比、趋势、占比），在回答末尾附带图表说明，格式如下：
+
+[CHART]{"type": "bar", "x": "部门", "y": ["销售额"], "title": "图表标题"}[/CHART]
+
+4. type 为 bar / line / pie；x、y 为最后一次查询结果的列名（SELECT 中的别名）。不要写入数据，系统会用查询结果绘图。
 """
 
 
-def build_chat_history(session_id: str) -> list:
-    """从数据库加载最近 N 条消息，构建 LangChain 消息列表"""
-    msgs = get_recent_messages(session_id, limit=settings.CONTEXT_WINDOW_SIZE)
+CHART_HINT = (
+    "\n\n若查询结果适合可视化（如对比、趋势、占比），请在回答末尾附带图表说明："
+    '[CHART]{"type": "bar|line|pie", "x": "类目列名", "y": ["数值列名"], "title": "图表标题"}[/CHART]。'
+    "x、y 使用最后一次 SQL 查询结果的列名（建议在 SELECT 中用 AS 起中文别名），不要写入数据，系统会根据查询结果自动绘图。"
+)
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+CHART_MARKER = "[CHART]"
+
+
+def _history_from_messages(msgs) -> list:
+    """消息 ORM 列表 -> LangChain 消息列表（助手消息去除 [CHART] 部分）"""
+    from langchain_core.messages import AIMessage, HumanMessage
+
     history = []
     for m in msgs:
         if m.role == "user":
@@ -83,22 +119,282 @@ def build_chat_history(session_id: str) -> list:
     return history
 
 
-def invoke_agent(question: str, session_id: str | None = None) -> str:
+async def abuild_chat_history(session_id: str) -> list:
     """
-    调用 SQL Agent 回答用户问题。
-    若有 session_id 则加载最近消息作为上下文注入到 input。
-    返回完整回答（含可能的 [CHART]...[/CHART]）
+    构建上下文消息列表：滚动摘要（SystemMessage）+ 摘要水位线之后的最近 N 条消息，
+    整体控制在 CONTEXT_TOKEN_BUDGET 内（走 aiosqlite，不阻塞事件循环）
     """
-    agent = get_sql_agent()
-    chart_hint = "\n\n若查询结果适合可视化（如对比、趋势、占比），请在回答末尾附带 [CHART]{...ECharts option JSON...}[/CHART] 格式的图表配置。"
-    input_text = question + chart_hint
-    if session_id:
-        history = build_chat_history(session_id)
-        if history:
-            ctx = "\n".join(
-                ("用户: " + m.content) if isinstance(m, HumanMessage) else ("助手: " + m.content)
-                for m in history
-            )
-            input_text = f"【历史对话上下文】\n{ctx}\n\n【当前用户问题】\n{question}{chart_hint}"
-    result = agent.invoke({"input": input_text})
-    return result.get("output", str(result)) if isinstance(result, dict) else str(result)
+    row = await async_get_session_summary(session_id)
+    msgs = await async_get_context_messages(
+        session_id,
+        after=row.summarized_until if row else None,
+        limit=settings.CONTEXT_WINDOW_SIZE,
+    )
+    return fit_context(row.summary if row else "", _history_from_messages(msgs))
+
+
+FRAMES_HINT = (
+    "以下是本会话之前的查询结果，追问涉及这些数据（排序、Top N、环比、占比、移动平均、透视等）时"
+    "优先用 analyze_frames 工具直接计算，不要重新查询，也不要自己心算："
+)
+
+
+def build_agent_input(question: str, history: list, frames: str = "") -> str:
+    """拼接历史上下文、会话中可用的结果帧与当前问题，得到 Agent 的 input 文本"""
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    frames_block = f"【可用的历史查询结果】\n{FRAMES_HINT}\n{frames}\n\n" if frames else ""
+    if not history:
+        return frames_block + question + CHART_HINT
+    summary = "\n".join(m.content for m in history if isinstance(m, SystemMessage))
+    ctx = "\n".join(
+        ("用户: " + m.content) if isinstance(m, HumanMessage) else ("助手: " + m.content)
+        for m in history
+        if not isinstance(m, SystemMessage)
+    )
+    head = f"【历史对话摘要】\n{summary}\n\n" if summary else ""
+    return f"{head}【历史对话上下文】\n{ctx}\n\n{frames_block}【当前用户问题】\n{question}{CHART_HINT}"
+
+
+PLAN_ANSWER_PROMPT = """你是一个智能数据分析助手。下面的 SQL 已在 SQLite 业务库上执行，请根据查询结果用自然语言回答用户问题，不要编造结果中没有的数据。
+
+【用户问题】
+{question}
+
+【执行的 SQL】
+{sql}
+
+【查询结果】
+{result}
+{chart_hint}"""
+
+
+def _is_context_free(question: str, history: list) -> bool:
+    """历史中只有当前问题本身（或无历史）时，生成的 SQL 不依赖上文，可作为计划保存"""
+    return not history or (len(history) == 1 and history[0].content == question)
+
+
+def _run_plan_sql(plan) -> str | None:
+    """执行计划 SQL，返回结果文本；出错或无结果返回 None"""
+    try:
+        result = _get_db().run(plan.sql, include_columns=True)
+    except Exception:
+        return None
+    return result or None
+
+
+def _plan_prompt(question: str, sql: str, result: str) -> str:
+    return PLAN_ANSWER_PROMPT.format(question=question, sql=sql, result=result, chart_hint=CHART_HINT)
+
+
+def _last_sql(captured: list) -> str | None:
+    """回答背后的 SQL：本次执行中最后一条返回了结果集的查询（跳过 analyze_frames 运算）"""
+    return next((command for command, _ in reversed(captured) if is_read_only_select(command)), None)
+
+
+def _remember_plan(question: str, history: list, intermediate_steps) -> None:
+    if _is_context_free(question, history):
+        sql = plan_cache.extract_final_sql(intermediate_steps)
+        if sql:
+            plan_cache.save_plan(question, sql)
+
+
+def _routed_results(routed) -> list:
+    """快速通道的结果集，与 capture_queries 的 [(SQL, QueryResult)] 同构"""
+    return [(inline_params(routed.sql, routed.params), QueryResult(columns=list(routed.columns), rows=routed.rows))]
+
+
+class FinalAnswerStreamer:
+    """
+    从 ReAct 的逐 token 输出中筛出「Final Answer:」之后的文字。
+    每次 LLM 调用单独累积；[CHART] 之后的图表 JSON 不再下发（由结束时统一解析）。
+    为避免标记被切分在两个 token 之间，尾部保留可能是标记前缀的几个字符。
+    marker=None 时整段输出都视为回答（用于直接调用 LLM 组织回答的场景）。
+    """
+
+    def __init__(self, marker: str | None = FINAL_ANSWER_MARKER):
+        self.marker = marker
+        self._buffers: dict[str, str] = {}
+        self._emitted: dict[str, int] = {}
+
+    def feed(self, run_id: str, token: str) -> str:
+        """喂入某次 LLM 调用的新 token，返回本次可下发的增量文字"""
+        buf = self._buffers.get(run_id, "") + token
+        self._buffers[run_id] = buf
+        if self.marker is None:
+            answer = buf.lstrip()
+        else:
+            idx = buf.find(self.marker)
+            if idx < 0:
+                return ""
+            answer = buf[idx + len(self.marker):].lstrip()
+        chart_idx = answer.find(CHART_MARKER)
+        if chart_idx >= 0:
+            visible = answer[:chart_idx]
+        else:
+            visible = answer[: len(answer) - _partial_suffix_len(answer, CHART_MARKER)]
+        start = self._emitted.get(run_id, 0)
+        if len(visible) <= start:
+            return ""
+        self._emitted[run_id] = len(visible)
+        return visible[start:]
+
+
+def _partial_suffix_len(text: str, marker: str) -> int:
+    """text 末尾与 marker 前缀重合的最长长度"""
+    for n in range(min(len(marker) - 1, len(text)), 0, -1):
+        if text.endswith(marker[:n]):
+            return n
+    return 0
+
+
+async def astream_agent(question: str, session_id: str | None = None, agent=None):
+    """
+    异步流式调用 SQL Agent，逐个产出事件字典：
+    - {"type": "step", "tool": 工具名, "input": 工具输入}  Agent 调用工具（如执行 SQL）
+    - {"type": "token", "text": 增量文字}               最终回答的 token
+    - {"type": "final", "output": 完整回答, "sql": SQL}  结束，含可能的 [CHART]...[/CHART]；
+      sql 为回答背后的最后一条查询（参数已内联，可用于导出），未知时为 None
+    依次尝试：意图路由快速通道 -> 回答缓存 -> （请求合并）SQL 计划缓存 -> Agent。
+    agent 可注入（如使用假流式模型构建的 Agent）；默认经 agent_pool 调度器获取 worker 槽位上的 Agent。
+    """
+    if settings.INTENT_ROUTER_ENABLED:
+        routed = await asyncio.to_thread(get_router().route, question)
+        if routed:
+            CHAT_PATH_TOTAL.inc(path="fast_path")
+            await asyncio.to_thread(remember_results, session_id, _routed_results(routed))
+            yield {"type": "step", "tool": "fast_path", "input": routed.sql}
+            yield {
+                "type": "final",
+                "output": routed.to_response(),
+                "sql": inline_params(routed.sql, routed.params),
+                "fast_path": routed.template,
+            }
+            return
+
+    with timer("session_load"):
+        history = await abuild_chat_history(session_id) if session_id else []
+    # 会话有结果帧时 Agent 输入与 analyze_frames 都依赖本会话的帧：缓存与请求合并限定在本会话的当前帧上
+    frames = frames_prompt(session_id)
+    scope = answer_cache.frames_scope(session_id, frames) if frames else None
+    cache_key = await asyncio.to_thread(answer_cache.make_key, question, history, None, scope)
+    cached = answer_cache.get_answer(cache_key)
+    if cached is not None:
+        CHAT_PATH_TOTAL.inc(path="answer_cache")
+        yield {"type": "final", "output": cached.output, "sql": cached.sql, "cached": True}
+        return
+
+    # 相同问题 + 上下文 + 数据版本（+ 会话结果帧）的并发请求共享同一次执行
+    if settings.SINGLE_FLIGHT_ENABLED:
+        events = singleflight.stream(
+            cache_key, lambda: _answer_stream(question, history, session_id, cache_key, frames, agent)
+        )
+    else:
+        events = _answer_stream(question, history, session_id, cache_key, frames, agent)
+    async for ev in events:
+        if ev["type"] == "final" and "results" in ev:
+            # 执行过的查询存为本会话的结果帧；事件可能被多个订阅者共享，复制后再去掉
+            await asyncio.to_thread(remember_results, session_id, ev["results"])
+            ev = {k: v for k, v in ev.items() if k != "results"}
+        yield ev
+
+
+async def _answer_stream(
+    question: str, history: list, session_id: str | None, cache_key: tuple, frames: str = "", agent=None
+):
+    """回答缓存未命中后的流式执行：SQL 计划缓存 -> Agent，结果写入回答缓存"""
+    from app.services.agent_db import capture_queries
+
+    plan = await asyncio.to_thread(plan_cache.lookup_plan, question)
+    if plan:
+        output = None
+        with capture_queries() as captured:
+            async for ev in _stream_plan_answer(question, plan):
+                if ev["type"] == "final":
+                    output = ev["output"] = resolve_chart_spec(ev["output"], captured)
+                    ev["sql"] = plan.sql
+                    ev["results"] = list(captured)
+                yield ev
+        if output is not None:
+            CHAT_PATH_TOTAL.inc(path="plan")
+            answer_cache.put_answer(cache_key, output, plan.sql)
+            return
+
+    input_text = build_agent_input(question, history, frames)
+    output = ""
+    sql = steps = None
+    CHAT_PATH_TOTAL.inc(path="agent")
+    if agent is not None:
+        with timer("agent"), capture_queries() as captured, bind_session(session_id):
+            async for ev in _stream_agent_events(agent, input_text):
+                if ev["type"] == "final":
+                    ev["output"] = resolve_chart_spec(ev["output"], captured)
+                    ev["sql"] = sql = _last_sql(captured)
+                    ev["results"] = list(captured)
+                    output, steps = ev["output"], ev.pop("steps", None)
+                yield ev
+    else:
+        # 经调度器排队获取 worker 槽位；队列满时抛 QueueFullError
+        async with get_scheduler().slot(session_id or "") as slot:
+            with timer("agent"), capture_queries() as captured, bind_session(session_id):
+                async for ev in _stream_agent_events(slot.agent, input_text):
+                    if ev["type"] == "final":
+                        ev["output"] = resolve_chart_spec(ev["output"], captured)
+                        ev["sql"] = sql = _last_sql(captured)
+                        ev["results"] = list(captured)
+                        output, steps = ev["output"], ev.pop("steps", None)
+                    yield ev
+    answer_cache.put_answer(cache_key, output, sql)
+    await asyncio.to_thread(_remember_plan, question, history, steps)
+
+
+async def _stream_plan_answer(question: str, plan):
+    """复用计划：重跑 SQL 后流式调用一次 LLM；SQL 失败时不产出 final（调用方回退到 Agent）"""
+    result = await asyncio.to_thread(_run_plan_sql, plan)
+    if result is None:
+        await asyncio.to_thread(plan_cache.record_result, plan.id, False)
+        return
+    yield {"type": "step", "tool": "sql_plan", "input": plan.sql}
+    streamer = FinalAnswerStreamer(marker=None)
+    parts = []
+    async for chunk in _get_llm().astream(_plan_prompt(question, plan.sql, result)):
+        token = chunk.content if isinstance(chunk.content, str) else ""
+        if not token:
+            continue
+        parts.append(token)
+        delta = streamer.feed("plan", token)
+        if delta:
+            yield {"type": "token", "text": delta}
+    await asyncio.to_thread(plan_cache.record_result, plan.id, True)
+    yield {"type": "final", "output": "".join(parts)}
+
+
+async def _stream_agent_events(agent, input_text: str):
+    """驱动 agent.astream_events，转换为 step / token / final 事件"""
+    streamer = FinalAnswerStreamer()
+    output = None
+    steps = None
+    async for ev in agent.astream_events({"input": input_text}, version="v2"):
+        kind = ev["event"]
+        if kind == "on_chat_model_stream" or kind == "on_llm_stream":
+            chunk = ev["data"].get("chunk")
+            token = getattr(chunk, "content", None)
+            if token is None:
+                token = getattr(chunk, "text", chunk)
+            if isinstance(token, str) and token:
+                delta = streamer.feed(ev["run_id"], token)
+                if delta:
+                    yield {"type": "token", "text": delta}
+        elif kind == "on_tool_start":
+            tool_input = ev["data"].get("input")
+            if isinstance(tool_input, dict):
+                tool_input = tool_input.get("tool_input", tool_input.get("query", tool_input))
+            yield {"type": "step", "tool": ev.get("name", ""), "input": str(tool_input)}
+        elif kind == "on_chain_end" and not ev.get("parent_ids"):
+            result = ev["data"].get("output")
+            if isinstance(result, dict):
+                output = result.get("output", str(result))
+                steps = result.get("intermediate_steps")
+            else:
+                output = str(result)
+    yield {"type": "final", "output": output or "", "steps": steps}
@@ -0,0 +1,215 @@
+"""
+进程内指标：分阶段耗时直方图 + 计数器，/metrics 以 Prometheus 文本格式导出。
+
+- timer(stage) 记录一个阶段的耗时（会话加载、LLM 调用、SQL 执行、图表解析、消息落库等）
+- 请求级 Server-Timing：ServerTimingMiddleware 为匹配的路径开启收集，期间所有 timer 的耗时
+  按阶段累加后写入响应头（仅用于非流式接口）
+本模块不依赖其他业务模块，可被任意服务层导入。
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PREFIX = "smartdata"
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384)
+
+# 当前请求的 Server-Timing 收集器（阶段 -> 累计秒数）；None 表示未开启
+_server_timing: ContextVar[dict | None] = ContextVar("server_timing", default=None)
+
+
+class Histogram:
+    """固定分桶直方图，按标签组合分别统计"""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket_counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if idx < len(self.buckets):
+                series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in sorted(self._series.items())]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(labels, le=_fmt(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels, le='+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """单调递增计数器，按标签组合分别统计"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(k)} {_fmt(v)}" for k, v in items)
+        return lines
+
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+STAGE_SECONDS = Histogram(f"{PREFIX}_stage_seconds", "各处理阶段耗时（秒）", TIME_BUCKETS)
+HTTP_SECONDS = Histogram(f"{PREFIX}_http_request_seconds", "HTTP 请求耗时（秒，流式接口为首字节前）", TIME_BUCKETS)
+LLM_TOKENS = Histogram(f"{PREFIX}_llm_call_tokens", "单次 LLM 调用 token 数", TOKEN_BUCKETS)
+LLM_TOKENS_TOTAL = Counter(f"{PREFIX}_llm_tokens_total", "LLM token 总数（无 usage 时为估算值）")
+SQL_ROWS = Histogram(f"{PREFIX}_sql_rows", "单次 SQL 工具调用返回行数", ROW_BUCKETS)
+SQL_QUERIES_TOTAL = Counter(f"{PREFIX}_sql_queries_total", "Agent SQL 执行次数")
+CHAT_PATH_TOTAL = Counter(f"{PREFIX}_chat_answers_total", "按回答路径统计的聊天回答数")
+
+_REGISTRY = [STAGE_SECONDS, HTTP_SECONDS, LLM_TOKENS, LLM_TOKENS_TOTAL, SQL_ROWS, SQL_QUERIES_TOTAL, CHAT_PATH_TOTAL]
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """记录阶段耗时；若当前请求开启了 Server-Timing，一并累加"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _server_timing.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timer(stage: str):
+    """with timer("sql"): ...  记录代码块耗时（同步 / 异步代码均可用）"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - t0)
+
+
+def record_llm_tokens(prompt: int, completion: int) -> None:
+    LLM_TOKENS.observe(prompt, kind="prompt")
+    LLM_TOKENS.observe(completion, kind="completion")
+    LLM_TOKENS_TOTAL.inc(prompt, kind="prompt")
+    LLM_TOKENS_TOTAL.inc(completion, kind="completion")
+
+
+def record_sql(rows: int, cached: bool) -> None:
+    SQL_ROWS.observe(rows)
+    SQL_QUERIES_TOTAL.inc(source="cache" if cached else "db")
+
+
+def _component_gauges() -> list[str]:
+    """缓存、调度器、意图路由的 stats() 以 gauge 形式导出"""
+    from app.services import agent_pool, answer_cache, archive_service, singleflight, sql_cache
+    from app.services.frame_store import get_frame_store
+    from app.services.intent_router import get_router
+
+    router_stats = dict(get_router().stats())
+    templates = router_stats.pop("templates", {})
+    components = {
+        "answer_cache": answer_cache.stats(),
+        "sql_cache": sql_cache.stats(),
+        "scheduler": agent_pool.scheduler_stats(),
+        "singleflight": singleflight.stats(),
+        "frames": get_frame_store().stats(),
+        "archive": archive_service.stats(),
+        "intent_router": router_stats,
+    }
+    lines = []
+    for component, stats in components.items():
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{PREFIX}_{component}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_fmt(value)}")
+    name = f"{PREFIX}_intent_router_template_hits"
+    lines.append(f"# TYPE {name} gauge")
+    lines.extend(f'{name}{{template="{_escape(t)}"}} {n}' for t, n in templates.items())
+    return lines
+
+
+def render_prometheus() -> str:
+    """全部指标的 Prometheus 文本格式"""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(_component_gauges())
+    return "\n".join(lines) + "\n"
+
+
+class ServerTimingMiddleware:
+    """
+    纯 ASGI 中间件：记录每个 HTTP 请求的耗时（按路由模板分组）；
+    对 paths 前缀下的请求收集阶段耗时，在响应头写入 Server-Timing（如 `db;dur=1.2, total;dur=3.4`）。
+    不包装响应体，对 SSE 等流式响应没有影响。
+    """
+
+    def __init__(self, app, paths: tuple[str, ...] = ("/api/sessions",)):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        timings = {} if scope["path"].startswith(self.paths) else None
+        token = _server_timing.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - t0
+                route = getattr(scope.get("route"), "path", "unmatched")
+                HTTP_SECONDS.observe(elapsed, method=scope["method"], route=route)
+                if timings is not None:
+                    parts = [f"{k};dur={v * 1000:.2f}" for k, v in timings.items()]
+                    parts.append(f"total;dur={elapsed * 1000:.2f}")
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(parts).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _server_timing.reset(token)
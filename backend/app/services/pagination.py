@@ -0,0 +1,22 @@
+"""Keyset（游标）分页：游标为排序键取值的 base64url(JSON)，对客户端不透明"""
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(ts: datetime, key: str) -> str:
+    raw = json.dumps([ts.isoformat(), key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, key = json.loads(raw)
+        return datetime.fromisoformat(ts), str(key)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("invalid cursor") from e
@@ -0,0 +1,102 @@
+"""
+SQL 计划缓存：记住 Agent 为某个问题最终执行的 SQL，之后相同问题直接重跑该 SQL，
+只需一次 LLM 调用来组织回答，省去完整的 ReAct 多轮推理。
+
+- 只记录无历史上下文时产生的计划（问题本身自洽，不依赖上文指代）
+- SQL 必须通过只读校验
+- 每条计划维护成功 / 失败计数，失败过多的计划被删除
+"""
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database.connection import get_session_db_factory
+from app.database.models import SqlPlan
+from app.services.answer_cache import normalize_question
+from app.services.sql_utils import is_read_only_select
+
+SQL_QUERY_TOOL = "sql_db_query"
+
+
+def extract_final_sql(intermediate_steps) -> str | None:
+    """从 AgentExecutor 的 intermediate_steps 中取最后一次执行成功的 sql_db_query 输入"""
+    final_sql = None
+    for step in intermediate_steps or []:
+        try:
+            action, observation = step
+        except (TypeError, ValueError):
+            continue
+        if getattr(action, "tool", None) != SQL_QUERY_TOOL:
+            continue
+        if isinstance(observation, str) and observation.lstrip().startswith("Error"):
+            continue
+        tool_input = action.tool_input
+        if isinstance(tool_input, dict):
+            tool_input = tool_input.get("query") or tool_input.get("tool_input")
+        if isinstance(tool_input, str) and tool_input.strip():
+            final_sql = tool_input.strip().strip("`").strip()
+    return final_sql
+
+
+def lookup_plan(question: str) -> SqlPlan | None:
+    """按归一化问题查找计划"""
+    if not settings.PLAN_CACHE_ENABLED:
+        return None
+    factory = get_session_db_factory()
+    db = factory()
+    try:
+        return db.query(SqlPlan).filter(SqlPlan.question == normalize_question(question)).first()
+    finally:
+        db.close()
+
+
+def save_plan(question: str, sql: str) -> bool:
+    """保存 / 覆盖计划；SQL 未通过只读校验时不保存"""
+    if not settings.PLAN_CACHE_ENABLED or not is_read_only_select(sql):
+        return False
+    key = normalize_question(question)
+    factory = get_session_db_factory()
+    db = factory()
+    try:
+        now = datetime.utcnow()
+        plan = db.query(SqlPlan).filter(SqlPlan.question == key).first()
+        if plan:
+            if plan.sql != sql:
+                plan.sql = sql
+                plan.success_count = 0
+                plan.failure_count = 0
+            plan.last_used_at = now
+        else:
+            db.add(SqlPlan(question=key, sql=sql, created_at=now, last_used_at=now))
+        db.commit()
+        return True
+    except IntegrityError:
+        # 并发保存同一问题，以先写入者为准
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def record_result(plan_id: int, ok: bool) -> None:
+    """记录一次复用结果；失败次数达到阈值且失败多于成功时删除该计划"""
+    factory = get_session_db_factory()
+    db = factory()
+    try:
+        plan = db.get(SqlPlan, plan_id)
+        if not plan:
+            return
+        plan.last_used_at = datetime.utcnow()
+        if ok:
+            plan.success_count += 1
+        else:
+            plan.failure_count += 1
+            if (
+                plan.failure_count >= settings.PLAN_CACHE_MAX_FAILURES
+                and plan.failure_count > plan.success_count
+            ):
+                db.delete(plan)
+        db.commit()
+    finally:
+        db.close()
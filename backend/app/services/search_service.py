@@ -0,0 +1,201 @@
+"""
+会话检索：在会话标题与消息正文上全文检索（迁移 v6 的 FTS5 trigram 索引，自带正文，由触发器随增删改同步）。
+
+- 查询按空白拆成词（双引号括起的短语算一个词），词之间为 AND；不少于 3 个字的词走 FTS5 MATCH（子串匹配，英文不区分大小写），
+  按 bm25 排序（只给最近 SEARCH_RANK_WINDOW 个命中打分，标题权重高于正文），摘要片段由 FTS5 snippet() 生成
+- trigram 无法索引不足 3 个字的词（如「预算」）：与长词同时出现时作为 LIKE 过滤条件；
+  全部是短词时退化为扫描索引中的正文（SQLite 不支持 trigram 时扫描 sessions / messages），标题命中在前、消息按写入倒序
+- 索引不依赖热库 messages 表：已归档会话的消息照常可搜，点开时会话被取回热库
+片段中的命中词以 HIGHLIGHT_OPEN / HIGHLIGHT_CLOSE（\\x02 / \\x03）包围，由前端渲染高亮。
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database.connection import get_async_session_db_factory
+
+HIGHLIGHT_OPEN = "\x02"
+HIGHLIGHT_CLOSE = "\x03"
+ELLIPSIS = "…"
+MIN_FTS_CHARS = 3
+MAX_TERMS = 8
+
+SNIPPET = "snippet(search_fts, -1, :open, :close, :ellipsis, :tokens)"
+
+# bm25 只在最近的 :window 个命中文档（search_docs.id 随写入递增）内计算，高频词也不必给全部命中打分；
+# 会话标题数量少，窗口之外的标题命中另取一支，保证标题不会因为会话较早而被挤出
+FTS_SQL = f"""
+WITH recent AS (
+    SELECT COALESCE(MIN(rowid), 0) AS floor FROM (
+        SELECT rowid FROM search_fts WHERE search_fts MATCH :match ORDER BY rowid DESC LIMIT :window
+    )
+),
+hits AS (
+    SELECT rowid AS id, rank AS score, {SNIPPET} AS snippet FROM search_fts
+    WHERE search_fts MATCH :match AND rowid >= (SELECT floor FROM recent){{filters}}
+    UNION ALL
+    SELECT rowid, rank, {SNIPPET} FROM search_fts
+    WHERE search_fts MATCH :title_match AND rowid < (SELECT floor FROM recent){{filters}}
+    ORDER BY score, id DESC
+    LIMIT :limit OFFSET :offset
+)
+SELECT d.session_id, d.message_id, s.title AS session_title, d.role,
+       COALESCE(d.created_at, s.updated_at) AS created_at, hits.snippet, hits.score
+FROM hits
+JOIN search_docs d ON d.id = hits.id
+JOIN sessions s ON s.id = d.session_id
+ORDER BY hits.score, hits.id DESC
+"""
+
+# 扫描模式：标题（会话表小）在前按 updated_at 倒序；消息按 rowid（写入顺序）倒序顺序扫描，
+# 常见短词很快凑满一页即停止，最坏情况为一次全表扫描。有索引时扫描索引中的正文（含已归档会话）
+TITLE_SCAN_SQL = """
+SELECT s.id AS session_id, NULL AS message_id, s.title AS session_title, NULL AS role,
+       s.updated_at AS created_at, s.title AS body
+FROM sessions s WHERE {filters}
+ORDER BY s.updated_at DESC, s.id DESC
+LIMIT :limit
+"""
+
+MESSAGE_SCAN_SQL = """
+SELECT m.session_id, m.id AS message_id, s.title AS session_title, m.role, m.created_at, m.content AS body
+FROM messages m JOIN sessions s ON s.id = m.session_id
+WHERE {filters}
+ORDER BY m.rowid DESC
+LIMIT :limit OFFSET :offset
+"""
+
+DOC_SCAN_SQL = """
+SELECT d.session_id, d.message_id, s.title AS session_title, d.role, d.created_at, f.content AS body
+FROM search_fts f
+JOIN search_docs d ON d.id = f.rowid
+JOIN sessions s ON s.id = d.session_id
+WHERE {filters}
+ORDER BY f.rowid DESC
+LIMIT :limit OFFSET :offset
+"""
+
+
+@dataclass
+class SearchHit:
+    session_id: str
+    session_title: str
+    message_id: str | None  # None 表示命中会话标题
+    role: str | None
+    snippet: str
+    created_at: datetime
+    score: float | None  # bm25（越小越相关）；扫描模式下为 None
+
+
+_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def parse_terms(query: str) -> list[str]:
+    """按空白拆词（双引号内作为一个词，可含空格），去重并保持顺序，最多 MAX_TERMS 个"""
+    terms = []
+    for quoted, word in _TERM.findall(query):
+        term = (quoted or word).strip()
+        if term and term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _phrase(term: str) -> str:
+    """FTS5 短语，双引号转义"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _snippet(body: str, terms: list[str], width: int) -> str:
+    """扫描模式下的摘要：以第一个命中为中心截取 width 个字符并标注命中词"""
+    lower = body.lower()
+    positions = [p for p in (lower.find(t.lower()) for t in terms) if p >= 0]
+    start = max(0, min(positions, default=0) - width // 3)
+    end = min(len(body), start + width)
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    piece = pattern.sub(lambda m: f"{HIGHLIGHT_OPEN}{m.group(0)}{HIGHLIGHT_CLOSE}", body[start:end])
+    return (ELLIPSIS if start else "") + piece + (ELLIPSIS if end < len(body) else "")
+
+
+async def _fts_available(db) -> bool:
+    row = (await db.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_fts'"))).first()
+    return row is not None
+
+
+def _likes(column: str, count: int) -> str:
+    return " AND ".join(f"{column} LIKE :like{i} ESCAPE '\\'" for i in range(count))
+
+
+async def _fts_search(db, long_terms: list[str], short_terms: list[str], params: dict) -> list[SearchHit]:
+    match = " ".join(_phrase(t) for t in long_terms)
+    params.update(
+        match=match,
+        title_match=f"{{title}} : ({match})",
+        window=settings.SEARCH_RANK_WINDOW,
+        open=HIGHLIGHT_OPEN,
+        close=HIGHLIGHT_CLOSE,
+        ellipsis=ELLIPSIS,
+        tokens=settings.SEARCH_SNIPPET_CHARS,
+    )
+    filters = f" AND {_likes('COALESCE(search_fts.content, search_fts.title)', len(short_terms))}" if short_terms else ""
+    rows = (await db.execute(text(FTS_SQL.format(filters=filters)), params)).all()
+    return [_hit(r, r.snippet, r.score) for r in rows]
+
+
+async def _scan_search(db, terms: list[str], limit: int, offset: int, params: dict, fts: bool) -> list[SearchHit]:
+    """标题命中排在消息命中之前；先取到 offset + limit + 1 个标题，不够一页时再从消息中补"""
+    title_sql = TITLE_SCAN_SQL.format(filters=_likes("s.title", len(terms)))
+    titles = (await db.execute(text(title_sql), {**params, "limit": offset + limit + 1})).all()
+    rows = list(titles[offset:])
+    if len(rows) <= limit:
+        if fts:
+            message_sql = DOC_SCAN_SQL.format(filters=_likes("f.content", len(terms)))
+        else:
+            message_sql = MESSAGE_SCAN_SQL.format(filters=_likes("m.content", len(terms)))
+        messages = await db.execute(
+            text(message_sql),
+            {**params, "limit": limit + 1 - len(rows), "offset": max(0, offset - len(titles))},
+        )
+        rows.extend(messages.all())
+    width = settings.SEARCH_SNIPPET_CHARS
+    return [_hit(r, _snippet(r.body, terms, width), None) for r in rows]
+
+
+def _hit(row, snippet: str, score: float | None) -> SearchHit:
+    created_at = row.created_at
+    return SearchHit(
+        session_id=row.session_id,
+        session_title=row.session_title,
+        message_id=row.message_id,
+        role=row.role,
+        snippet=snippet,
+        created_at=created_at if isinstance(created_at, datetime) else datetime.fromisoformat(created_at),
+        score=score,
+    )
+
+
+async def search(query: str, limit: int = 20, offset: int = 0) -> tuple[list[SearchHit], int | None]:
+    """
+    检索会话标题与消息正文。返回 (本页命中, 下一页 offset)；下一页 offset 为 None 表示没有更多。
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return [], None
+    factory = get_async_session_db_factory()
+    async with factory() as db:
+        fts = await _fts_available(db)
+        long_terms = [t for t in terms if len(t) >= MIN_FTS_CHARS] if fts else []
+        short_terms = [t for t in terms if t not in long_terms]
+        params = {"limit": limit + 1, "offset": offset}
+        params.update({f"like{i}": _like(t) for i, t in enumerate(short_terms if long_terms else terms)})
+        if long_terms:
+            hits = await _fts_search(db, long_terms, short_terms, params)
+        else:
+            hits = await _scan_search(db, terms, limit, offset, params, fts)
+    return hits[:limit], (offset + limit if len(hits) > limit else None)
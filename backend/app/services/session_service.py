@@ -1,11 +1,13 @@
-"""会话服务层：sessions 表 + messages 表的 CRUD"""
+"""会话服务层：sessions 表 + messages 表的 CRUD（已归档的会话在 get_session 时自动取回）"""
 import uuid
 from datetime import datetime
 
 from sqlalchemy.orm import Session as DBSession, selectinload
 
 from app.database.connection import get_session_db_factory
-from app.database.models import Message, Session as SessionModel
+from app.database.models import Message, Session as SessionModel, SessionSummary
+from app.services.archive_service import discard_archived, rehydrate_session
+from app.services.chart_store import chart_record, delete_orphan_blobs, insert_chart_blob, summarize_chart
 
 
 def _get_db():
@@ -48,22 +50,29 @@ def list_sessions() -> list[SessionModel]:
         db.close()
 
 
-def get_session(session_id: str) -> SessionModel | None:
-    """获取会话详情（含消息）。预加载 messages 避免返回后惰性加载导致 DetachedInstanceError。"""
+def _load_session(session_id: str) -> SessionModel | None:
     factory = get_session_db_factory()
     db = factory()
     try:
-        s = (
+        return (
             db.query(SessionModel)
             .options(selectinload(SessionModel.messages))
             .filter(SessionModel.id == session_id)
             .first()
         )
-        return s
     finally:
         db.close()
 
 
+def get_session(session_id: str) -> SessionModel | None:
+    """获取会话详情（含消息）。预加载 messages 避免返回后惰性加载导致 DetachedInstanceError。"""
+    s = _load_session(session_id)
+    if s is not None and s.archived_at is not None:
+        rehydrate_session(session_id)
+        s = _load_session(session_id)
+    return s
+
+
 def rename_session(session_id: str, title: str) -> bool:
     """重命名会话"""
     factory = get_session_db_factory()
@@ -81,18 +90,26 @@ def rename_session(session_id: str, title: str) -> bool:
 
 
 def delete_session(session_id: str) -> bool:
-    """删除会话（级联删除消息）"""
+    """删除会话（级联删除消息），并清理不再被引用的图表"""
     factory = get_session_db_factory()
     db = factory()
     try:
         s = db.query(SessionModel).filter(SessionModel.id == session_id).first()
         if not s:
             return False
+        refs = {m.chart_ref for m in s.messages if m.chart_ref}
+        archived = s.archived_at is not None
+        db.query(SessionSummary).filter(SessionSummary.session_id == session_id).delete()
         db.delete(s)
+        if refs:
+            db.flush()
+            db.execute(delete_orphan_blobs(refs))
         db.commit()
-        return True
     finally:
         db.close()
+    if archived:
+        discard_archived(session_id)
+    return True
 
 
 def get_recent_messages(session_id: str, limit: int = 10) -> list[Message]:
@@ -111,8 +128,64 @@ def get_recent_messages(session_id: str, limit: int = 10) -> list[Message]:
         db.close()
 
 
-def add_message(session_id: str, role: str, content: str, chart_data: dict | None = None) -> Message:
-    """添加消息并更新会话 updated_at"""
+def get_context_messages(session_id: str, after: datetime | None = None, limit: int = 10) -> list[Message]:
+    """获取 after 之后（不含）的最近 N 条消息，按时间正序（用于摘要之外的原始上下文）"""
+    factory = get_session_db_factory()
+    db = factory()
+    try:
+        q = db.query(Message).filter(Message.session_id == session_id)
+        if after is not None:
+            q = q.filter(Message.created_at > after)
+        return q.order_by(Message.created_at.desc()).limit(limit).all()[::-1]
+    finally:
+        db.close()
+
+
+def get_unsummarized_messages(session_id: str, after: datetime | None, limit: int) -> list[Message]:
+    """获取 after 之后（不含）最早的 N 条消息，按时间正序（用于增量折叠进摘要）"""
+    factory = get_session_db_factory()
+    db = factory()
+    try:
+        q = db.query(Message).filter(Message.session_id == session_id)
+        if after is not None:
+            q = q.filter(Message.created_at > after)
+        return q.order_by(Message.created_at.asc()).limit(limit).all()
+    finally:
+        db.close()
+
+
+def get_session_summary(session_id: str) -> SessionSummary | None:
+    """获取会话滚动摘要"""
+    factory = get_session_db_factory()
+    db = factory()
+    try:
+        return db.get(SessionSummary, session_id)
+    finally:
+        db.close()
+
+
+def save_session_summary(session_id: str, summary: str, summarized_until: datetime, folded: int) -> None:
+    """写入 / 更新会话滚动摘要，folded 为本次新折叠的消息数"""
+    factory = get_session_db_factory()
+    db = factory()
+    try:
+        row = db.get(SessionSummary, session_id)
+        if row is None:
+            row = SessionSummary(session_id=session_id, message_count=0)
+            db.add(row)
+        row.summary = summary
+        row.summarized_until = summarized_until
+        row.message_count = (row.message_count or 0) + folded
+        row.updated_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def add_message(
+    session_id: str, role: str, content: str, chart_data: dict | None = None, query_sql: str | None = None
+) -> Message:
+    """添加消息并更新会话 updated_at；图表写入 chart_blobs（同一事务），消息只存引用与摘要"""
     factory = get_session_db_factory()
     db = factory()
     try:
@@ -122,8 +195,13 @@ def add_message(session_id: str, role: str, content: str, chart_data: dict | Non
             session_id=session_id,
             role=role,
             content=content,
-            chart_data=chart_data,
+            query_sql=query_sql,
         )
+        if chart_data:
+            record = chart_record(chart_data)
+            db.execute(insert_chart_blob(record))
+            m.chart_ref = record["hash"]
+            m.chart_summary = summarize_chart(chart_data)
         db.add(m)
         s = db.query(SessionModel).filter(SessionModel.id == session_id).first()
         if s:
@@ -0,0 +1,106 @@
+"""
+请求合并（single-flight）：回答缓存键相同（归一化问题 + 上下文哈希 + 模型 + 业务库数据版本 + 会话结果帧）的并发请求
+共享同一次计划 / Agent 执行，典型场景是分享出去的看板链接被很多人同时打开。
+
+第一个请求在后台任务中执行，事件写入 Flight；所有请求（含发起者）各自订阅，先补发已产生的事件再实时推送，
+各自走自己的 SSE 流、各自落库。执行放在独立任务中，发起者断开连接不会中断其他订阅者；
+执行结束前已写入回答缓存，之后到达的相同请求直接命中缓存。
+stats() 中 coalesced 即省下的执行次数。
+"""
+import asyncio
+import threading
+from typing import AsyncIterator, Callable
+
+from app.services.metrics import CHAT_PATH_TOTAL
+
+_DONE = object()
+
+
+class Flight:
+    """一次进行中的流式执行：已产生的事件 + 订阅者队列（仅在事件循环线程内访问）"""
+
+    def __init__(self):
+        self.events: list[dict] = []
+        self.error: BaseException | None = None
+        self.done = False
+        self._queues: list[asyncio.Queue] = []
+
+    def publish(self, event: dict) -> None:
+        self.events.append(event)
+        for q in self._queues:
+            q.put_nowait(event)
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.error = error
+        self.done = True
+        for q in self._queues:
+            q.put_nowait(_DONE)
+
+    async def subscribe(self) -> AsyncIterator[dict]:
+        """回放已有事件后跟随实时事件；执行失败时向每个订阅者抛出同一异常"""
+        backlog = list(self.events)
+        q: asyncio.Queue | None = None
+        if not self.done:
+            q = asyncio.Queue()
+            self._queues.append(q)
+        try:
+            for ev in backlog:
+                yield ev
+            while q is not None:
+                ev = await q.get()
+                if ev is _DONE:
+                    break
+                yield ev
+            if self.error is not None:
+                raise self.error
+        finally:
+            if q is not None:
+                self._queues.remove(q)
+
+
+_flights: dict[tuple, Flight] = {}
+_tasks: set[asyncio.Task] = set()
+_lock = threading.Lock()
+_stats = {"executions": 0, "coalesced": 0}
+
+
+def _count(leader: bool) -> None:
+    with _lock:
+        _stats["executions" if leader else "coalesced"] += 1
+    if not leader:
+        CHAT_PATH_TOTAL.inc(path="coalesced")
+
+
+async def _run(key: tuple, flight: Flight, factory: Callable[[], AsyncIterator[dict]]) -> None:
+    error = None
+    try:
+        async for ev in factory():
+            flight.publish(ev)
+    except asyncio.CancelledError:
+        error = RuntimeError("执行已取消")
+        raise
+    except Exception as e:
+        error = e
+    finally:
+        if _flights.get(key) is flight:
+            del _flights[key]
+        flight.finish(error)
+
+
+async def stream(key: tuple, factory: Callable[[], AsyncIterator[dict]]) -> AsyncIterator[dict]:
+    """相同 key 已有进行中的执行时直接订阅，否则用 factory() 启动一次新的执行"""
+    flight = _flights.get(key)
+    leader = flight is None
+    if leader:
+        flight = _flights[key] = Flight()
+        task = asyncio.create_task(_run(key, flight, factory))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    _count(leader)
+    async for ev in flight.subscribe():
+        yield ev
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "in_flight": len(_flights)}
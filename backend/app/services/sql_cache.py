@@ -0,0 +1,68 @@
+"""SQL 结果缓存：所有 Agent 的 sql_db_query 共享，键为规范化 SQL + 业务库数据版本"""
+import sys
+from dataclasses import dataclass, field
+
+from app.config import settings
+from app.database.connection import get_business_data_version
+from app.services.cache import LRUCache
+from app.services.sql_utils import canonicalize_sql
+
+
+@dataclass
+class QueryResult:
+    """一次查询的结果集（列名 + 行元组）；truncated 表示超出行数上限被截断"""
+
+    columns: list[str]
+    rows: list[tuple] = field(default_factory=list)
+    truncated: bool = False
+
+
+def estimate_result_bytes(result: QueryResult) -> int:
+    """估算结果集占用的内存字节数（行元组 + 单元格对象）"""
+    total = sys.getsizeof(result.rows) + sum(sys.getsizeof(c) for c in result.columns)
+    for row in result.rows:
+        total += sys.getsizeof(row)
+        for v in row:
+            total += sys.getsizeof(v)
+    return total
+
+
+_cache = LRUCache(
+    max_entries=settings.SQL_CACHE_MAX_ENTRIES,
+    ttl=settings.SQL_CACHE_TTL_SECONDS,
+    max_bytes=settings.SQL_CACHE_MAX_BYTES,
+    sizeof=estimate_result_bytes,
+)
+
+
+def make_key(sql: str, fetch: str = "all") -> tuple:
+    """规范化 SQL + fetch 模式 + 数据版本；数据版本变化时清空缓存"""
+    version = get_business_data_version()
+    _cache.sync_version(version)
+    return (canonicalize_sql(sql), fetch, version)
+
+
+def is_cacheable_sql(sql: str) -> bool:
+    """仅缓存只读查询"""
+    head = canonicalize_sql(sql)[:6]
+    return head.startswith("select") or head.startswith("with")
+
+
+def lookup(key: tuple) -> QueryResult | None:
+    if not settings.SQL_CACHE_ENABLED:
+        return None
+    return _cache.get(key)
+
+
+def store(key: tuple, result: QueryResult) -> None:
+    """写入结果；行数超过 SQL_CACHE_MAX_ROWS 的结果不缓存"""
+    if settings.SQL_CACHE_ENABLED and len(result.rows) <= settings.SQL_CACHE_MAX_ROWS:
+        _cache.set(key, result)
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,163 @@
+"""
+Agent SQL 执行护栏：
+- 执行前用 EXPLAIN QUERY PLAN 检查，同一层查询里对多张大表做嵌套全表扫描（笛卡尔积）时直接拒绝
+- 执行期间通过 SQLite progress handler 限制墙钟时间与 VM 步数，超出即中断
+- 拒绝 / 中断时抛 QueryGuardError，消息会作为工具 Observation 返回给 Agent，提示其改写查询
+返回行数上限在 AgentSQLDatabase.execute_query 中处理。
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database.connection import get_business_data_version
+from app.services.sql_utils import is_read_only_select
+
+# progress handler 每执行多少条 VM 指令回调一次
+PROGRESS_INTERVAL = 10_000
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?", re.IGNORECASE)
+_ALIAS_STOPWORDS = {
+    "where", "join", "left", "right", "inner", "outer", "cross", "natural", "on", "using",
+    "group", "order", "limit", "having", "union", "except", "intersect", "as", "window",
+}
+
+# 表行数估算缓存（随业务库数据版本失效）
+_row_estimates: dict[str, int] = {}
+_row_version: str | None = None
+_row_lock = threading.Lock()
+
+
+class QueryGuardError(Exception):
+    """查询被护栏拒绝或中断；str(e) 为给 Agent 的改写提示"""
+
+
+def _base_tables(connection) -> set[str]:
+    rows = connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).fetchall()
+    return {r[0].lower() for r in rows}
+
+
+def _alias_map(sql: str, tables: set[str]) -> dict[str, str]:
+    """从 SQL 中解析 `表名 [AS] 别名`，返回 别名 -> 表名（均为小写）"""
+    aliases = {}
+    for m in re.finditer(r"\b(\w+)(?=\s+(?:as\s+)?(\w+))", sql, re.IGNORECASE):
+        table, alias = m.group(1).lower(), m.group(2).lower()
+        if table in tables and alias not in _ALIAS_STOPWORDS and alias not in tables:
+            aliases[alias] = table
+    return aliases
+
+
+def estimate_table_rows(connection, table: str) -> int:
+    """用 MAX(rowid) 近似表行数（O(log n)）；按数据版本缓存"""
+    global _row_version
+    version = get_business_data_version()
+    with _row_lock:
+        if version != _row_version:
+            _row_estimates.clear()
+            _row_version = version
+        if table in _row_estimates:
+            return _row_estimates[table]
+    try:
+        n = connection.execute(text(f'SELECT MAX(rowid) FROM "{table}"')).scalar() or 0
+    except Exception:
+        n = 0
+    with _row_lock:
+        _row_estimates[table] = n
+    return n
+
+
+def explain_plan(connection, sql: str, parameters: dict | None = None) -> list[tuple[int, int, str]]:
+    """EXPLAIN QUERY PLAN 结果：[(id, parent, detail)]"""
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), parameters or {}).fetchall()
+    return [(r[0], r[1], r[-1]) for r in rows]
+
+
+def check_query(connection, sql: str, parameters: dict | None = None) -> None:
+    """执行前检查：必须是单条只读查询；同层多张表全表扫描的估算行数乘积不得超过阈值"""
+    if not is_read_only_select(sql):
+        raise QueryGuardError("只允许执行单条 SELECT 查询，请改写为只读查询。")
+    tables = _base_tables(connection)
+    aliases = _alias_map(sql, tables)
+    scans: dict[int, list[str]] = {}
+    for _, parent, detail in explain_plan(connection, sql, parameters):
+        m = _SCAN.match(detail)
+        if not m:
+            continue
+        name = m.group(1).lower()
+        table = name if name in tables else aliases.get(name)
+        if table:
+            scans.setdefault(parent, []).append(table)
+    for scanned in scans.values():
+        if len(scanned) < 2:
+            continue
+        sizes = [estimate_table_rows(connection, t) for t in scanned]
+        product = 1
+        for n in sizes:
+            product *= max(n, 1)
+        if product > settings.SQL_GUARD_MAX_SCAN_PRODUCT:
+            detail = " × ".join(f"{t}(约 {n} 行)" for t, n in zip(scanned, sizes))
+            raise QueryGuardError(
+                f"查询被拒绝：{detail} 之间是没有可用连接条件的嵌套全表扫描，估算需处理 {product} 行组合。"
+                "请补充 JOIN ... ON 等值连接条件（如 sales_records.employee_id = employees.id），"
+                "或先用 WHERE / 子查询缩小范围后重试。"
+            )
+
+
+class _Budget:
+    """execution_budget 产出的句柄：paused() 期间（如等待慢客户端取走数据）不计入墙钟预算"""
+
+    def __init__(self, state: dict | None = None):
+        self._state = state
+
+    @contextmanager
+    def paused(self):
+        if self._state is None or self._state["deadline"] is None:
+            yield
+            return
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self._state["deadline"] += time.monotonic() - t0
+
+
+@contextmanager
+def execution_budget(connection, seconds: float | None = None, steps: int | None = None):
+    """
+    在 SQLite DBAPI 连接上挂 progress handler，超过墙钟时间或 VM 步数时中断查询，
+    中断转换为 QueryGuardError。需把取数（fetch）也放在此上下文内，SQLite 边取边算。
+    产出 _Budget：边取边写给客户端时，把等待写出的时间放进 budget.paused()，只让 SQLite 执行计时。
+    """
+    seconds = settings.SQL_GUARD_TIMEOUT_SECONDS if seconds is None else seconds
+    steps = settings.SQL_GUARD_MAX_VM_STEPS if steps is None else steps
+    dbapi_conn = connection.connection.dbapi_connection
+    if not hasattr(dbapi_conn, "set_progress_handler") or (not seconds and not steps):
+        yield _Budget()
+        return
+    state = {"steps": 0, "reason": None, "deadline": time.monotonic() + seconds if seconds else None}
+
+    def _handler():
+        state["steps"] += PROGRESS_INTERVAL
+        if steps and state["steps"] > steps:
+            state["reason"] = f"超过 {steps} 步执行预算"
+            return 1
+        if state["deadline"] is not None and time.monotonic() > state["deadline"]:
+            state["reason"] = f"执行超过 {seconds:g} 秒"
+            return 1
+        return 0
+
+    dbapi_conn.set_progress_handler(_handler, PROGRESS_INTERVAL)
+    try:
+        yield _Budget(state)
+    except Exception as e:
+        if state["reason"]:
+            raise QueryGuardError(
+                f"查询已中断：{state['reason']}。请缩小时间范围、补充过滤条件，"
+                "或先聚合（GROUP BY）再关联，避免扫描大量数据后重试。"
+            ) from e
+        raise
+    finally:
+        dbapi_conn.set_progress_handler(None, 0)
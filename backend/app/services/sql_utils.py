@@ -0,0 +1,99 @@
+"""SQL 文本工具：规范化（用作缓存键）、只读校验、参数内联"""
+import re
+
+
+def _split_quoted(sql: str) -> list[tuple[str, bool]]:
+    """按引号切分 SQL，返回 [(片段, 是否为引号内文本)]，引号内文本原样保留"""
+    parts: list[tuple[str, bool]] = []
+    buf = []
+    quote = None
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            buf.append(ch)
+            if ch == quote:
+                # SQL 中连续两个引号表示转义
+                if i + 1 < len(sql) and sql[i + 1] == quote:
+                    buf.append(sql[i + 1])
+                    i += 2
+                    continue
+                parts.append(("".join(buf), True))
+                buf, quote = [], None
+        elif ch in ("'", '"', "`"):
+            if buf:
+                parts.append(("".join(buf), False))
+            buf, quote = [ch], ch
+        elif ch == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end < 0 else end
+            buf.append(" ")
+            continue
+        elif ch == "/" and sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = len(sql) if end < 0 else end + 2
+            buf.append(" ")
+            continue
+        else:
+            buf.append(ch)
+        i += 1
+    if buf:
+        parts.append(("".join(buf), bool(quote)))
+    return parts
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    规范化 SQL：去注释、合并空白、引号外转小写、去除末尾分号。
+    书写格式不同但文本等价的查询得到同一结果，用作结果缓存键。
+    """
+    out = []
+    for text, quoted in _split_quoted(sql):
+        out.append(text if quoted else re.sub(r"\s+", " ", text).lower())
+    canon = "".join(out).strip()
+    while canon.endswith(";"):
+        canon = canon[:-1].rstrip()
+    return canon
+
+
+# replace 同时是字符串函数：后面紧跟 "(" 时（replace(name, ' ', '')）不算写操作，REPLACE INTO 仍会被拒绝
+_WRITE_KEYWORDS = re.compile(
+    r"\b(insert|update|delete|replace(?!\s*\()|drop|alter|create|attach|detach|pragma|vacuum|reindex|begin|commit|rollback)\b"
+)
+
+
+def is_read_only_select(sql: str) -> bool:
+    """单条 SELECT / WITH 查询且不含写操作关键字（引号内文本不参与判断）"""
+    canon = canonicalize_sql(sql)
+    if not (canon.startswith("select") or canon.startswith("with")):
+        return False
+    unquoted = " ".join(text for text, quoted in _split_quoted(canon) if not quoted)
+    if ";" in unquoted:
+        return False
+    return not _WRITE_KEYWORDS.search(unquoted)
+
+
+def _sql_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def inline_params(sql: str, params: dict | None) -> str:
+    """把 :name 命名参数替换为 SQL 字面量（引号内文本不替换），得到可独立执行的 SQL（如导出、展示）"""
+    if not params:
+        return sql
+    out = []
+    for text, quoted in _split_quoted(sql):
+        if not quoted:
+            text = re.sub(
+                r"(?<!:):(\w+)",
+                lambda m: _sql_literal(params[m.group(1)]) if m.group(1) in params else m.group(0),
+                text,
+            )
+        out.append(text)
+    return "".join(out)
@@ -1,7 +1,11 @@
-"""可视化服务：解析 [CHART]...[/CHART]，校验并补全 ECharts option"""
+"""可视化服务：解析 [CHART]...[/CHART]（完整 option 或简化图表说明），按查询结果组装 ECharts option，校验补全并降采样"""
 import json
 import re
 
+import numpy as np
+
+from app.config import settings
+
 TOOL_CALL_PATTERN = re.compile(
     r"functions\.sql_db_\w+:\d+\s*\S*\{[^}]*\"tool_input\"[^}]*\}",
     re.MULTILINE,
@@ -33,9 +37,297 @@ def ensure_echarts_option(raw: dict) -> dict:
         for s in opt["series"]:
             if isinstance(s, dict) and "type" not in s:
                 s["type"] = "bar"
+    return downsample_option(opt)
+
+
+# ---------- 降采样 ----------
+
+OTHER_LABEL = "其他"
+
+# 形如 2024、2024-03、2024/03/01、2024年3月 的类目视为时间序列（保持顺序，只做 LTTB）
+_TIME_LIKE = re.compile(r"^\d{4}(?:[-/.年]\d{1,2})?")
+
+
+def _to_float(v) -> float:
+    if isinstance(v, dict):
+        v = v.get("value")
+    if isinstance(v, (list, tuple)):
+        v = v[-1] if v else None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _numeric(data: list) -> np.ndarray:
+    """ECharts 数据项（数字 / {value} / [x, y]）-> float 数组，无法解析的为 NaN"""
+    return np.fromiter((_to_float(v) for v in data), dtype=float, count=len(data))
+
+
+def lttb_indices(y: np.ndarray, threshold: int, x: np.ndarray | None = None) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets：从 n 个点中选出 threshold 个保留折线形状的点，返回升序下标。
+    首尾点固定；中间每个桶选与「上一选中点、下一桶均值点」构成三角形面积最大的点（桶内向量化计算）。
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    out = np.empty(threshold, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(areas.argmax())
+        out[i + 1] = a
+    return out
+
+
+def top_n_split(totals: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """按数值取前 n-1 项（保持原顺序），其余下标归入「其他」"""
+    order = np.argsort(-np.nan_to_num(totals), kind="stable")
+    return np.sort(order[: n - 1]), np.sort(order[n - 1:])
+
+
+def _category_axis(opt: dict) -> tuple[str | None, dict | None]:
+    """找到带 data 的类目轴（xAxis 优先，横向柱状图为 yAxis）"""
+    for key in ("xAxis", "yAxis"):
+        axis = opt.get(key)
+        if isinstance(axis, list):
+            axis = axis[0] if axis else None
+        if isinstance(axis, dict) and isinstance(axis.get("data"), list) and axis.get("type", "category") == "category":
+            return key, axis
+    return None, None
+
+
+def _set_axis_data(opt: dict, key: str, data: list) -> None:
+    axis = opt[key]
+    if isinstance(axis, list):
+        opt[key] = [{**axis[0], "data": data}] + axis[1:]
+    else:
+        opt[key] = {**axis, "data": data}
+
+
+def downsample_option(opt: dict, max_points: int | None = None, max_categories: int | None = None) -> dict:
+    """
+    超大序列降采样，避免把上万个点推给浏览器、写进 messages.chart_data：
+    - 折线 / 时间类目：所有对齐序列的 LTTB 选点取并集，降到约 max_points 个点
+    - 非时间类目的柱状图、饼图：保留数值最大的 max_categories-1 项，其余合并为「其他」
+    处理记录写入 option["meta"]["downsample"]（含原始点数 / 类目数）。
+    """
+    max_points = max_points or settings.CHART_MAX_POINTS
+    max_categories = max_categories or settings.CHART_MAX_CATEGORIES
+    series = opt.get("series")
+    if not isinstance(series, list):
+        return opt
+    records = []
+    series = list(series)
+
+    key, axis = _category_axis(opt)
+    if axis is not None:
+        cats = axis["data"]
+        n = len(cats)
+        aligned = [
+            i for i, s in enumerate(series)
+            if isinstance(s, dict) and s.get("type") != "pie" and isinstance(s.get("data"), list) and len(s["data"]) == n
+        ]
+        time_like = any(series[i].get("type") == "line" for i in aligned) or (
+            n > 0 and all(_TIME_LIKE.match(str(c)) for c in cats[:: max(n // 20, 1)])
+        )
+        if aligned and time_like and n > max_points:
+            budget = max(max_points // len(aligned), 3)
+            idx = np.unique(np.concatenate([lttb_indices(_numeric(series[i]["data"]), budget) for i in aligned]))
+            _set_axis_data(opt, key, [cats[j] for j in idx])
+            for i in aligned:
+                data = series[i]["data"]
+                series[i] = {**series[i], "data": [data[j] for j in idx]}
+            records.append({"method": "lttb", "original_points": n, "points": len(idx)})
+        elif aligned and not time_like and n > max_categories and all(series[i].get("type") == "bar" for i in aligned):
+            values = np.vstack([_numeric(series[i]["data"]) for i in aligned])
+            keep, rest = top_n_split(np.nansum(values, axis=0), max_categories)
+            _set_axis_data(opt, key, [cats[j] for j in keep] + [OTHER_LABEL])
+            for row, i in zip(values, aligned):
+                data = series[i]["data"]
+                other = round(float(np.nansum(row[rest])), 2)
+                series[i] = {**series[i], "data": [data[j] for j in keep] + [other]}
+            records.append({"method": "top_n", "original_categories": n, "categories": len(keep) + 1})
+
+    for i, s in enumerate(series):
+        if not isinstance(s, dict) or not isinstance(s.get("data"), list):
+            continue
+        data = s["data"]
+        if s.get("type") == "pie" and len(data) > max_categories:
+            values = _numeric(data)
+            keep, rest = top_n_split(values, max_categories)
+            other = {"name": OTHER_LABEL, "value": round(float(np.nansum(values[rest])), 2)}
+            series[i] = {**s, "data": [data[j] for j in keep] + [other]}
+            records.append({"method": "top_n", "series": i, "original_categories": len(data), "categories": len(keep) + 1})
+        elif (
+            s.get("type") == "line"
+            and len(data) > max_points
+            and all(isinstance(v, (list, tuple)) and len(v) >= 2 for v in data)
+        ):
+            # [x, y] 数据对（time / value 轴）：各序列独立降采样，x 为数值时按实际间距计算
+            x = _numeric([v[0] for v in data])
+            idx = lttb_indices(_numeric(data), max_points, x=None if np.isnan(x).any() else x)
+            series[i] = {**s, "data": [data[j] for j in idx]}
+            records.append({"method": "lttb", "series": i, "original_points": len(data), "points": len(idx)})
+
+    if records:
+        opt["series"] = series
+        opt["meta"] = {**opt.get("meta", {}), "downsample": records}
     return opt
 
 
+def build_echarts_option(
+    chart_type: str,
+    title: str,
+    categories: list,
+    series: dict[str, list],
+) -> dict:
+    """
+    由类目与数值序列组装 ECharts option。
+    chart_type: bar / line / pie（pie 只使用第一个序列）
+    series: {序列名: 数值列表}，与 categories 一一对应
+    """
+    categories = [str(c) for c in categories]
+    if chart_type == "pie":
+        name, values = next(iter(series.items()))
+        return ensure_echarts_option(
+            {
+                "title": {"text": title},
+                "tooltip": {"trigger": "item", "formatter": "{b}: {c} ({d}%)"},
+                "legend": {"type": "scroll", "bottom": 0},
+                "series": [
+                    {
+                        "type": "pie",
+                        "name": name,
+                        "radius": "60%",
+                        "data": [{"name": c, "value": v} for c, v in zip(categories, values)],
+                    }
+                ],
+            }
+        )
+    opt = {
+        "title": {"text": title},
+        "xAxis": {"type": "category", "data": categories},
+        "yAxis": {"type": "value"},
+        "series": [{"type": chart_type, "name": name, "data": list(values)} for name, values in series.items()],
+    }
+    if len(series) > 1:
+        opt["legend"] = {"data": list(series.keys())}
+    return ensure_echarts_option(opt)
+
+
+def _resolve_column(ref, columns: list[str]) -> int | None:
+    """图表说明中的列引用（列名或从 0 开始的下标）-> 列下标"""
+    if isinstance(ref, bool):
+        return None
+    if isinstance(ref, int):
+        return ref if 0 <= ref < len(columns) else None
+    if not isinstance(ref, str):
+        return None
+    if ref in columns:
+        return columns.index(ref)
+    lowered = [c.lower() for c in columns]
+    ref = ref.strip().lower()
+    if ref in lowered:
+        return lowered.index(ref)
+    # 说明里写了 表.列 或 SELECT 里用了 表.列
+    short = ref.rsplit(".", 1)[-1]
+    shorts = [c.rsplit(".", 1)[-1] for c in lowered]
+    return shorts.index(short) if short in shorts else None
+
+
+def _cell_number(v):
+    if v is None:
+        return None
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return int(f) if f.is_integer() else round(f, 4)
+
+
+def is_chart_spec(data) -> bool:
+    """是否为简化图表说明（{"type", "x", "y", "title"}），而非完整 ECharts option"""
+    return isinstance(data, dict) and "series" not in data and ("x" in data or "y" in data)
+
+
+def build_option_from_spec(spec: dict, columns: list[str], rows: list) -> dict | None:
+    """
+    按图表说明从查询结果集组装 ECharts option：
+    type 为 bar / line / pie，x 为类目列，y 为一个或多个数值列（省略时取除 x 外的数值列）。
+    列引用无法对应到结果集时返回 None。
+    """
+    if not rows or not columns:
+        return None
+    chart_type = spec.get("type") if spec.get("type") in ("bar", "line", "pie") else "bar"
+    numeric = [j for j in range(len(columns)) if all(_cell_number(r[j]) is not None for r in rows if r[j] is not None)]
+    if "x" in spec:
+        x = _resolve_column(spec["x"], columns)
+        if x is None:
+            return None
+    else:
+        x = next((j for j in range(len(columns)) if j not in numeric), 0)
+    y_refs = spec.get("y")
+    if y_refs is None:
+        ys = [j for j in numeric if j != x]
+    else:
+        ys = [_resolve_column(r, columns) for r in (y_refs if isinstance(y_refs, list) else [y_refs])]
+        if any(j is None for j in ys):
+            return None
+    if not ys:
+        return None
+    rows = list(rows)
+    categories = [r[x] for r in rows]
+    # 趋势图按时间正序展示（SQL 常按时间倒序取最近 N 条）
+    if (
+        chart_type == "line"
+        and len(categories) > 1
+        and all(_TIME_LIKE.match(str(c)) for c in categories)
+        and str(categories[0]) > str(categories[-1])
+    ):
+        rows.reverse()
+        categories.reverse()
+    series = {str(columns[j]): [_cell_number(r[j]) for r in rows] for j in ys}
+    return build_echarts_option(chart_type, str(spec.get("title") or ""), categories, series)
+
+
+def resolve_chart_spec(response: str, results: list) -> str:
+    """
+    把回答中的简化图表说明替换为由真实查询结果生成的完整 option（[CHART] 段落）。
+    results 为 [(sql, 结果集)]，结果集需有 columns / rows；从最后一次查询往前找能对上列的结果。
+    无法生成时去掉该段落；完整 ECharts option（旧格式）保持不变。
+    """
+    m = re.search(r"\[CHART\](.*?)\[/CHART\]", response, re.DOTALL)
+    if not m:
+        return response
+    try:
+        spec = json.loads(m.group(1).strip())
+    except json.JSONDecodeError:
+        return response
+    if not is_chart_spec(spec):
+        return response
+    option = None
+    for _, result in reversed(results or []):
+        option = build_option_from_spec(spec, list(result.columns), result.rows)
+        if option:
+            break
+    replacement = chart_block(option) if option else ""
+    return (response[: m.start()] + replacement + response[m.end():]).strip()
+
+
+def chart_block(option: dict) -> str:
+    """把 option 序列化为回答中的 [CHART]...[/CHART] 段落"""
+    return "[CHART]\n" + json.dumps(option, ensure_ascii=False) + "\n[/CHART]"
+
+
 def parse_chart_from_response(full_response: str) -> tuple[str, dict | None]:
     """
     从完整 LLM 回答中分离：
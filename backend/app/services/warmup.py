@@ -0,0 +1,72 @@
+"""
+启动预热：应用导入时不加载 LangChain，由 main.lifespan 启动的后台任务依次完成
+导入 LangChain 依赖（含结果帧用到的 pandas）-> 反射业务库表结构（AgentSQLDatabase）-> 为调度器各槽位构建 Agent，
+全部完成后 /ready 返回 200。预热期间请求照常处理（按需构建，首个请求会慢一些）。
+"""
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.services.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+_state: dict = {"status": "pending", "stage": None, "error": None, "stages": {}, "seconds": None}
+
+
+def _import_langchain() -> None:
+    import langchain_openai  # noqa: F401
+    from langchain_community.agent_toolkits.sql import base  # noqa: F401
+
+    from app.services import agent_db, llm_metrics  # noqa: F401
+
+    if settings.FRAME_STORE_ENABLED:
+        import pandas  # noqa: F401
+
+        from app.services import frame_tool  # noqa: F401
+
+
+def _reflect_schema() -> None:
+    from app.services.llm_service import _get_db
+
+    _get_db()
+
+
+async def _build_agents() -> None:
+    from app.services.agent_pool import get_scheduler
+
+    await get_scheduler().prewarm()
+
+
+async def warm_up() -> None:
+    """依次执行各预热阶段，记录耗时；失败时保持未就绪并记录错误（请求仍可按需构建）"""
+    stages = [
+        ("imports", lambda: asyncio.to_thread(_import_langchain)),
+        ("schema", lambda: asyncio.to_thread(_reflect_schema)),
+        ("agents", _build_agents),
+    ]
+    _state.update(status="warming", error=None)
+    t_start = time.perf_counter()
+    for name, run in stages:
+        _state["stage"] = name
+        t0 = time.perf_counter()
+        try:
+            await run()
+        except Exception as e:
+            logger.exception("warm-up stage %s failed", name)
+            _state.update(status="failed", error=f"{name}: {e}")
+            return
+        elapsed = time.perf_counter() - t0
+        _state["stages"][name] = round(elapsed, 3)
+        observe_stage(f"warmup_{name}", elapsed)
+    _state.update(status="ready", stage=None, seconds=round(time.perf_counter() - t_start, 3))
+    logger.info("warm-up finished in %.2fs %s", _state["seconds"], _state["stages"])
+
+
+def is_ready() -> bool:
+    return _state["status"] == "ready"
+
+
+def status() -> dict:
+    return {**_state, "stages": dict(_state["stages"])}
@@ -0,0 +1,67 @@
+"""
+冷会话归档维护：报告热库 / 冷库大小，可立即执行一轮归档 + 空间整理（与后台任务相同的逻辑）。
+在 backend 目录下运行:
+  python scripts/archive_sessions.py                 # 只报告
+  python scripts/archive_sessions.py --run [--idle-days 30] [--limit 500]
+  python scripts/archive_sessions.py --rehydrate <session_id>
+  python scripts/archive_sessions.py --vacuum        # 旧库一次性转换为增量 vacuum（完整 VACUUM，请停服或在低峰执行）
+使用 .env 中配置的 SESSION_DB_URL / ARCHIVE_DB_URL。
+"""
+import argparse
+import os
+import sys
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+from app.database import init_db
+from app.services.archive_service import (
+    archive_idle_sessions,
+    compact,
+    convert_to_incremental,
+    rehydrate_session,
+    storage_stats,
+)
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:10.2f} MB"
+
+
+def report() -> None:
+    s = storage_stats()
+    hot, cold = s["hot"], s["cold"]
+    print("=== 热库（sessions.db）===")
+    print(f"  文件     {_mb(hot['file_bytes'])}   已用 {_mb(hot['used_bytes'])}   空闲页 {_mb(hot['free_bytes'])}")
+    print(f"  活跃会话 {hot['sessions']}   增量 vacuum {'已启用' if hot['incremental_vacuum'] else '未启用（--vacuum 转换）'}")
+    print("=== 冷库（sessions_archive.db）===")
+    print(f"  文件     {_mb(cold['file_bytes'])}   已用 {_mb(cold['used_bytes'])}   空闲页 {_mb(cold['free_bytes'])}")
+    print(f"  归档会话 {cold['sessions']}   消息 {cold['messages']}   增量 vacuum {'已启用' if cold['incremental_vacuum'] else '未启用（--vacuum 转换）'}")
+    print(f"  原始 {_mb(cold['raw_bytes'])} -> 压缩 {_mb(cold['payload_bytes'])}   压缩比 {cold['compression_ratio']}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--run", action="store_true", help="立即执行一轮归档与空间整理")
+    parser.add_argument("--idle-days", type=float, default=None, help="默认取 ARCHIVE_IDLE_DAYS")
+    parser.add_argument("--limit", type=int, default=None, help="本轮最多归档的会话数，默认取 ARCHIVE_BATCH_SESSIONS")
+    parser.add_argument("--rehydrate", metavar="SESSION_ID", help="把指定会话从归档库取回热库")
+    parser.add_argument("--vacuum", action="store_true", help="把未启用增量 vacuum 的旧库转换过来（完整 VACUUM，阻塞写入）")
+    args = parser.parse_args()
+
+    init_db()
+    if args.rehydrate:
+        ok = rehydrate_session(args.rehydrate)
+        print(f"取回 {args.rehydrate}: {'完成' if ok else '无归档数据'}")
+    if args.vacuum:
+        converted = convert_to_incremental()
+        print(f"已转换: {', '.join(converted)}" if converted else "热库与归档库均已启用增量 vacuum")
+    if args.run:
+        archived = archive_idle_sessions(args.idle_days, args.limit)
+        freed = compact()
+        print(f"归档 {archived} 个会话，归还 {freed} 个空闲页\n")
+    report()
+
+
+if __name__ == "__main__":
+    main()
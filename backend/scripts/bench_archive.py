@@ -0,0 +1,155 @@
+"""
+冷会话归档基准：在合成会话库上（大部分会话长期未更新）对比归档前后
+热库文件大小、get_recent_messages / list_sessions 延迟，并测量归档吞吐与取回（rehydrate）延迟。
+在 backend 目录下运行: python scripts/bench_archive.py [--messages 300000] [--sessions 6000] [--idle-ratio 0.8]
+使用临时会话库 / 归档库，结束后删除。
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_smart_data.db')}"
+os.environ["SESSION_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions.db')}"
+os.environ["ARCHIVE_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions_archive.db')}"
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import dispose_engines, init_db
+from app.database.connection import get_session_db_engine
+from app.services.archive_service import archive_idle_sessions, compact, rehydrate_session, storage_stats
+
+RECENT_SQL = (
+    "SELECT id, role, content, created_at FROM messages WHERE session_id = :sid "
+    "ORDER BY created_at DESC, id DESC LIMIT 10"
+)
+LIST_SQL = "SELECT id, title, updated_at FROM sessions ORDER BY updated_at DESC, id DESC LIMIT 50"
+TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # 与 SQLAlchemy 在 SQLite 中存储 DateTime 的格式一致
+ANSWER = "根据查询结果，销售部本月销售额最高，为 1,234,567 元，环比增长 12.5%；技术部次之。" * 3
+
+
+def build_db(path: str, n_messages: int, n_sessions: int, idle_ratio: float) -> tuple[list[str], list[str]]:
+    """在 init_db 建好的表上用 sqlite3 批量写入；返回 (活跃会话, 空闲会话)"""
+    now = datetime.utcnow()
+    n_idle = int(n_sessions * idle_ratio)
+    sids = [str(uuid.uuid4()) for _ in range(n_sessions)]
+    idle, active = sids[:n_idle], sids[n_idle:]
+    updated = {sid: now - timedelta(days=random.uniform(60, 365)) for sid in idle}
+    updated.update({sid: now - timedelta(hours=random.uniform(0, 48)) for sid in active})
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        [
+            (sid, f"会话{i}", (updated[sid] - timedelta(days=1)).strftime(TS_FORMAT), updated[sid].strftime(TS_FORMAT))
+            for i, sid in enumerate(sids)
+        ],
+    )
+    batch = []
+    for i in range(n_messages):
+        sid = random.choice(sids)
+        ts = updated[sid] - timedelta(seconds=random.randint(0, 86400))
+        user = i % 2 == 0
+        batch.append((
+            str(uuid.uuid4()), sid, "user" if user else "assistant",
+            f"各部门第 {i} 次的销售额是多少？" if user else ANSWER,
+            None if user else "SELECT d.name AS 部门, SUM(s.amount) AS 销售额 FROM sales_records s JOIN employees e ON e.id = s.employee_id JOIN departments d ON d.id = e.department_id GROUP BY d.id",
+            ts.strftime(TS_FORMAT),
+        ))
+        if len(batch) >= 50_000:
+            conn.executemany(
+                "INSERT INTO messages (id, session_id, role, content, query_sql, created_at) VALUES (?, ?, ?, ?, ?, ?)", batch
+            )
+            batch.clear()
+    if batch:
+        conn.executemany(
+            "INSERT INTO messages (id, session_id, role, content, query_sql, created_at) VALUES (?, ?, ?, ?, ?, ?)", batch
+        )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return active, idle
+
+
+def measure(active: list[str], rounds: int) -> dict:
+    recent, listing = [], []
+    with get_session_db_engine().connect() as conn:
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            conn.execute(text(RECENT_SQL), {"sid": random.choice(active)}).fetchall()
+            recent.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            conn.execute(text(LIST_SQL)).fetchall()
+            listing.append(time.perf_counter() - t0)
+    return {"recent": statistics.median(recent), "list": statistics.median(listing)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300_000)
+    parser.add_argument("--sessions", type=int, default=6_000)
+    parser.add_argument("--idle-ratio", type=float, default=0.8, help="超过归档阈值（60~365 天未更新）的会话比例")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--rehydrate", type=int, default=50, help="测量取回延迟的会话数")
+    args = parser.parse_args()
+
+    init_db()
+    path = get_session_db_engine().url.database
+    print(f"生成 {args.messages} 条消息 / {args.sessions} 个会话（{args.idle_ratio:.0%} 空闲）...")
+    t0 = time.perf_counter()
+    active, idle = build_db(path, args.messages, args.sessions, args.idle_ratio)
+    print(f"  完成 {time.perf_counter() - t0:.1f}s")
+
+    before_size = storage_stats()["hot"]["file_bytes"]
+    before = measure(active, args.rounds)
+
+    t0 = time.perf_counter()
+    archived = 0
+    while True:
+        n = archive_idle_sessions(settings.ARCHIVE_IDLE_DAYS, limit=1000)
+        archived += n
+        if n == 0:
+            break
+    archive_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    freed = compact(pages=1 << 30)
+    compact_s = time.perf_counter() - t0
+    stats = storage_stats()
+    after = measure(active, args.rounds)
+
+    samples = []
+    for sid in random.sample(idle, min(args.rehydrate, len(idle))):
+        t0 = time.perf_counter()
+        rehydrate_session(sid)
+        samples.append(time.perf_counter() - t0)
+    dispose_engines()
+
+    hot, cold = stats["hot"], stats["cold"]
+    print(f"\n归档 {archived} 个会话 {archive_s:.1f}s（{archived / archive_s if archive_s else 0:.0f} 会话/s），"
+          f"整理空间 {compact_s:.1f}s 归还 {freed} 页")
+    print("\n=== 热库大小 ===")
+    print(f"  归档前 {before_size / 1024 / 1024:8.1f} MB   归档后 {hot['file_bytes'] / 1024 / 1024:8.1f} MB")
+    print(f"  冷库   {cold['file_bytes'] / 1024 / 1024:8.1f} MB（{cold['messages']} 条消息，压缩比 {cold['compression_ratio']}x）")
+    print("\n=== 活跃会话查询中位延迟 ===")
+    for key, name in (("recent", "get_recent_messages"), ("list", "list_sessions")):
+        b, a = before[key] * 1000, after[key] * 1000
+        print(f"  {name:<20} 归档前 {b:8.3f}ms   归档后 {a:8.3f}ms")
+    if samples:
+        samples.sort()
+        print(f"\n取回归档会话 p50 {statistics.median(samples) * 1000:.1f}ms   "
+              f"p95 {samples[int(len(samples) * 0.95) - 1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+engine 注册表基准：对比「每次调用新建 engine」与「进程级 engine 注册表」的请求吞吐。
+在 backend 目录下运行: python scripts/bench_engine.py [--requests 2000] [--threads 8]
+使用临时目录中的 SQLite 文件，不会改动 data/ 下的数据库。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.connection import dispose_engines, get_or_create_engine
+from app.database.models import Message, SessionBase, Session as SessionModel
+
+
+def _legacy_factory(url: str):
+    """基线实现：每次调用都新建 engine（与改造前的 get_session_db_factory 一致）"""
+    engine = create_engine(url, connect_args={"check_same_thread": False}, echo=False)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _registry_factory(url: str):
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_or_create_engine(url))
+
+
+def _prepare(url: str, n_sessions: int = 50, n_messages: int = 20) -> list[str]:
+    engine = create_engine(url)
+    SessionBase.metadata.create_all(bind=engine)
+    ids = []
+    with sessionmaker(bind=engine)() as db:
+        now = datetime.utcnow()
+        for i in range(n_sessions):
+            sid = str(uuid.uuid4())
+            ids.append(sid)
+            db.add(SessionModel(id=sid, title=f"会话{i}", created_at=now, updated_at=now))
+            for j in range(n_messages):
+                db.add(Message(id=str(uuid.uuid4()), session_id=sid, role="user", content=f"消息{j}"))
+        db.commit()
+    engine.dispose()
+    return ids
+
+
+def _one_request(make_factory, url: str, sid: str) -> None:
+    """模拟一次聊天轮次中的会话库访问：读最近消息 + 列会话"""
+    for _ in range(2):
+        db = make_factory(url)()
+        try:
+            (
+                db.query(Message)
+                .filter(Message.session_id == sid)
+                .order_by(Message.created_at.desc())
+                .limit(10)
+                .all()
+            )
+            db.query(SessionModel).order_by(SessionModel.updated_at.desc()).limit(50).all()
+        finally:
+            db.close()
+
+
+def _run(name: str, make_factory, url: str, ids: list[str], requests: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: _one_request(make_factory, url, ids[i % len(ids)]), range(requests)))
+    elapsed = time.perf_counter() - start
+    rps = requests / elapsed
+    print(f"  {name:<12} {requests} 次请求, {elapsed:.2f}s, {rps:.1f} req/s")
+    return rps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench_sessions.db')}"
+        ids = _prepare(url)
+        print(f"=== engine 基准 (threads={args.threads}) ===")
+        before = _run("每次新建", _legacy_factory, url, ids, args.requests, args.threads)
+        after = _run("注册表", _registry_factory, url, ids, args.requests, args.threads)
+        dispose_engines()
+        print(f"\n提升: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
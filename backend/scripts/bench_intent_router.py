@@ -0,0 +1,106 @@
+"""
+意图路由快速通道基准：统计命中率，并对比快速通道与 LLM Agent 的单次回答延迟。
+在 backend 目录下运行: python scripts/bench_intent_router.py [--rounds 50] [--agent]
+使用临时业务库（自动 seed）；加 --agent 且已配置 KIMI_API_KEY 时才会实际调用 Agent 做对比。
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_smart_data.db')}"
+os.environ["SESSION_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions.db')}"
+os.environ["ARCHIVE_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions_archive.db')}"
+
+from app.config import settings
+from app.database.seed import run_seed
+from app.services.intent_router import get_router
+
+QUESTIONS = [
+    "查询所有部门的员工人数",
+    "最近几个月的销售趋势",
+    "各产品类别的销售占比",
+    "2024年各部门销售额对比",
+    "销售额前5的产品",
+    "员工业绩排名前十",
+    "各部门平均工资",
+    # 以下应回退到 Agent
+    "上面的数据中哪个最高？",
+    "技术部有哪些员工入职超过三年？",
+    "库存低于 50 的产品有哪些",
+]
+
+
+def _ms(xs: list[float]) -> str:
+    xs = sorted(xs)
+    p95 = xs[max(int(len(xs) * 0.95) - 1, 0)]
+    return f"p50={statistics.median(xs) * 1000:.2f}ms p95={p95 * 1000:.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--agent", action="store_true", help="同时测量 Agent 延迟（需要 KIMI_API_KEY）")
+    args = parser.parse_args()
+
+    run_seed()
+    router = get_router()
+
+    print("=== 命中情况 ===")
+    for q in QUESTIONS:
+        ans = router.route(q)
+        print(f"  [{'HIT ' if ans else 'MISS'}] {q}" + (f" -> {ans.template}" if ans else ""))
+
+    print(f"\n=== 快速通道延迟（每题 {args.rounds} 次）===")
+    fast: list[float] = []
+    for q in QUESTIONS:
+        if not router.match(q):
+            continue
+        samples = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            router.route(q)
+            samples.append(time.perf_counter() - t0)
+        fast.extend(samples)
+        print(f"  {q:<20} {_ms(samples)}")
+    print(f"  总体 {_ms(fast)}")
+
+    stats = router.stats()
+    print(f"\n命中率: {stats['hit_rate']:.1%}  (hits={stats['hits']}, misses={stats['misses']})")
+
+    if not args.agent:
+        return
+    if not settings.KIMI_API_KEY:
+        print("\n[WARN] KIMI_API_KEY 未配置，跳过 Agent 延迟对比")
+        return
+    settings.INTENT_ROUTER_ENABLED = False
+    settings.ANSWER_CACHE_ENABLED = False
+    print("\n=== Agent 延迟（每题 1 次）===")
+    agent_samples = asyncio.run(_agent_latency([q for q in QUESTIONS if router.match(q)]))
+    print(f"\n加速比（中位数）: {statistics.median(agent_samples) / statistics.median(fast):.0f}x")
+
+
+async def _agent_latency(questions: list[str]) -> list[float]:
+    """经 astream_agent（与 /api/chat 相同的路径）完整跑完每个问题，记录端到端耗时"""
+    from app.services.llm_service import astream_agent
+
+    samples = []
+    for q in questions:
+        t0 = time.perf_counter()
+        async for _ in astream_agent(q):
+            pass
+        dt = time.perf_counter() - t0
+        samples.append(dt)
+        print(f"  {q:<20} {dt * 1000:.0f}ms")
+    return samples
+
+
+if __name__ == "__main__":
+    main()
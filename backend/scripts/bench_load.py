@@ -0,0 +1,274 @@
+"""
+离线端到端压测：用假 LLM（scripts/fake_llm.py）替换 Kimi，在本机起 uvicorn，
+以可配置并发驱动 /api/chat/stream 与会话接口，统计吞吐、p50/p95/p99 延迟、首事件时间与会话库写锁等待。
+在 backend 目录下运行:
+    python scripts/bench_load.py [--users 20] [--rounds 5] [--latency 0.3] [--token-latency 0.005]
+                                 [--scale 0.1] [--fast-path] [--same-question] [--no-single-flight]
+                                 [--traces traces.json] [--json result.json]
+不需要网络和 KIMI_API_KEY；使用临时库（自动 seed），结束后删除。
+默认关闭意图路由与各级缓存，使每个问题都走完整 Agent；加 --fast-path 保留线上配置。
+--same-question 让所有用户每轮问同一个问题（模拟分享的看板链接），配合 --no-single-flight 对比请求合并的效果。
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_smart_data.db')}"
+os.environ["SESSION_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions.db')}"
+os.environ["ARCHIVE_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions_archive.db')}"
+
+import httpx
+import uvicorn
+from sqlalchemy import event
+
+from app.config import settings
+from app.database.connection import get_async_session_db_engine, get_session_db_engine
+from app.database.seed import run_seed
+from app.main import app
+from app.services import singleflight
+from app.services.agent_pool import get_scheduler
+from fake_llm import install_fake_llm, load_traces
+
+QUESTIONS = [
+    "查询所有部门的员工人数",
+    "最近一年的销售趋势",
+    "销售额最高的产品有哪些",
+    "一共有多少条销售记录",
+]
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE")
+
+
+class WriteStats:
+    """会话库写语句耗时（WAL 下写锁在首条写语句处获取，耗时即包含锁等待）"""
+
+    def __init__(self):
+        self.durations: list[float] = []
+        self.locked_errors = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine) -> None:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("bench_t0", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            t0 = conn.info["bench_t0"].pop()
+            if statement.lstrip().upper().startswith(_WRITE_PREFIXES):
+                with self._lock:
+                    self.durations.append(time.perf_counter() - t0)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(ctx):
+            if ctx.connection is not None and ctx.connection.info.get("bench_t0"):
+                ctx.connection.info["bench_t0"].pop()
+            if "locked" in str(ctx.original_exception):
+                with self._lock:
+                    self.locked_errors += 1
+
+
+class Recorder:
+    def __init__(self):
+        self.latency: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.first_event: list[float] = []
+        self.first_token: list[float] = []
+
+    def add(self, name: str, seconds: float, ok: bool = True) -> None:
+        if ok:
+            self.latency[name].append(seconds)
+        else:
+            self.errors[name] += 1
+
+
+def percentile(xs: list[float], p: float) -> float:
+    """最近秩百分位"""
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(max(math.ceil(p / 100 * len(xs)) - 1, 0), len(xs) - 1)]
+
+
+def summarize(xs: list[float]) -> dict:
+    return {
+        "count": len(xs),
+        "mean_ms": statistics.fmean(xs) * 1000 if xs else 0.0,
+        "p50_ms": percentile(xs, 50) * 1000,
+        "p95_ms": percentile(xs, 95) * 1000,
+        "p99_ms": percentile(xs, 99) * 1000,
+    }
+
+
+async def _timed(rec: Recorder, name: str, coro) -> httpx.Response | None:
+    t0 = time.perf_counter()
+    try:
+        r = await coro
+    except httpx.HTTPError:
+        rec.add(name, 0, ok=False)
+        return None
+    rec.add(name, time.perf_counter() - t0, ok=r.is_success)
+    return r
+
+
+async def chat_once(client: httpx.AsyncClient, rec: Recorder, sid: str, question: str) -> None:
+    """发起一次 SSE 聊天，记录总耗时、首事件时间与首 token 时间"""
+    t0 = time.perf_counter()
+    first_event = first_token = None
+    event_name, ok = None, False
+    try:
+        async with client.stream("POST", "/api/chat/stream", json={"session_id": sid, "message": question}) as resp:
+            async for line in resp.aiter_lines():
+                if line.startswith("event:"):
+                    event_name = line[6:].strip()
+                    if first_event is None:
+                        first_event = time.perf_counter() - t0
+                elif line.startswith("data:"):
+                    if event_name == "message" and first_token is None and '"delta"' in line:
+                        first_token = time.perf_counter() - t0
+                    elif event_name == "done":
+                        ok = True
+                    elif event_name in ("error", "busy"):
+                        break
+    except httpx.HTTPError:
+        ok = False
+    rec.add("POST /api/chat/stream", time.perf_counter() - t0, ok=ok)
+    if ok:
+        if first_event is not None:
+            rec.first_event.append(first_event)
+        if first_token is not None:
+            rec.first_token.append(first_token)
+
+
+async def virtual_user(client: httpx.AsyncClient, rec: Recorder, uid: int, rounds: int, same_question: bool) -> None:
+    r = await _timed(rec, "POST /api/sessions", client.post("/api/sessions", params={"title": f"压测{uid}"}))
+    if r is None or not r.is_success:
+        return
+    sid = r.json()["id"]
+    for i in range(rounds):
+        question = QUESTIONS[i % len(QUESTIONS)] if same_question else QUESTIONS[(uid + i) % len(QUESTIONS)]
+        await chat_once(client, rec, sid, question)
+        await _timed(rec, "GET /api/sessions", client.get("/api/sessions", params={"limit": 20}))
+        await _timed(rec, "GET /api/sessions/{id}", client.get(f"/api/sessions/{sid}", params={"limit": 20}))
+        await _timed(
+            rec, "GET /api/sessions/{id}/messages", client.get(f"/api/sessions/{sid}/messages", params={"limit": 20})
+        )
+
+
+def start_server(port: int) -> tuple[uvicorn.Server, threading.Thread, int]:
+    """在后台线程启动 uvicorn，返回实际监听端口"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn 启动失败")
+        time.sleep(0.05)
+    actual = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, actual
+
+
+async def run_load(base_url: str, users: int, rounds: int, same_question: bool = False) -> tuple[Recorder, float]:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, rec, uid, rounds, same_question) for uid in range(users)))
+        wall = time.perf_counter() - t0
+    return rec, wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20, help="并发虚拟用户数")
+    parser.add_argument("--rounds", type=int, default=5, help="每个用户的提问轮数")
+    parser.add_argument("--latency", type=float, default=0.3, help="假 LLM 每次调用的首 token 延迟（秒）")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="假 LLM 逐 token 延迟（秒）")
+    parser.add_argument("--scale", type=float, default=None, help="业务库规模因子（见 seed.py），默认演示数据")
+    parser.add_argument("--fast-path", action="store_true", help="保留意图路由与缓存（默认关闭，全部走 Agent）")
+    parser.add_argument("--same-question", action="store_true", help="所有用户每轮提同一个问题")
+    parser.add_argument("--no-single-flight", action="store_true", help="关闭相同请求合并")
+    parser.add_argument("--traces", help="ReAct 轨迹 JSON 文件（默认使用 fake_llm.DEFAULT_TRACES）")
+    parser.add_argument("--port", type=int, default=0, help="监听端口，0 为随机")
+    parser.add_argument("--json", help="把结果写入 JSON 文件，便于对比回归")
+    args = parser.parse_args()
+
+    if not args.fast_path:
+        settings.INTENT_ROUTER_ENABLED = False
+        settings.ANSWER_CACHE_ENABLED = False
+        settings.PLAN_CACHE_ENABLED = False
+        settings.SQL_CACHE_ENABLED = False
+    if args.no_single_flight:
+        settings.SINGLE_FLIGHT_ENABLED = False
+    fake_kwargs = {"first_token_latency": args.latency, "token_latency": args.token_latency}
+    if args.traces:
+        fake_kwargs["traces"] = load_traces(args.traces)
+    model = install_fake_llm(**fake_kwargs)
+
+    run_seed(scale=args.scale)
+    writes = WriteStats()
+    writes.attach(get_session_db_engine())
+    writes.attach(get_async_session_db_engine().sync_engine)
+
+    server, thread, port = start_server(args.port)
+    print(f"uvicorn 已启动 127.0.0.1:{port}，{args.users} 用户 × {args.rounds} 轮 ...")
+    try:
+        rec, wall = asyncio.run(run_load(f"http://127.0.0.1:{port}", args.users, args.rounds, args.same_question))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    chats = len(rec.latency["POST /api/chat/stream"])
+    total = sum(len(v) for v in rec.latency.values())
+    result = {
+        "config": vars(args),
+        "wall_seconds": wall,
+        "chat_per_second": chats / wall if wall else 0.0,
+        "requests_per_second": total / wall if wall else 0.0,
+        "llm_calls": model.calls,
+        "endpoints": {k: {**summarize(v), "errors": rec.errors[k]} for k, v in rec.latency.items()},
+        "time_to_first_event": summarize(rec.first_event),
+        "time_to_first_token": summarize(rec.first_token),
+        "session_db_writes": {**summarize(writes.durations), "locked_errors": writes.locked_errors},
+        "scheduler": get_scheduler().stats(),
+        "singleflight": singleflight.stats(),
+    }
+    for k, n in rec.errors.items():
+        result["endpoints"].setdefault(k, {**summarize([]), "errors": n})
+
+    print(f"\n总耗时 {wall:.1f}s  聊天吞吐 {result['chat_per_second']:.2f}/s  请求吞吐 {result['requests_per_second']:.1f}/s  LLM 调用 {model.calls} 次")
+    print(f"\n{'接口':<34}{'次数':>6}{'失败':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, s in result["endpoints"].items():
+        print(f"{name:<34}{s['count']:>6}{s['errors']:>6}{s['p50_ms']:>8.1f}ms{s['p95_ms']:>8.1f}ms{s['p99_ms']:>8.1f}ms")
+    for label, key in (("首事件时间", "time_to_first_event"), ("首 token 时间", "time_to_first_token")):
+        s = result[key]
+        print(f"{label:<30}{s['count']:>6}{'':>6}{s['p50_ms']:>8.1f}ms{s['p95_ms']:>8.1f}ms{s['p99_ms']:>8.1f}ms")
+    w = result["session_db_writes"]
+    print(
+        f"\n会话库写语句（含锁等待）{w['count']} 次  p50={w['p50_ms']:.2f}ms p95={w['p95_ms']:.2f}ms "
+        f"p99={w['p99_ms']:.2f}ms  database is locked: {w['locked_errors']}"
+    )
+    print(f"调度器: {result['scheduler']}")
+    sf = result["singleflight"]
+    print(f"请求合并: 实际执行 {sf['executions']} 次，合并（省下）{sf['coalesced']} 次")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\n结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
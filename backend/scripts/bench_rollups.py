@@ -0,0 +1,136 @@
+"""
+预聚合汇总表基准：在规模化业务库上对比常见分析查询直接扫 sales_records 与查汇总表的延迟，
+并测量全量构建与增量刷新的耗时。
+在 backend 目录下运行: python scripts/bench_rollups.py [--scale 1] [--rounds 5] [--append 10000]
+使用临时业务库（规模模式 seed），结束后删除。
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_smart_data.db')}"
+os.environ["SESSION_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions.db')}"
+os.environ["ARCHIVE_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions_archive.db')}"
+
+from sqlalchemy import text
+
+from app.database.connection import get_engine
+from app.database.rollups import rebuild_rollups, refresh_rollups
+from app.database.seed import run_seed
+
+# (名称, 原表查询, 汇总表查询)；两者结果应一致
+QUERIES = [
+    (
+        "月度销售趋势",
+        "SELECT substr(sale_date, 1, 7) AS m, SUM(amount) FROM sales_records GROUP BY m ORDER BY m",
+        "SELECT month, SUM(amount) FROM rollup_sales_monthly GROUP BY month ORDER BY month",
+    ),
+    (
+        "产品类别占比",
+        "SELECT p.category, SUM(s.amount) AS v FROM sales_records s JOIN products p ON p.id = s.product_id "
+        "GROUP BY p.category ORDER BY p.category",
+        "SELECT category, SUM(amount) FROM rollup_sales_monthly GROUP BY category ORDER BY category",
+    ),
+    (
+        "2024 年各部门销售额",
+        "SELECT d.name, SUM(s.amount) FROM sales_records s JOIN employees e ON e.id = s.employee_id "
+        "JOIN departments d ON d.id = e.department_id "
+        "WHERE s.sale_date BETWEEN '2024-01-01' AND '2024-12-31' GROUP BY d.id ORDER BY d.id",
+        "SELECT d.name, SUM(r.amount) FROM rollup_sales_daily r JOIN departments d ON d.id = r.department_id "
+        "WHERE r.sale_date BETWEEN '2024-01-01' AND '2024-12-31' GROUP BY d.id ORDER BY d.id",
+    ),
+    (
+        "员工业绩 Top10",
+        "SELECT employee_id, SUM(amount) AS v FROM sales_records GROUP BY employee_id ORDER BY v DESC, employee_id LIMIT 10",
+        "SELECT employee_id, SUM(amount) AS v FROM rollup_employee_monthly GROUP BY employee_id "
+        "ORDER BY v DESC, employee_id LIMIT 10",
+    ),
+    (
+        "产品销售额 Top10",
+        "SELECT product_id, SUM(amount) AS v FROM sales_records GROUP BY product_id ORDER BY v DESC, product_id LIMIT 10",
+        "SELECT product_id, SUM(amount) AS v FROM rollup_product_monthly GROUP BY product_id "
+        "ORDER BY v DESC, product_id LIMIT 10",
+    ),
+]
+
+
+def measure(conn, sql: str, rounds: int) -> tuple[float, list]:
+    samples, rows = [], []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        rows = conn.execute(text(sql)).fetchall()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), rows
+
+
+def same_result(a: list, b: list) -> bool:
+    """逐行比较；浮点求和顺序不同，金额按相对误差比较"""
+    if len(a) != len(b):
+        return False
+    for ra, rb in zip(a, b):
+        for va, vb in zip(ra, rb):
+            if isinstance(va, float) or isinstance(vb, float):
+                if not math.isclose(va, vb, rel_tol=1e-9, abs_tol=1e-6):
+                    return False
+            elif va != vb:
+                return False
+    return True
+
+
+def append_rows(engine, n: int) -> None:
+    """复制最近 n 条销售记录为新行，模拟增量写入"""
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO sales_records (product_id, employee_id, quantity, amount, sale_date) "
+                "SELECT product_id, employee_id, quantity, amount, sale_date FROM sales_records "
+                "ORDER BY id DESC LIMIT :n"
+            ),
+            {"n": n},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0, help="业务库规模因子，1 约为 100 万条 sales_records")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--append", type=int, default=10_000, help="增量刷新测试追加的行数")
+    args = parser.parse_args()
+
+    run_seed(scale=args.scale)
+    engine = get_engine()
+
+    t0 = time.perf_counter()
+    rebuild_rollups(engine)
+    print(f"\n全量构建汇总表: {time.perf_counter() - t0:.2f}s")
+
+    append_rows(engine, args.append)
+    t0 = time.perf_counter()
+    folded = refresh_rollups(engine)
+    print(f"增量刷新 {folded} 条新记录: {(time.perf_counter() - t0) * 1000:.1f}ms")
+    t0 = time.perf_counter()
+    refresh_rollups(engine)
+    print(f"无新数据时刷新: {(time.perf_counter() - t0) * 1000:.2f}ms")
+
+    print(f"\n=== 查询中位延迟（每条 {args.rounds} 次）===")
+    with engine.connect() as conn:
+        for name, raw_sql, rollup_sql in QUERIES:
+            raw_t, raw_rows = measure(conn, raw_sql, args.rounds)
+            roll_t, roll_rows = measure(conn, rollup_sql, args.rounds)
+            ok = "一致" if same_result(raw_rows, roll_rows) else "不一致!"
+            print(
+                f"  {name:<14} 原表 {raw_t * 1000:9.2f}ms   汇总表 {roll_t * 1000:8.2f}ms   "
+                f"{raw_t / roll_t if roll_t else 0:6.0f}x   结果{ok}"
+            )
+
+
+if __name__ == "__main__":
+    main()
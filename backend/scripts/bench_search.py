@@ -0,0 +1,211 @@
+"""
+会话检索基准：在合成的百万级消息会话库上测量
+迁移 v6 回填 FTS5 索引的耗时与索引体积、触发器同步下的写入吞吐，
+以及 GET /api/search 的检索延迟（FTS5 vs LIKE 全表扫描）。
+在 backend 目录下运行: python scripts/bench_search.py [--messages 1000000] [--sessions 20000]
+使用临时会话库，结束后删除。
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_smart_data.db')}"
+os.environ["SESSION_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions.db')}"
+os.environ["ARCHIVE_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions_archive.db')}"
+
+from sqlalchemy import text
+
+from app.database import dispose_async_engines, dispose_engines, init_db
+from app.database.connection import get_async_session_db_factory, get_session_db_engine
+from app.database.migrations import SESSION_MIGRATIONS, run_migrations
+from app.services.search_service import parse_terms, search
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+DEPARTMENTS = ["销售部", "技术部", "市场部", "财务部", "人事部", "运营部", "客服部", "采购部"]
+METRICS = ["销售额", "预算", "成本", "利润", "订单量", "客单价", "回款", "毛利率"]
+PRODUCTS = ["笔记本电脑", "智能手表", "蓝牙耳机", "显示器", "机械键盘", "Budget Plan", "Pro License", "Cloud Storage"]
+QUESTIONS = [
+    "上个月{d}的{m}是多少？",
+    "{d}今年每个月的{m}趋势",
+    "对比{d}和{d2}的{m}",
+    "{p}在{d}的{m}排名前五的员工",
+    "{d} {p} 第 {i} 笔订单的{m}",
+]
+ANSWERS = [
+    "根据查询结果，{d}上个月{m}为 {n:,} 元，环比增长 {r}%。",
+    "{d}的{p}{m}最高，达到 {n:,} 元；{d2}次之。",
+    "{p} 的{m}在 {d} 中占比 {r}%，共 {n:,} 单。",
+]
+QUERIES = [
+    ("销售部", "高频长词"),
+    ("笔记本电脑 回款", "长词 + 短词"),
+    ("Budget Plan", "英文（不区分大小写）"),
+    ('"第 123450 笔"', "稀有短语"),
+    ("毛利率 人事部", "两个长词"),
+    ("预算", "短词（扫描）"),
+    ("部预 xx", "罕见短词（全表扫描）"),
+]
+
+DROP_SEARCH = [
+    "DROP TRIGGER IF EXISTS messages_search_ai",
+    "DROP TRIGGER IF EXISTS messages_search_au",
+    "DROP TRIGGER IF EXISTS messages_search_ad",
+    "DROP TRIGGER IF EXISTS sessions_search_ai",
+    "DROP TRIGGER IF EXISTS sessions_search_au",
+    "DROP TRIGGER IF EXISTS sessions_search_ad",
+    "DROP TABLE IF EXISTS search_fts",
+    "DROP TABLE IF EXISTS search_docs",
+    "PRAGMA user_version=5",
+]
+
+
+def _content(i: int) -> tuple[str, str]:
+    d, d2 = random.sample(DEPARTMENTS, 2)
+    kw = {"d": d, "d2": d2, "m": random.choice(METRICS), "p": random.choice(PRODUCTS), "i": i}
+    if i % 10 == 0:
+        return "user", QUESTIONS[-1].format(**kw)
+    if i % 2 == 0:
+        return "user", random.choice(QUESTIONS[:-1]).format(**kw)
+    return "assistant", random.choice(ANSWERS).format(n=random.randint(1_000, 9_999_999), r=random.randint(1, 60), **kw)
+
+
+def build_db(path: str, n_messages: int, n_sessions: int, batch_size: int = 50_000) -> list[str]:
+    """在 init_db 建好的表上去掉检索对象（模拟升级前的库）后用 sqlite3 批量写入"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    for sql in DROP_SEARCH:
+        conn.execute(sql)
+    base = datetime(2024, 1, 1)
+    sids = [str(uuid.uuid4()) for _ in range(n_sessions)]
+    conn.executemany(
+        "INSERT INTO sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        [
+            (sid, f"{random.choice(DEPARTMENTS)}{random.choice(METRICS)}分析 {i}", base.strftime(TS_FORMAT),
+             (base + timedelta(minutes=i)).strftime(TS_FORMAT))
+            for i, sid in enumerate(sids)
+        ],
+    )
+    insert_messages(conn, sids, 0, n_messages, batch_size)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return sids
+
+
+def insert_messages(conn: sqlite3.Connection, sids: list[str], start: int, count: int, batch_size: int) -> None:
+    base = datetime(2024, 1, 1)
+    batch = []
+    for i in range(start, start + count):
+        role, content = _content(i)
+        batch.append((str(uuid.uuid4()), random.choice(sids), role, content, (base + timedelta(seconds=i)).strftime(TS_FORMAT)))
+        if len(batch) >= batch_size:
+            conn.executemany("INSERT INTO messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", batch)
+
+
+def index_bytes(path: str) -> int | None:
+    """search_fts 影子表 + search_docs 占用的字节数（需要 SQLite 编译了 dbstat）"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'search_fts%' OR name LIKE '%search_docs%'"
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def _pct(samples: list[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[max(0, int(len(samples) * p) - 1)] * 1000
+
+
+async def measure(rounds: int) -> list[tuple]:
+    factory = get_async_session_db_factory()
+    out = []
+    for query, label in QUERIES:
+        fts, scan = [], []
+        hits = 0
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            results, _ = await search(query, limit=20)
+            fts.append(time.perf_counter() - t0)
+            hits = len(results)
+        terms = parse_terms(query)
+        like = " AND ".join(f"content LIKE :t{i}" for i in range(len(terms)))
+        params = {f"t{i}": f"%{t}%" for i, t in enumerate(terms)}
+        async with factory() as db:
+            for _ in range(max(1, rounds // 10)):
+                t0 = time.perf_counter()
+                (await db.execute(
+                    text(f"SELECT id, content FROM messages WHERE {like} ORDER BY created_at DESC LIMIT 20"), params
+                )).all()
+                scan.append(time.perf_counter() - t0)
+        out.append((query, label, hits, statistics.median(fts) * 1000, _pct(fts, 0.95), statistics.median(scan) * 1000))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=20_000, help="测量触发器同步写入吞吐的消息数")
+    args = parser.parse_args()
+
+    init_db()
+    engine = get_session_db_engine()
+    path = engine.url.database
+    print(f"生成 {args.messages} 条消息 / {args.sessions} 个会话（升级前的库）...")
+    t0 = time.perf_counter()
+    sids = build_db(path, args.messages, args.sessions)
+    print(f"  完成 {time.perf_counter() - t0:.1f}s，库文件 {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+    engine.dispose()
+    t0 = time.perf_counter()
+    run_migrations(engine, SESSION_MIGRATIONS)
+    backfill_s = time.perf_counter() - t0
+    size = index_bytes(path)
+    print(f"\n迁移 v6 回填索引 {backfill_s:.1f}s（{args.messages / backfill_s:,.0f} 条/s）", end="")
+    print(f"，索引 {size / 1024 / 1024:.1f} MB" if size else "")
+
+    conn = sqlite3.connect(path)
+    t0 = time.perf_counter()
+    insert_messages(conn, sids, args.messages, args.writes, batch_size=1)
+    conn.commit()
+    write_s = time.perf_counter() - t0
+    conn.close()
+    print(f"逐条写入（触发器同步索引）{args.writes / write_s:,.0f} 条/s")
+
+    rows = asyncio.run(_measure_and_dispose(args.rounds))
+    dispose_engines()
+    print(f"\n=== 检索延迟（{args.rounds} 轮，LIMIT 20）===")
+    print(f"  {'查询':<16}{'类型':<22}{'命中':>4}{'p50':>10}{'p95':>10}{'LIKE 扫描':>12}")
+    for query, label, hits, p50, p95, scan in rows:
+        print(f"  {query:<16}{label:<22}{hits:>4}{p50:>8.2f}ms{p95:>8.2f}ms{scan:>10.1f}ms")
+
+
+async def _measure_and_dispose(rounds: int) -> list[tuple]:
+    try:
+        return await measure(rounds)
+    finally:
+        await dispose_async_engines()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+会话库索引基准：在合成的百万级消息库上，对比迁移（加索引）前后的
+get_recent_messages / list_sessions 查询延迟。
+在 backend 目录下运行: python scripts/bench_session_indexes.py [--messages 1000000] [--sessions 20000]
+库文件生成在临时目录，结束后删除。
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+from sqlalchemy import create_engine, text
+
+from app.database.migrations import SESSION_MIGRATIONS, get_schema_version, run_migrations
+
+# 改造前的表结构（无索引）
+LEGACY_DDL = [
+    """CREATE TABLE sessions (
+        id VARCHAR(36) PRIMARY KEY, title VARCHAR(256),
+        created_at DATETIME, updated_at DATETIME)""",
+    """CREATE TABLE messages (
+        id VARCHAR(36) PRIMARY KEY, session_id VARCHAR(36) NOT NULL REFERENCES sessions(id),
+        role VARCHAR(16) NOT NULL, content TEXT, chart_data JSON, created_at DATETIME)""",
+]
+
+RECENT_SQL = (
+    "SELECT id, role, content, created_at FROM messages WHERE session_id = :sid "
+    "ORDER BY created_at DESC LIMIT 10"
+)
+LIST_SQL = "SELECT id, title, updated_at FROM sessions ORDER BY updated_at DESC LIMIT 50"
+
+
+def build_db(path: str, n_messages: int, n_sessions: int) -> list[str]:
+    """用 sqlite3 executemany 批量生成合成数据"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    for ddl in LEGACY_DDL:
+        conn.execute(ddl)
+    base = datetime(2024, 1, 1)
+    sids = [str(uuid.uuid4()) for _ in range(n_sessions)]
+    conn.executemany(
+        "INSERT INTO sessions VALUES (?, ?, ?, ?)",
+        [(sid, f"会话{i}", base.isoformat(" "), (base + timedelta(minutes=i)).isoformat(" ")) for i, sid in enumerate(sids)],
+    )
+    batch = []
+    for i in range(n_messages):
+        ts = base + timedelta(seconds=i)
+        batch.append((str(uuid.uuid4()), random.choice(sids), "user" if i % 2 == 0 else "assistant", f"消息内容 {i}", None, ts.isoformat(" ")))
+        if len(batch) >= 50_000:
+            conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    return sids
+
+
+def measure(engine, sids: list[str], rounds: int) -> dict:
+    recent, listing = [], []
+    with engine.connect() as conn:
+        for _ in range(rounds):
+            sid = random.choice(sids)
+            t0 = time.perf_counter()
+            conn.execute(text(RECENT_SQL), {"sid": sid}).fetchall()
+            recent.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            conn.execute(text(LIST_SQL)).fetchall()
+            listing.append(time.perf_counter() - t0)
+    return {"recent": statistics.median(recent), "list": statistics.median(listing)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_sessions.db")
+        print(f"生成 {args.messages} 条消息 / {args.sessions} 个会话 ...")
+        t0 = time.perf_counter()
+        sids = build_db(path, args.messages, args.sessions)
+        print(f"  完成 {time.perf_counter() - t0:.1f}s")
+
+        engine = create_engine(f"sqlite:///{path}")
+        before = measure(engine, sids, args.rounds)
+
+        t0 = time.perf_counter()
+        run_migrations(engine, SESSION_MIGRATIONS)
+        with engine.connect() as conn:
+            version = get_schema_version(conn)
+        print(f"迁移到 v{version} 用时 {time.perf_counter() - t0:.1f}s")
+
+        after = measure(engine, sids, args.rounds)
+        engine.dispose()
+
+    print("\n=== 中位延迟 ===")
+    for key, name in (("recent", "get_recent_messages"), ("list", "list_sessions")):
+        b, a = before[key] * 1000, after[key] * 1000
+        print(f"  {name:<20} 无索引 {b:8.2f}ms   有索引 {a:8.3f}ms   {b / a if a else 0:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+启动基准：在全新子进程中测量导入耗时与服务启动到可用的时间。
+- import app.main（应用导入，决定 uvicorn worker / --reload 的冷启动）与 LangChain 依赖导入各自的耗时
+- -X importtime 统计导入 app.main 时最慢的顶层模块
+- 启动 uvicorn 子进程，轮询 /health 与 /ready，得到「可响应」与「预热完成」的时间
+在 backend 目录下运行: python scripts/bench_startup.py [--rounds 5] [--top 15] [--port 8765]
+使用临时数据库，结束后删除。
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.getcwd())
+
+_tmp = tempfile.TemporaryDirectory()
+ENV = {
+    **os.environ,
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp.name, 'bench_smart_data.db')}",
+    "SESSION_DB_URL": f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions.db')}",
+    "ARCHIVE_DB_URL": f"sqlite:///{os.path.join(_tmp.name, 'bench_sessions_archive.db')}",
+    "ROLLUP_ENABLED": "false",
+}
+
+IMPORT_SNIPPETS = {
+    "import app.main": "import app.main",
+    "LangChain 依赖（预热阶段）": "from app.services.warmup import _import_langchain; _import_langchain()",
+}
+
+
+def time_import(snippet: str) -> float:
+    """在新解释器中执行 snippet，返回其耗时（不含解释器自身启动）"""
+    code = f"import time; t0 = time.perf_counter(); {snippet}; print(time.perf_counter() - t0)"
+    out = subprocess.run([sys.executable, "-c", code], env=ENV, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list[tuple[str, float]]:
+    """-X importtime：导入 app.main 时累计耗时最长的顶层模块（秒）"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], env=ENV, capture_output=True, text=True, check=True
+    )
+    totals = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (p.strip() for p in line[len("import time:"):].split("|", 2))
+        raw_name = line.rsplit("|", 1)[1]
+        if not cumulative.isdigit() or raw_name.startswith("   "):
+            continue  # 表头或嵌套导入
+        top_pkg = name.split(".")[0]
+        totals[top_pkg] = totals.get(top_pkg, 0) + int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+
+
+def _get_status(url: str) -> int | None:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def time_startup(port: int, timeout: float = 120) -> tuple[float, float]:
+    """启动 uvicorn 子进程，返回 (/health 首次 200 的时间, /ready 首次 200 的时间)"""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=ENV,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    health = ready = None
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn 进程提前退出")
+            if health is None and _get_status(f"http://127.0.0.1:{port}/health") == 200:
+                health = time.perf_counter() - t0
+            if health is not None and _get_status(f"http://127.0.0.1:{port}/ready") == 200:
+                ready = time.perf_counter() - t0
+                break
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    if ready is None:
+        raise RuntimeError(f"{timeout:.0f}s 内未就绪")
+    return health, ready
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="列出最慢的顶层模块数")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"=== 导入耗时（新进程，{args.rounds} 次中位数）===")
+    for label, snippet in IMPORT_SNIPPETS.items():
+        samples = [time_import(snippet) for _ in range(args.rounds)]
+        print(f"  {label:<28} {statistics.median(samples) * 1000:8.1f}ms  (min {min(samples) * 1000:.1f}ms)")
+
+    print("\n=== import app.main 最慢的顶层模块（-X importtime 累计）===")
+    for name, seconds in slowest_imports(args.top):
+        print(f"  {name:<28} {seconds * 1000:8.1f}ms")
+
+    print(f"\n=== uvicorn 启动（{args.rounds} 次中位数）===")
+    results = [time_startup(args.port) for _ in range(args.rounds)]
+    health = statistics.median(r[0] for r in results)
+    ready = statistics.median(r[1] for r in results)
+    print(f"  进程启动 -> /health 200     {health * 1000:8.1f}ms")
+    print(f"  进程启动 -> /ready 200      {ready * 1000:8.1f}ms  （后台预热：LangChain 导入 + 表结构反射 + Agent 构建）")
+
+
+if __name__ == "__main__":
+    main()
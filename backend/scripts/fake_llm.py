@@ -0,0 +1,164 @@
+"""
+离线压测用的假聊天模型：不访问网络，按脚本输出 ReAct 轨迹，可配置首 token 延迟与逐 token 延迟。
+替换 llm_service._get_llm 后，Agent / 计划缓存回答 / 滚动摘要都会走这个模型：
+
+    from fake_llm import install_fake_llm
+    install_fake_llm(first_token_latency=0.3)
+
+轨迹格式（也可从 JSON 文件加载，见 load_traces）：
+    {"keywords": ["部门", "人数"],                       问题包含全部关键词时选用
+     "steps": [["sql_db_query", "SELECT ..."], ...],    依次输出的 Action / Action Input
+     "answer": "最终回答，可带 [CHART]...[/CHART]"}
+没有匹配的轨迹时使用最后一条（默认轨迹）。
+"""
+import asyncio
+import json
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+DEFAULT_TRACES = [
+    {
+        "keywords": ["部门", "人数"],
+        "steps": [
+            ["sql_db_list_tables", ""],
+            ["sql_db_schema", "departments, employees"],
+            [
+                "sql_db_query",
+                "SELECT d.name AS 部门, COUNT(e.id) AS 人数 FROM departments d "
+                "LEFT JOIN employees e ON e.department_id = d.id GROUP BY d.id ORDER BY 人数 DESC",
+            ],
+        ],
+        "answer": "各部门员工人数如下：技术部人数最多，其次是销售部。\n\n"
+        '[CHART]{"type": "bar", "x": "部门", "y": ["人数"], "title": "各部门员工人数"}[/CHART]',
+    },
+    {
+        "keywords": ["销售", "趋势"],
+        "steps": [
+            ["sql_db_schema", "sales_records"],
+            [
+                "sql_db_query",
+                "SELECT strftime('%Y-%m', sale_date) AS month, ROUND(SUM(amount), 2) AS total "
+                "FROM sales_records GROUP BY month ORDER BY month DESC LIMIT 12",
+            ],
+        ],
+        "answer": "最近 12 个月销售额整体呈上升趋势，11 月为全年高峰。\n\n"
+        '[CHART]{"type": "line", "x": "month", "y": ["total"], "title": "月度销售趋势"}[/CHART]',
+    },
+    {
+        "keywords": ["产品"],
+        "steps": [
+            ["sql_db_schema", "products, sales_records"],
+            [
+                "sql_db_query",
+                "SELECT p.name, ROUND(SUM(s.amount), 2) AS total FROM sales_records s "
+                "JOIN products p ON p.id = s.product_id GROUP BY p.id ORDER BY total DESC LIMIT 5",
+            ],
+        ],
+        "answer": "销售额排名前 5 的产品已列出，头部产品贡献了大部分销售额。",
+    },
+    {
+        "keywords": [],
+        "steps": [
+            ["sql_db_list_tables", ""],
+            ["sql_db_query", "SELECT COUNT(*) FROM sales_records"],
+        ],
+        "answer": "已根据数据库查询结果完成统计。",
+    },
+]
+
+SUMMARY_MARKER = "【已有摘要】"
+
+
+def load_traces(path: str) -> list[dict]:
+    """从 JSON 文件加载轨迹列表"""
+    with open(path, encoding="utf-8") as f:
+        traces = json.load(f)
+    if not traces:
+        raise ValueError("轨迹文件为空")
+    return traces
+
+
+class FakeReActChatModel(BaseChatModel):
+    """按脚本回放 ReAct 轨迹的确定性聊天模型"""
+
+    first_token_latency: float = 0.3
+    token_latency: float = 0.005
+    chunk_chars: int = 4
+    traces: list[dict] = Field(default_factory=lambda: list(DEFAULT_TRACES))
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-react"
+
+    def _pick_trace(self, question: str) -> dict:
+        for trace in self.traces:
+            if trace["keywords"] and all(k in question for k in trace["keywords"]):
+                return trace
+        return self.traces[-1]
+
+    def _respond(self, messages) -> str:
+        """根据 prompt 决定输出：ReAct 下一步 / 最终回答 / 摘要"""
+        self.calls += 1
+        prompt = "\n".join(str(m.content) for m in messages)
+        if SUMMARY_MARKER in prompt:
+            return "用户关注部门人数、销售趋势与产品排名。"
+        pos = prompt.rfind("Question:")
+        if pos < 0 or "Action Input" not in prompt:
+            # 非 ReAct 调用（如计划缓存的回答组织）：直接给出回答
+            return self._pick_trace(prompt)["answer"]
+        tail = prompt[pos + len("Question:"):]
+        question = tail.split("\nThought:", 1)[0]
+        trace = self._pick_trace(question)
+        done = tail.count("Observation:")
+        if done < len(trace["steps"]):
+            tool, tool_input = trace["steps"][done]
+            return f"Thought: 需要调用 {tool}\nAction: {tool}\nAction Input: {tool_input}"
+        return f"Thought: I now know the final answer\nFinal Answer: {trace['answer']}"
+
+    def _chunks(self, text: str) -> list[str]:
+        n = max(self.chunk_chars, 1)
+        return [text[i:i + n] for i in range(0, len(text), n)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = self._respond(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(self._chunks(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = self._respond(messages)
+        await asyncio.sleep(self.first_token_latency + self.token_latency * len(self._chunks(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_latency)
+        for piece in self._chunks(self._respond(messages)):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+            time.sleep(self.token_latency)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_latency)
+        for piece in self._chunks(self._respond(messages)):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.token_latency)
+
+
+def install_fake_llm(**kwargs) -> FakeReActChatModel:
+    """用假模型替换 llm_service._get_llm（挂上同样的指标回调），返回模型实例（可读取 calls 计数）"""
+    from app.services import llm_service
+    from app.services.llm_metrics import LLM_METRICS
+
+    kwargs.setdefault("callbacks", [LLM_METRICS])
+    model = FakeReActChatModel(**kwargs)
+    llm_service._get_llm = lambda: model
+    return model
@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react'
 import ReactMarkdown from 'react-markdown'
 import { Skeleton } from 'antd'
+import { exportUrl } from '../../services/api'
 import type { Message } from '../../types'
 import styles from './MessageItem.module.css'
 
@@ -52,6 +53,13 @@ export function MessageItem({ message, isStreaming }: MessageItemProps) {
               <ReactMarkdown>{displayContent}</ReactMarkdown>
             </div>
             {isStreaming && <span className={styles.cursor}>▋</span>}
+            {!isStreaming && message.exportable && (
+              <div className={styles.exportLinks}>
+                导出结果：
+                <a href={exportUrl(message.id, 'csv')} download>CSV</a>
+                <a href={exportUrl(message.id, 'ndjson')} download>JSON Lines</a>
+              </div>
+            )}
           </>
         )}
       </div>
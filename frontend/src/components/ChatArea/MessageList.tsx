@@ -1,23 +1,48 @@
-import { useRef, useEffect } from 'react'
+import { useRef, useEffect, useLayoutEffect } from 'react'
+import { Button } from 'antd'
 import { useChatStore } from '../../store/chatStore'
 import { MessageItem } from './MessageItem'
 import styles from './MessageList.module.css'
 
 export function MessageList() {
-  const { messages, currentSessionId, isStreaming } = useChatStore()
+  const { messages, currentSessionId, isStreaming, messagesBefore, loadingMore, loadOlderMessages } = useChatStore()
   const endRef = useRef<HTMLDivElement>(null)
+  const scrollRef = useRef<HTMLDivElement>(null)
+  // 加载更早消息前的滚动高度，用于在顶部插入后保持可视位置
+  const prevHeight = useRef<number | null>(null)
 
   const list = currentSessionId ? messages.filter((m) => m.session_id === currentSessionId) : []
   const sessions = useChatStore((s) => s.sessions)
-  const lastMsgContent = list[list.length - 1]?.content ?? ''
+  const lastMsg = list[list.length - 1]
+  const lastMsgContent = lastMsg?.content ?? ''
 
   useEffect(() => {
     endRef.current?.scrollIntoView({ behavior: 'smooth' })
-  }, [list.length, isStreaming, lastMsgContent.length])
+  }, [lastMsg?.id, isStreaming, lastMsgContent.length])
+
+  useLayoutEffect(() => {
+    const el = scrollRef.current
+    if (el && prevHeight.current !== null) {
+      el.scrollTop += el.scrollHeight - prevHeight.current
+      prevHeight.current = null
+    }
+  }, [list[0]?.id])
+
+  const loadOlder = () => {
+    prevHeight.current = scrollRef.current?.scrollHeight ?? null
+    loadOlderMessages()
+  }
 
   return (
-    <div className={styles.scroll}>
+    <div className={styles.scroll} ref={scrollRef}>
       <div className={styles.inner}>
+        {messagesBefore && list.length > 0 && (
+          <div className={styles.older}>
+            <Button size="small" loading={loadingMore} onClick={loadOlder}>
+              加载更早的消息
+            </Button>
+          </div>
+        )}
         {!currentSessionId && sessions.length > 0 ? (
           <div className={styles.empty}>请从左侧选择或新建一个会话</div>
         ) : list.length === 0 ? (
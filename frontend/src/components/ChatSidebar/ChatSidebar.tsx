@@ -1,6 +1,8 @@
-import { Button, List, Dropdown, message } from 'antd'
+import { useState } from 'react'
+import { Button, List, Dropdown, Input, message } from 'antd'
 import { PlusOutlined, MoreOutlined, EditOutlined, DeleteOutlined } from '@ant-design/icons'
 import { useChatStore } from '../../store/chatStore'
+import { searchSessions, type SearchHit } from '../../services/api'
 import type { Session } from '../../types'
 import type { MenuProps } from 'antd'
 import styles from './ChatSidebar.module.css'
@@ -9,8 +11,68 @@ interface ChatSidebarProps {
   className?: string
 }
 
+/** 按 highlight 标记把摘要切成普通文本与高亮片段 */
+function Snippet({ text, marks }: { text: string; marks: [string, string] }) {
+  const [open, close] = marks
+  return (
+    <>
+      {text.split(open).map((part, i) => {
+        if (i === 0) return <span key={i}>{part}</span>
+        const [hit, rest = ''] = part.split(close)
+        return (
+          <span key={i}>
+            <mark>{hit}</mark>
+            {rest}
+          </span>
+        )
+      })}
+    </>
+  )
+}
+
 export function ChatSidebar({ className }: ChatSidebarProps) {
-  const { sessions, currentSessionId, createSession, switchSession, deleteSession, renameSession } = useChatStore()
+  const {
+    sessions,
+    currentSessionId,
+    sessionsCursor,
+    loadingMore,
+    createSession,
+    switchSession,
+    deleteSession,
+    renameSession,
+    loadMoreSessions,
+  } = useChatStore()
+  const [query, setQuery] = useState('')
+  const [hits, setHits] = useState<SearchHit[] | null>(null)
+  const [marks, setMarks] = useState<[string, string]>(['\u0002', '\u0003'])
+  const [nextOffset, setNextOffset] = useState<number | null>(null)
+  const [searching, setSearching] = useState(false)
+
+  const runSearch = async (q: string, offset = 0) => {
+    if (!q.trim()) {
+      setHits(null)
+      setNextOffset(null)
+      return
+    }
+    setSearching(true)
+    try {
+      const res = await searchSessions(q.trim(), offset)
+      setHits((prev) => (offset > 0 && prev ? [...prev, ...res.results] : res.results))
+      setMarks(res.highlight)
+      setNextOffset(res.next_offset)
+    } catch {
+      message.error('搜索失败')
+    } finally {
+      setSearching(false)
+    }
+  }
+
+  const openHit = (hit: SearchHit) => {
+    switchSession(hit.session_id)
+    setQuery('')
+    setHits(null)
+    setNextOffset(null)
+  }
 
   const sortedSessions = [...sessions].sort(
     (a, b) => new Date(b.updated_at).getTime() - new Date(a.updated_at).getTime()
@@ -41,24 +103,70 @@ export function ChatSidebar({ className }: ChatSidebarProps) {
         <Button type="primary" icon={<PlusOutlined />} block onClick={() => createSession()}>
           新建对话
         </Button>
+        <Input.Search
+          className={styles.search}
+          placeholder="搜索历史对话"
+          allowClear
+          value={query}
+          loading={searching}
+          onChange={(e) => {
+            setQuery(e.target.value)
+            if (!e.target.value) setHits(null)
+          }}
+          onSearch={(q) => runSearch(q)}
+        />
       </div>
-      <List
-        className={styles.list}
-        dataSource={sortedSessions}
-        renderItem={(item) => (
-          <List.Item
-            className={currentSessionId === item.id ? styles.itemActive : styles.item}
-            onClick={() => switchSession(item.id)}
-            actions={[
-              <Dropdown key="more" menu={{ items: menuItems(item) }} trigger={['click']} placement="bottomRight">
-                <Button type="text" size="small" icon={<MoreOutlined />} onClick={(e) => e.stopPropagation()} />
-              </Dropdown>,
-            ]}
-          >
-            <List.Item.Meta title={item.title} />
-          </List.Item>
-        )}
-      />
+      {hits ? (
+        <List
+          className={styles.list}
+          dataSource={hits}
+          locale={{ emptyText: '没有匹配的对话' }}
+          loadMore={
+            nextOffset !== null && (
+              <div className={styles.more}>
+                <Button size="small" loading={searching} onClick={() => runSearch(query, nextOffset ?? 0)}>
+                  加载更多
+                </Button>
+              </div>
+            )
+          }
+          renderItem={(hit) => (
+            <List.Item className={styles.item} onClick={() => openHit(hit)}>
+              <List.Item.Meta
+                title={hit.message_id ? hit.session_title : <Snippet text={hit.snippet} marks={marks} />}
+                description={hit.message_id && <Snippet text={hit.snippet} marks={marks} />}
+              />
+            </List.Item>
+          )}
+        />
+      ) : (
+        <List
+          className={styles.list}
+          dataSource={sortedSessions}
+          loadMore={
+            sessionsCursor && (
+              <div className={styles.more}>
+                <Button size="small" loading={loadingMore} onClick={() => loadMoreSessions()}>
+                  加载更多会话
+                </Button>
+              </div>
+            )
+          }
+          renderItem={(item) => (
+            <List.Item
+              className={currentSessionId === item.id ? styles.itemActive : styles.item}
+              onClick={() => switchSession(item.id)}
+              actions={[
+                <Dropdown key="more" menu={{ items: menuItems(item) }} trigger={['click']} placement="bottomRight">
+                  <Button type="text" size="small" icon={<MoreOutlined />} onClick={(e) => e.stopPropagation()} />
+                </Dropdown>,
+              ]}
+            >
+              <List.Item.Meta title={item.title} />
+            </List.Item>
+          )}
+        />
+      )}
       <div className={styles.footer}>智能数据分析助理 · Phase4</div>
     </div>
   )
@@ -15,7 +15,7 @@ export function ChartPanel({ className }: ChartPanelProps) {
 
   const sessionCharts = currentSessionId ? charts.filter((c) => c.session_id === currentSessionId) : []
   const currentChart = sessionCharts.find((c) => c.id === currentChartId) ?? sessionCharts[0]
-  const showChartLoading = chartLoading
+  const showChartLoading = chartLoading || (!!currentChart && !currentChart.option)
 
   const handleDownload = () => {
     if (!currentChart?.option) return
@@ -51,7 +51,9 @@ export function ChartPanel({ className }: ChartPanelProps) {
                   <Spin tip="图表生成中..." />
                 </div>
               )}
-              <ReactECharts ref={chartRef} option={currentChart.option} style={{ height: '100%', width: '100%' }} notMerge />
+              {currentChart.option && (
+                <ReactECharts ref={chartRef} option={currentChart.option} style={{ height: '100%', width: '100%' }} notMerge />
+              )}
             </div>
             <div className={styles.actions}>
               <Button size="small" icon={<DownloadOutlined />} onClick={handleDownload}>
@@ -72,7 +74,7 @@ export function ChartPanel({ className }: ChartPanelProps) {
                 className={currentChartId === item.id ? styles.historyItemActive : styles.historyItem}
                 onClick={() => setCurrentChartId(item.id)}
               >
-                图表 #{item.id.slice(1)}
+                {item.title || `图表 #${item.id.slice(1)}`}
               </List.Item>
             )}
           />
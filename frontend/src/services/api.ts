@@ -1,5 +1,6 @@
 /** API 服务层：会话管理 + SSE 流式聊天 */
 import type { EChartsOption } from 'echarts'
+import type { ChartRef } from '../types'
 
 const BASE = '/api'
 
@@ -14,7 +15,8 @@ export interface MessageRes {
   id: string
   role: 'user' | 'assistant'
   content: string
-  chart_data?: EChartsOption | null
+  chart?: ChartRef | null
+  exportable?: boolean
   created_at: string
 }
 
@@ -24,8 +26,9 @@ export async function createSession(title = '新对话'): Promise<SessionRes> {
   return res.json()
 }
 
-export async function getSessions(): Promise<{ sessions: SessionRes[] }> {
-  const res = await fetch(`${BASE}/sessions`)
+export async function getSessions(cursor?: string): Promise<{ sessions: SessionRes[]; next_cursor?: string | null }> {
+  const qs = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+  const res = await fetch(`${BASE}/sessions${qs}`)
   if (!res.ok) throw new Error(await res.text())
   return res.json()
 }
@@ -36,12 +39,24 @@ export async function getSession(sessionId: string): Promise<{
   created_at: string
   updated_at: string
   messages: MessageRes[]
+  next_before?: string | null
 }> {
   const res = await fetch(`${BASE}/sessions/${sessionId}`)
   if (!res.ok) throw new Error(await res.text())
   return res.json()
 }
 
+/** 向前翻页加载更早的消息（返回从新到旧） */
+export async function getSessionMessages(
+  sessionId: string,
+  before?: string
+): Promise<{ messages: MessageRes[]; next_before: string | null }> {
+  const qs = before ? `?before=${encodeURIComponent(before)}` : ''
+  const res = await fetch(`${BASE}/sessions/${sessionId}/messages${qs}`)
+  if (!res.ok) throw new Error(await res.text())
+  return res.json()
+}
+
 export async function renameSession(sessionId: string, title: string): Promise<void> {
   const res = await fetch(`${BASE}/sessions/${sessionId}`, {
     method: 'PUT',
@@ -56,11 +71,52 @@ export async function deleteSession(sessionId: string): Promise<void> {
   if (!res.ok) throw new Error(await res.text())
 }
 
+/** 按内容哈希获取图表 option（响应不可变，浏览器按 ETag / immutable 缓存） */
+export async function getChart(ref: string): Promise<EChartsOption> {
+  const res = await fetch(`${BASE}/charts/${ref}`)
+  if (!res.ok) throw new Error(await res.text())
+  return res.json()
+}
+
+export interface SearchHit {
+  session_id: string
+  session_title: string
+  /** 为空表示命中会话标题 */
+  message_id: string | null
+  role: 'user' | 'assistant' | null
+  /** 命中词以 highlight 中的两个标记包围 */
+  snippet: string
+  created_at: string
+  score: number | null
+}
+
+export interface SearchRes {
+  results: SearchHit[]
+  highlight: [string, string]
+  next_offset: number | null
+}
+
+/** 在全部会话的标题与消息中全文检索（空白分隔的词需同时命中，双引号括起短语） */
+export async function searchSessions(q: string, offset = 0): Promise<SearchRes> {
+  const res = await fetch(`${BASE}/search?q=${encodeURIComponent(q)}&offset=${offset}`)
+  if (!res.ok) throw new Error(await res.text())
+  return res.json()
+}
+
+export type ExportFormat = 'csv' | 'ndjson' | 'arrow'
+
+/** 导出某条回答背后的查询结果（浏览器直接下载，服务端流式生成） */
+export function exportUrl(messageId: string, format: ExportFormat = 'csv'): string {
+  return `${BASE}/export?message_id=${encodeURIComponent(messageId)}&format=${format}`
+}
+
 export type ChatStreamEvent =
-  | { event: 'message'; data: { content: string } }
-  | { event: 'chart'; data: { option: EChartsOption } }
-  | { event: 'done'; data: { message_id: string } }
+  | { event: 'message'; data: { content?: string; delta?: string } }
+  | { event: 'step'; data: { tool: string; input: string } }
+  | { event: 'chart'; data: { option: EChartsOption; ref?: string | null } }
+  | { event: 'done'; data: { message_id: string; exportable?: boolean } }
   | { event: 'error'; data: { error: string } }
+  | { event: 'busy'; data: { error: string; status: number } }
 
 export async function streamChat(
   sessionId: string,
@@ -12,20 +12,46 @@ interface ChatState {
   chartLoading: boolean
   loading: boolean
   error: string | null
+  /** 会话列表下一页游标，null 表示已全部加载 */
+  sessionsCursor: string | null
+  /** 当前会话更早消息的游标，null 表示已到最早 */
+  messagesBefore: string | null
+  loadingMore: boolean
   loadSessions: () => Promise<void>
+  loadMoreSessions: () => Promise<void>
   loadSession: (id: string) => Promise<void>
+  loadOlderMessages: () => Promise<void>
   createSession: () => void
   switchSession: (id: string) => void
   deleteSession: (id: string) => void
   renameSession: (id: string, title: string) => void
   sendMessage: (content: string) => void
   setStreaming: (v: boolean) => void
-  appendChart: (option: ChartData['option']) => void
+  appendChart: (option: NonNullable<ChartData['option']>, ref?: string | null) => void
   setCurrentChartId: (id: string | null) => void
+  loadChart: (id: string) => Promise<void>
   setChartLoading: (v: boolean) => void
   clearError: () => void
 }
 
+function toMessage(m: api.MessageRes, sessionId: string): Message {
+  return { ...m, session_id: sessionId }
+}
+
+/** 只记录图表引用，option 在图表被展示时才加载 */
+function chartRefs(messages: api.MessageRes[], sessionId: string): ChartData[] {
+  return messages
+    .filter((m) => m.chart)
+    .map((m) => ({
+      id: m.id,
+      message_id: m.id,
+      session_id: sessionId,
+      ref: m.chart!.ref,
+      title: m.chart!.title,
+      created_at: m.created_at,
+    }))
+}
+
 export const useChatStore = create<ChatState>((set, get) => ({
   sessions: [],
   currentSessionId: null,
@@ -36,12 +62,15 @@ export const useChatStore = create<ChatState>((set, get) => ({
   chartLoading: false,
   loading: false,
   error: null,
+  sessionsCursor: null,
+  messagesBefore: null,
+  loadingMore: false,
 
   loadSessions: async () => {
     set({ loading: true, error: null })
     try {
-      const { sessions } = await api.getSessions()
-      set({ sessions, loading: false })
+      const { sessions, next_cursor } = await api.getSessions()
+      set({ sessions, sessionsCursor: next_cursor ?? null, loading: false })
       const { currentSessionId } = get()
       if (currentSessionId && sessions.some((s) => s.id === currentSessionId)) {
         await get().loadSession(currentSessionId)
@@ -55,31 +84,65 @@ export const useChatStore = create<ChatState>((set, get) => ({
     }
   },
 
+  loadMoreSessions: async () => {
+    const { sessionsCursor, loadingMore } = get()
+    if (!sessionsCursor || loadingMore) return
+    set({ loadingMore: true })
+    try {
+      const { sessions, next_cursor } = await api.getSessions(sessionsCursor)
+      set((s) => {
+        const known = new Set(s.sessions.map((x) => x.id))
+        return {
+          sessions: [...s.sessions, ...sessions.filter((x) => !known.has(x.id))],
+          sessionsCursor: next_cursor ?? null,
+          loadingMore: false,
+        }
+      })
+    } catch (e) {
+      set({ error: (e as Error).message, loadingMore: false })
+    }
+  },
+
   loadSession: async (id: string) => {
     set({ loading: true, error: null })
     try {
       const data = await api.getSession(id)
-      const charts: ChartData[] = data.messages
-        .filter((m) => m.chart_data)
-        .map((m) => ({
-          id: m.id,
-          message_id: m.id,
-          session_id: id,
-          option: m.chart_data!,
-          created_at: m.created_at,
-        }))
+      const charts = chartRefs(data.messages, id)
+      const currentChartId = charts.length > 0 ? charts[charts.length - 1].id : null
       set({
-        messages: data.messages,
+        messages: data.messages.map((m) => toMessage(m, id)),
         charts,
         currentSessionId: id,
-        currentChartId: charts.length > 0 ? charts[charts.length - 1].id : null,
+        currentChartId,
+        messagesBefore: data.next_before ?? null,
         loading: false,
       })
+      if (currentChartId) get().loadChart(currentChartId)
     } catch (e) {
       set({ error: (e as Error).message, loading: false })
     }
   },
 
+  loadOlderMessages: async () => {
+    const { currentSessionId: id, messagesBefore, loadingMore } = get()
+    if (!id || !messagesBefore || loadingMore) return
+    set({ loadingMore: true })
+    try {
+      const page = await api.getSessionMessages(id, messagesBefore)
+      // 分页接口从新到旧返回，翻转后接在已加载消息之前
+      const older = [...page.messages].reverse()
+      if (get().currentSessionId !== id) return
+      set((s) => ({
+        messages: [...older.map((m) => toMessage(m, id)), ...s.messages],
+        charts: [...chartRefs(older, id), ...s.charts],
+        messagesBefore: page.next_before,
+        loadingMore: false,
+      }))
+    } catch (e) {
+      set({ error: (e as Error).message, loadingMore: false })
+    }
+  },
+
   createSession: async () => {
     try {
       const s = await api.createSession()
@@ -95,6 +158,7 @@ export const useChatStore = create<ChatState>((set, get) => ({
         messages: [],
         charts: [],
         currentChartId: null,
+        messagesBefore: null,
         error: null,
       }))
     } catch (e) {
@@ -103,7 +167,7 @@ export const useChatStore = create<ChatState>((set, get) => ({
   },
 
   switchSession: (id: string) => {
-    set({ currentSessionId: id })
+    set({ currentSessionId: id, messagesBefore: null, loadingMore: false })
     get().loadSession(id)
   },
 
@@ -169,29 +233,31 @@ export const useChatStore = create<ChatState>((set, get) => ({
     api
       .streamChat(currentSessionId, content.trim(), (e) => {
         if (e.event === 'message') {
-          const txt = (e.data as { content?: string }).content ?? ''
+          // delta 为增量 token，content 为完整文字（覆盖）
+          const { content: txt, delta } = e.data as { content?: string; delta?: string }
           set((s) => ({
             messages: s.messages.map((m) =>
-              m.id === tempAiId ? { ...m, content: txt } : m
+              m.id === tempAiId ? { ...m, content: txt ?? m.content + (delta ?? '') } : m
             ),
           }))
         }
         if (e.event === 'chart') {
           set({ chartLoading: true })
-          const opt = (e.data as { option?: ChartData['option'] }).option
-          if (opt) get().appendChart(opt)
+          const { option: opt, ref } = e.data as { option?: ChartData['option']; ref?: string | null }
+          if (opt) get().appendChart(opt, ref)
         }
         if (e.event === 'done') {
-          const mid = (e.data as { message_id?: string }).message_id ?? tempAiId
+          const { message_id, exportable } = e.data as { message_id?: string; exportable?: boolean }
+          const mid = message_id ?? tempAiId
           set((s) => ({
             messages: s.messages.map((m) =>
-              m.id === tempAiId ? { ...m, id: mid } : m
+              m.id === tempAiId ? { ...m, id: mid, exportable: !!exportable } : m
             ),
             isStreaming: false,
             chartLoading: false,
           }))
         }
-        if (e.event === 'error') {
+        if (e.event === 'error' || e.event === 'busy') {
           set({
             isStreaming: false,
             chartLoading: false,
@@ -212,15 +278,35 @@ export const useChatStore = create<ChatState>((set, get) => ({
 
   setStreaming: (v) => set({ isStreaming: v }),
   setChartLoading: (v) => set({ chartLoading: v }),
-  appendChart: (option) => {
+  appendChart: (option, ref) => {
     const { currentSessionId, charts } = get()
     if (!currentSessionId) return
     const id = 'c' + Date.now()
     set({
-      charts: [...charts, { id, message_id: '', session_id: currentSessionId, option, created_at: new Date().toISOString() }],
+      charts: [
+        ...charts,
+        { id, message_id: '', session_id: currentSessionId, ref: ref ?? undefined, option, created_at: new Date().toISOString() },
+      ],
       currentChartId: id,
     })
   },
-  setCurrentChartId: (id) => set({ currentChartId: id }),
+  setCurrentChartId: (id) => {
+    set({ currentChartId: id })
+    if (id) get().loadChart(id)
+  },
+  loadChart: async (id) => {
+    const chart = get().charts.find((c) => c.id === id)
+    if (!chart || chart.option || !chart.ref) return
+    set({ chartLoading: true })
+    try {
+      const option = await api.getChart(chart.ref)
+      set((s) => ({
+        charts: s.charts.map((c) => (c.ref === chart.ref ? { ...c, option } : c)),
+        chartLoading: false,
+      }))
+    } catch (e) {
+      set({ chartLoading: false, error: (e as Error).message })
+    }
+  },
   clearError: () => set({ error: null }),
 }))
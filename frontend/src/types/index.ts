@@ -12,14 +12,29 @@ export interface Message {
   session_id: string
   role: 'user' | 'assistant'
   content: string
-  chart_data?: EChartsOption | null
+  chart?: ChartRef | null
+  /** 回答背后有可导出的查询结果 */
+  exportable?: boolean
   created_at: string
 }
 
+/** 消息携带的图表引用与摘要；option 按需通过 /api/charts/{ref} 获取 */
+export interface ChartRef {
+  ref: string
+  url: string
+  title: string
+  type: string
+  series: number
+  points: number
+}
+
 export interface ChartData {
   id: string
   message_id: string
   session_id: string
-  option: EChartsOption
+  /** 内容哈希；懒加载的历史图表在 option 取回前只有 ref */
+  ref?: string
+  title?: string
+  option?: EChartsOption
   created_at: string
 }
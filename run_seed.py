@@ -8,7 +8,8 @@ sys.path.insert(0, str(backend))
 import os
 os.chdir(backend)
 
-from app.database.seed import run_seed
+from app.database.seed import main
 
 if __name__ == "__main__":
-    run_seed()
+    # 例：python run_seed.py --scale 10 --reset  生成约 1000 万条 sales_records
+    main()